@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: from_pretrained vs the mmapped safetensors snapshot
+
+Converts a model once into a snapshot, then loads it both ways in fresh
+interpreters and reports load time and memory. In the "pair" runs two
+processes load the same model at the same time; with the snapshot their
+weight pages come from one shared file mapping, which shows up as a
+lower PSS per process. Both loaders must produce identical logits,
+otherwise the run exits non-zero.
+
+By default a tiny random GPT-2 is built in a temporary directory (see
+bench_hot_paths.py), so the benchmark runs offline; pass --model to
+measure a real model (it must be in the local Hugging Face cache).
+
+Usage:
+    python benchmarks/bench_cold_start.py [--model MODEL_ID] [--repeat N] [--json FILE]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from src.serving import process_memory
+
+LOADERS = ("from_pretrained", "mmap_snapshot")
+
+PROMPT = "User: What problems are developers struggling with?\nResponse:"
+
+# Runs inside the child interpreter; prints one JSON line and, when told to hold,
+# keeps the model alive until stdin closes
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import torch
+sys.path.insert(0, {base_dir!r})
+from src.model_loader import load_snapshot
+from transformers import AutoModelForCausalLM, AutoTokenizer
+imported = time.perf_counter()
+loader, model_id, snapshot_dir, logits_path, hold = sys.argv[1:6]
+if loader == "mmap_snapshot":
+    model, tokenizer = load_snapshot(model_id, snapshot_dir)
+else:
+    tokenizer = AutoTokenizer.from_pretrained(model_id, local_files_only=True)
+    model = AutoModelForCausalLM.from_pretrained(model_id, local_files_only=True)
+    model.eval()
+loaded = time.perf_counter()
+with torch.no_grad():
+    logits = model(**tokenizer({prompt!r}, return_tensors="pt")).logits
+first_token = time.perf_counter()
+torch.save(logits, logits_path)
+print(json.dumps({{"import_seconds": imported - start, "load_seconds": loaded - imported,
+                  "forward_seconds": first_token - loaded}}), flush=True)
+if hold == "1":
+    sys.stdin.read()
+"""
+
+def child_command(loader, model_id, snapshot_dir, logits_path, hold=False):
+    script = CHILD.format(base_dir=str(BASE_DIR), prompt=PROMPT)
+    return [sys.executable, "-c", script, loader, str(model_id), str(snapshot_dir), str(logits_path),
+            "1" if hold else "0"]
+
+def run_single(loader, model_id, snapshot_dir, logits_path):
+    """Load the model in one fresh process and return its timings and memory"""
+    process = subprocess.Popen(child_command(loader, model_id, snapshot_dir, logits_path, hold=True),
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        result = json.loads(process.stdout.readline())
+        result["memory"] = process_memory(process.pid)
+    finally:
+        process.stdin.close()
+        process.wait()
+    if process.returncode:
+        raise RuntimeError(f"{loader} child exited with status {process.returncode}")
+    return result
+
+def run_pair(loader, model_id, snapshot_dir, tmp):
+    """Load the model in two processes at once and return their memory"""
+    processes = [
+        subprocess.Popen(child_command(loader, model_id, snapshot_dir, Path(tmp) / f"pair{i}.pt", hold=True),
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for i in range(2)
+    ]
+    try:
+        for process in processes:
+            json.loads(process.stdout.readline())
+        memory = [process_memory(process.pid) for process in processes]
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+    return [m for m in memory if m]
+
+def mib(value):
+    return round(value / 2 ** 20, 1) if value is not None else None
+
+def main():
+    parser = argparse.ArgumentParser(description="GrokBeast cold-start benchmark")
+    parser.add_argument("--model", type=str, default=None,
+                        help="Model ID or path in the local cache (default: a tiny random GPT-2)")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh processes per loader")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+    
+    import torch
+    from src.model_loader import convert_to_snapshot, snapshot_path
+    
+    failures = []
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        model_id = args.model
+        if model_id is None:
+            sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+            from bench_hot_paths import build_tiny_model
+            model_id = str(Path(tmp) / "tiny-gpt2")
+            build_tiny_model(model_id)
+        snapshot_dir = Path(tmp) / "snapshots"
+        convert_to_snapshot(model_id, snapshot_dir, local_files_only=True)
+        weights = snapshot_path(model_id, snapshot_dir) / "model.safetensors"
+        print(f"model {model_id}: snapshot {mib(weights.stat().st_size)} MiB\n")
+        
+        print(f"{'loader':16} {'import s':>9} {'load s':>8} {'forward s':>10} {'RSS MiB':>8} {'PSS MiB':>8} "
+              f"{'pair PSS MiB':>13}")
+        for loader in LOADERS:
+            runs = []
+            for i in range(args.repeat):
+                runs.append(run_single(loader, model_id, snapshot_dir, Path(tmp) / f"{loader}.pt"))
+            pair = run_pair(loader, model_id, snapshot_dir, tmp)
+            memory = [run["memory"] for run in runs if run["memory"]]
+            results[loader] = {
+                "import_seconds": round(statistics.median(r["import_seconds"] for r in runs), 3),
+                "load_seconds": round(statistics.median(r["load_seconds"] for r in runs), 3),
+                "forward_seconds": round(statistics.median(r["forward_seconds"] for r in runs), 3),
+                "rss_mib": mib(statistics.median(m["rss"] for m in memory)) if memory else None,
+                "pss_mib": mib(statistics.median(m["pss"] for m in memory)) if memory else None,
+                "pair_pss_mib": mib(statistics.mean(m["pss"] for m in pair)) if pair else None,
+            }
+            row = results[loader]
+            print(f"{loader:16} {row['import_seconds']:>9} {row['load_seconds']:>8} {row['forward_seconds']:>10} "
+                  f"{row['rss_mib']!s:>8} {row['pss_mib']!s:>8} {row['pair_pss_mib']!s:>13}")
+        
+        reference = torch.load(Path(tmp) / "from_pretrained.pt")
+        if not torch.equal(reference, torch.load(Path(tmp) / "mmap_snapshot.pt")):
+            failures.append("mmap snapshot logits differ from from_pretrained")
+    
+    before = results["from_pretrained"]["load_seconds"]
+    after = results["mmap_snapshot"]["load_seconds"]
+    print(f"\ncold start: {before:.3f}s -> {after:.3f}s ({before / max(after, 1e-9):.1f}x faster)")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"model": args.model or "tiny-gpt2", "repeat": args.repeat, "results": results}, f, indent=2)
+    if failures:
+        print("\nFAILURES:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+if __name__ == "__main__":
+    main()
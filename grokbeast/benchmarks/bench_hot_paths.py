@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Hot-path benchmark suite: command parsing, hunting, ranking, styling and generation
+
+Runs fully offline. The generation cases use a tiny randomly initialised
+GPT-2 with a tokenizer trained in-process, so they measure the agent's
+own overhead and not a real model. Each case records p50/p99 latency and
+throughput; results are compared against a JSON baseline and the run
+exits non-zero when a case regresses beyond the tolerance.
+
+Usage:
+    python benchmarks/bench_hot_paths.py                     # compare against the baseline
+    python benchmarks/bench_hot_paths.py --update-baseline   # record a new baseline
+    python benchmarks/bench_hot_paths.py --quick --skip-model
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+DEFAULT_BASELINE = BASE_DIR / "benchmarks" / "baseline_hot_paths.json"
+
+INSTRUCTIONS = [
+    "hunt for 3 problems and tweet the best one",
+    "find 5 problems on reddit",
+    "start the agent swarm",
+    "status",
+    "tweet about the top problem",
+    "run ls -la",
+    "what can you do?",
+]
+
+PROBLEM_SENTENCES = [
+    "Developers struggle with flaky integration tests that fail at random.",
+    "Small teams can't keep their documentation up to date.",
+    "The biggest pain is waiting twenty minutes for CI on every push.",
+    "Users are frustrated by apps that log them out every day.",
+    "Freelancers need a simple way to track unpaid invoices.",
+    "It is difficult to compare cloud bills across providers.",
+    "Our main problem is onboarding new engineers to a legacy codebase.",
+]
+
+FILLER_SENTENCES = [
+    "The weather was pleasant for most of the week.",
+    "Release notes for version 2.4 are available on the website.",
+    "Thanks everyone for joining the call this morning.",
+    "The conference moved to a larger venue this year.",
+    "Lunch will be provided at noon in the main hall.",
+]
+
+def synthetic_corpus(lines, seed=0, problem_ratio=0.2):
+    """Build a reproducible mix of problem and filler lines"""
+    rng = random.Random(seed)
+    out = []
+    for i in range(lines):
+        pool = PROBLEM_SENTENCES if rng.random() < problem_ratio else FILLER_SENTENCES
+        out.append(f"{i}. {rng.choice(pool)}")
+    return "\n".join(out)
+
+def measure(fn, repeat, items=1, warmup=1, min_sample_seconds=0.002):
+    """Time repeated calls of fn
+    
+    Calls faster than min_sample_seconds are looped (timeit-style) so each
+    sample is long enough to be stable; latency is reported per call.
+    
+    Args:
+        fn (callable): Zero-argument function to time
+        repeat (int): Number of timed samples
+        items (int): Units of work per call, for throughput
+        warmup (int): Untimed calls made first
+        min_sample_seconds (float): Shortest duration of one sample
+    
+    Returns:
+        dict: p50/p99 latency in milliseconds and items per second
+    """
+    for _ in range(warmup):
+        fn()
+    
+    loops = 1
+    while loops < 1_000_000:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= min_sample_seconds:
+            break
+        loops *= 2
+    
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+    samples.sort()
+    p50 = samples[len(samples) // 2]
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return {
+        "calls": repeat * loops,
+        "p50_ms": round(p50 * 1000, 4),
+        "p99_ms": round(p99 * 1000, 4),
+        "throughput_per_sec": round(items * len(samples) / sum(samples), 1) if sum(samples) else None,
+    }
+
+def rule_cases(repeat, quick):
+    """Benchmarks that need no model"""
+    from src.agent_model import GrokAgent
+    from src.chat_command_generator import parse_chat_instruction
+    
+    agent = GrokAgent(load_model=False)
+    cases = {}
+    
+    cases["parse_chat_instruction"] = measure(
+        lambda: [parse_chat_instruction(text) for text in INSTRUCTIONS],
+        repeat, items=len(INSTRUCTIONS))
+    
+    sizes = (1_000, 10_000) if quick else (1_000, 10_000, 100_000)
+    for lines in sizes:
+        corpus = synthetic_corpus(lines)
+        runs = max(3, repeat // (lines // 1_000))
+        # Ask for every match so the whole corpus is scanned
+        cases[f"hunt_problems_{lines}_lines"] = measure(
+            lambda: agent.hunt_problems(corpus, count=lines), runs, items=lines)
+    
+    problems = agent.hunt_problems(synthetic_corpus(5_000), count=50)
+    cases["rank_problems_50"] = measure(lambda: agent.rank_problems(problems), repeat, items=len(problems))
+    
+    texts = [p["problem"] for p in problems[:20]]
+    cases["grokify_text"] = measure(lambda: [agent.grokify_text(t) for t in texts], repeat, items=len(texts))
+    cases["create_tweet"] = measure(lambda: [agent.create_tweet(p) for p in problems[:20]], repeat, items=20)
+    return cases
+
+def build_tiny_model(directory, seed=0):
+    """Save a tiny random GPT-2 and an in-process trained tokenizer
+    
+    Args:
+        directory (str): Where to write the model and tokenizer
+        seed (int): Seed for the random weights
+    """
+    import torch
+    from tokenizers import ByteLevelBPETokenizer
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+    
+    corpus = PROBLEM_SENTENCES + FILLER_SENTENCES + INSTRUCTIONS + [
+        "You are an energetic AI assistant. Keep responses short and engaging.",
+        "You are an energetic AI assistant. Keep responses short, punchy and full of energy.",
+        "User: Prompt: Response:",
+    ]
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(corpus, vocab_size=512, min_frequency=1, special_tokens=["<|endoftext|>"])
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=bpe._tokenizer,
+        bos_token="<|endoftext|>",
+        eos_token="<|endoftext|>",
+        unk_token="<|endoftext|>",
+    )
+    tokenizer.save_pretrained(directory)
+    
+    torch.manual_seed(seed)
+    config = GPT2Config(
+        vocab_size=len(tokenizer),
+        n_positions=512,
+        n_embd=64,
+        n_layer=2,
+        n_head=2,
+        bos_token_id=tokenizer.eos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    )
+    GPT2LMHeadModel(config).save_pretrained(directory)
+
+def model_cases(repeat):
+    """Benchmarks for generate() and chat_response() on a tiny local model"""
+    try:
+        import torch  # noqa: F401
+        import tokenizers  # noqa: F401
+        import transformers  # noqa: F401
+    except ImportError as e:
+        print(f"Skipping model cases: {e}")
+        return {}
+    
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    
+    with tempfile.TemporaryDirectory(prefix="grok-tiny-") as directory:
+        build_tiny_model(directory)
+        os.environ["GROK_MODEL_ID"] = directory
+        os.environ["GROK_USE_CUDA"] = "0"
+        os.environ.pop("GROK_USE_FALLBACK", None)
+        
+        from src.agent_model import GrokAgent
+        
+        agent = GrokAgent()
+        if agent.use_fallback:
+            print("Skipping model cases: tiny model failed to load")
+            return {}
+        # Measure generation itself, not response cache hits
+        agent.response_cache = None
+        
+        return {
+            "generate_grok_style": measure(
+                lambda: agent.generate("users can't find the settings page", max_length=64, grok_style=True),
+                repeat, warmup=2),
+            "generate_plain": measure(
+                lambda: agent.generate("Developers struggle with", max_length=64),
+                repeat, warmup=2),
+            "chat_response": measure(
+                lambda: agent.chat_response("tell me about flaky tests"),
+                repeat, warmup=2),
+        }
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions against the baseline
+    
+    A case regresses when its p50 latency is more than `tolerance` (as a
+    fraction) slower than the baseline p50.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("cases", {}).get(name)
+        if not reference or not reference.get("p50_ms"):
+            continue
+        ratio = result["p50_ms"] / reference["p50_ms"]
+        result["vs_baseline"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: p50 {result['p50_ms']} ms vs {reference['p50_ms']} ms ({ratio:.2f}x)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="GrokBeast hot-path benchmarks")
+    parser.add_argument("--repeat", type=int, default=30, help="Timed calls per case")
+    parser.add_argument("--quick", action="store_true", help="Smaller corpora and fewer calls")
+    parser.add_argument("--skip-model", action="store_true", help="Skip the generation cases")
+    parser.add_argument("--baseline", type=str, default=str(DEFAULT_BASELINE), help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p50 slowdown (0.25 = 25%%)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the agent's random choices")
+    args = parser.parse_args()
+    
+    repeat = max(3, args.repeat // 3) if args.quick else args.repeat
+    random.seed(args.seed)
+    
+    results = rule_cases(repeat, args.quick)
+    if not args.skip_model:
+        results.update(model_cases(max(3, repeat // 3)))
+    
+    baseline_path = Path(args.baseline)
+    regressions = []
+    if baseline_path.exists() and not args.update_baseline:
+        with open(baseline_path, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    
+    for name, result in results.items():
+        change = f"   {result['vs_baseline']:.2f}x" if "vs_baseline" in result else ""
+        print(f"{name:28s} p50 {result['p50_ms']:10.3f} ms   p99 {result['p99_ms']:10.3f} ms"
+              f"   {result['throughput_per_sec']:>12} /s{change}")
+    
+    if args.update_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump({
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "quick": args.quick,
+                "cases": results,
+            }, f, indent=2)
+        print(f"\nBaseline written to {baseline_path}")
+        return
+    
+    if regressions:
+        print("\nREGRESSIONS:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print("\nOK" if baseline_path.exists() else "\nNo baseline yet; run with --update-baseline to record one")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Ingestion benchmark: pooled conditional fetching against a local feed server
+
+Starts an HTTP/1.1 stand-in server on 127.0.0.1 serving fixture RSS
+feeds with ETag and Last-Modified validators, then fetches them:
+
+- one-off: a fresh requests.get per feed, one after another
+- cold: IngestionClient with no stored validators (all 200s)
+- warm: a new IngestionClient loading the persisted validators (all 304s)
+- changed: the same after --changed feeds were updated (200s for those only)
+
+The run exits non-zero if the warm pass fetches any body or the changed
+pass misses an update. Requires `requests`; nothing leaves the machine.
+
+Usage:
+    python benchmarks/bench_ingestion.py [--feeds N] [--items N] [--latency-ms MS]
+"""
+
+import argparse
+import hashlib
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+def fixture_feed(index, version, items):
+    """Build an RSS document for feed `index` at `version`"""
+    entries = "".join(
+        f"<item><title>Problem {index}.{version}.{i}</title>"
+        f"<link>https://example.com/feed{index}/{version}/{i}</link>"
+        f"<guid>feed{index}-{version}-{i}</guid>"
+        f"<description>Developers struggle with issue {i} in feed {index}; it is a real pain.</description></item>"
+        for i in range(items)
+    )
+    return (f'<?xml version="1.0"?><rss version="2.0"><channel><title>Feed {index}</title>'
+            f"{entries}</channel></rss>").encode("utf-8")
+
+class FeedServer:
+    """Threaded local server for the fixture feeds, counting connections and bytes"""
+    
+    def __init__(self, feeds, items, latency):
+        self.items = items
+        self.latency = latency
+        self.versions = [0] * feeds
+        self.bodies = {}
+        self.connections = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        for index in range(feeds):
+            self._render(index)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    
+    def _render(self, index):
+        body = fixture_feed(index, self.versions[index], self.items)
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        modified = formatdate(1700000000 + self.versions[index] * 60, usegmt=True)
+        self.bodies[index] = (body, etag, modified)
+    
+    def update(self, index):
+        """Publish a new version of one feed"""
+        self.versions[index] += 1
+        self._render(index)
+    
+    def url(self, index):
+        return f"http://127.0.0.1:{self.httpd.server_port}/feeds/{index}.xml"
+    
+    def _handler(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; don't let Nagle delay the body
+            disable_nagle_algorithm = True
+            
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+            
+            def do_GET(self):
+                try:
+                    index = int(self.path.rsplit("/", 1)[-1].split(".")[0])
+                    body, etag, modified = server.bodies[index]
+                except (ValueError, KeyError):
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+                with server._lock:
+                    server.requests += 1
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/rss+xml")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", modified)
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.bytes_sent += len(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+    
+    def counters(self):
+        with self._lock:
+            return self.connections, self.requests, self.bytes_sent
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def run_pass(name, server, fetch):
+    """Time one fetch pass and report what it cost the server"""
+    before = server.counters()
+    start = time.perf_counter()
+    results = fetch()
+    seconds = time.perf_counter() - start
+    after = server.counters()
+    summary = {
+        "seconds": seconds,
+        "connections": after[0] - before[0],
+        "requests": after[1] - before[1],
+        "bytes": after[2] - before[2],
+        "updated": sum(1 for r in results if r["status"] == 200),
+        "not_modified": sum(1 for r in results if r["status"] == 304),
+        "failed": sum(1 for r in results if r["status"] not in (200, 304)),
+    }
+    print(f"{name:10s} {seconds * 1000:9.1f} ms   {summary['connections']:4d} connections   "
+          f"{summary['updated']:4d} x 200   {summary['not_modified']:4d} x 304   {summary['bytes']:>9d} bytes")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="GrokBeast ingestion benchmark")
+    parser.add_argument("--feeds", type=int, default=40, help="Fixture feeds to serve")
+    parser.add_argument("--items", type=int, default=30, help="Items per feed")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated server latency per request")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent fetches")
+    parser.add_argument("--changed", type=int, default=3, help="Feeds updated before the last pass")
+    args = parser.parse_args()
+    
+    import requests
+    from src.ingestion import IngestionClient
+    
+    failures = []
+    with FeedServer(args.feeds, args.items, args.latency_ms / 1000) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        urls = [server.url(index) for index in range(args.feeds)]
+        validators = Path(tmp) / "validators.json"
+        
+        def one_off():
+            results = []
+            for url in urls:
+                response = requests.get(url, timeout=10)
+                results.append({"status": response.status_code})
+            return results
+        
+        def pooled():
+            client = IngestionClient(validators_path=validators, max_workers=args.workers, min_host_interval=0)
+            try:
+                return client.fetch_all(urls)
+            finally:
+                client.close()
+        
+        baseline = run_pass("one-off", server, one_off)
+        cold = run_pass("cold", server, pooled)
+        warm = run_pass("warm", server, pooled)
+        changed_count = min(args.changed, args.feeds)
+        for index in range(changed_count):
+            server.update(index)
+        changed = run_pass("changed", server, pooled)
+        
+        if cold["updated"] != args.feeds:
+            failures.append(f"cold pass fetched {cold['updated']} of {args.feeds} feeds")
+        if warm["bytes"] or warm["not_modified"] != args.feeds:
+            failures.append(f"warm pass transferred {warm['bytes']} bytes ({warm['not_modified']} x 304)")
+        if changed["updated"] != changed_count:
+            failures.append(f"changed pass fetched {changed['updated']} feeds, expected {changed_count}")
+    
+    print(f"\ncold vs one-off: {baseline['seconds'] / cold['seconds']:.1f}x faster, "
+          f"{cold['connections']} vs {baseline['connections']} connections")
+    if failures:
+        print("\nFAILURES:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Problem-set memory benchmark: dicts vs slotted Problems vs a columnar ProblemSet
+
+Builds N synthetic problems shaped like the cached Reddit search records
+(including the nested raw_data) in each representation and reports the
+memory held (tracemalloc) and the time to rank the top 10. Every
+representation must produce the same top 10, otherwise the run exits
+non-zero.
+
+Usage:
+    python benchmarks/bench_problems.py [--problems N] [--json FILE]
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from src.problems import Problem, ProblemSet
+from src.ranking import DEFAULT_WEIGHTS, TopKRanker
+
+SUBREDDITS = ["startups", "entrepreneur", "smallbusiness", "SaaS", "webdev", "devops", "productivity"]
+REACH = ["Consumer", "SMB", "Enterprise", "General"]
+
+def synthetic_problems(count, seed=0):
+    """Yield problem dicts like those stored for cached Reddit searches"""
+    rng = random.Random(seed)
+    for i in range(count):
+        subreddit = rng.choice(SUBREDDITS)
+        title = f"Why is it so hard to keep invoices in sync across tools? ({i})"
+        yield {
+            "problem": title,
+            "source": f"Reddit - r/{subreddit}",
+            "url": f"https://www.reddit.com/r/{subreddit}/comments/{i:07x}/",
+            "pain": rng.randint(1, 10),
+            "reach": rng.choice(REACH),
+            "urgency": round(rng.random() * 10, 2),
+            "trend": round(rng.random() * 10, 2),
+            "score": rng.randint(0, 5000),
+            "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "raw_data": {
+                "id": f"{i:07x}",
+                "title": title,
+                "selftext": f"We tried three tools and every month something breaks ({i}).",
+                "score": rng.randint(0, 5000),
+                "num_comments": rng.randint(0, 400),
+                "created_utc": 1700000000 + i,
+                "subreddit": subreddit,
+                "author": f"user{rng.randint(0, 50000)}",
+            },
+        }
+
+def measure(name, build, rank):
+    """Build one representation, then report its memory and ranking time"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    container = build()
+    build_seconds = time.perf_counter() - start
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    
+    start = time.perf_counter()
+    top = rank(container)
+    rank_seconds = time.perf_counter() - start
+    return {
+        "name": name,
+        "mib": round(held / 2 ** 20, 1),
+        "bytes_per_problem": round(held / max(1, len(container))),
+        "build_seconds": round(build_seconds, 3),
+        "rank_seconds": round(rank_seconds, 3),
+        "top_urls": [problem["url"] for _, problem in top],
+    }
+
+def rank_mappings(problems):
+    ranker = TopKRanker(10, DEFAULT_WEIGHTS)
+    ranker.extend(problems)
+    return ranker.top()
+
+def main():
+    parser = argparse.ArgumentParser(description="GrokBeast problem-set memory benchmark")
+    parser.add_argument("--problems", type=int, default=200000, help="Number of synthetic problems")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+    n = args.problems
+    
+    cases = [
+        ("dicts", lambda: list(synthetic_problems(n)), rank_mappings),
+        ("dicts, no raw_data",
+         lambda: [{k: v for k, v in p.items() if k != "raw_data"} for p in synthetic_problems(n)], rank_mappings),
+        ("Problem", lambda: [Problem.from_dict(p) for p in synthetic_problems(n)], rank_mappings),
+        ("Problem, no raw_data",
+         lambda: [Problem.from_dict(p, keep_extra=False) for p in synthetic_problems(n)], rank_mappings),
+        ("ProblemSet", lambda: ProblemSet(synthetic_problems(n)),
+         lambda problems: problems.top(10, DEFAULT_WEIGHTS)),
+        ("ProblemSet, no raw_data", lambda: ProblemSet(synthetic_problems(n), keep_extra=False),
+         lambda problems: problems.top(10, DEFAULT_WEIGHTS)),
+    ]
+    
+    results = []
+    print(f"{n} problems\n")
+    print(f"{'representation':26} {'MiB':>8} {'bytes/problem':>14} {'build s':>8} {'top-10 s':>9}")
+    for name, build, rank in cases:
+        result = measure(name, build, rank)
+        results.append(result)
+        print(f"{name:26} {result['mib']:>8} {result['bytes_per_problem']:>14} "
+              f"{result['build_seconds']:>8} {result['rank_seconds']:>9}")
+    
+    baseline = results[0]
+    compact = results[-1]
+    print(f"\nProblemSet without raw_data holds {baseline['mib'] / max(compact['mib'], 0.1):.1f}x less than dicts")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"problems": n, "results": results}, f, indent=2)
+    mismatched = [r["name"] for r in results if r["top_urls"] != baseline["top_urls"]]
+    if mismatched:
+        print(f"\nFAILURES:\n  top 10 differs from dicts for: {', '.join(mismatched)}")
+        sys.exit(1)
+    print("\nOK")
+
+if __name__ == "__main__":
+    main()
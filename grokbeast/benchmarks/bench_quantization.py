@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Compare fp32 and dynamic int8 CPU inference for the configured model
+
+Reports serialised model size, greedy tokens/sec and token agreement on
+a fixed prompt set, and exits non-zero when agreement drops below the
+quality threshold.
+
+Usage:
+    python benchmarks/bench_quantization.py [--model gpt2] [--min-agreement 0.5]
+"""
+
+import argparse
+import copy
+import json
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from src.config import get_setting
+from src.quantization import QUALITY_PROMPTS, compare_models, quantize_dynamic_int8
+
+def main():
+    parser = argparse.ArgumentParser(description="fp32 vs int8 CPU inference benchmark")
+    parser.add_argument("--model", type=str, default=get_setting("model.name", "gpt2"),
+                        help="Model ID or local path")
+    parser.add_argument("--max-new-tokens", type=int, default=32, help="Tokens generated per prompt")
+    parser.add_argument("--min-agreement", type=float, default=get_setting("model.quantization_min_agreement", 0.5),
+                        help="Fail below this token agreement")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--json", type=str, default=None, help="Write the report to this file")
+    args = parser.parse_args()
+    
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForCausalLM.from_pretrained(args.model).eval()
+    quantized = quantize_dynamic_int8(copy.deepcopy(model)).eval()
+    
+    # Warm up both models so one-time kernel setup is not measured
+    compare_models(model, quantized, tokenizer, QUALITY_PROMPTS[:1], max_new_tokens=4)
+    report = compare_models(model, quantized, tokenizer, QUALITY_PROMPTS, max_new_tokens=args.max_new_tokens)
+    report["model"] = args.model
+    
+    print(f"Model:            {args.model}")
+    print(f"fp32 size:        {report['reference_bytes'] / 2**20:8.1f} MB")
+    print(f"int8 size:        {report['candidate_bytes'] / 2**20:8.1f} MB")
+    print(f"fp32 tokens/sec:  {report['reference_tokens_per_sec']:8.1f}")
+    print(f"int8 tokens/sec:  {report['candidate_tokens_per_sec']:8.1f}")
+    print(f"Token agreement:  {report['token_agreement']:8.3f} "
+          f"({report['exact_matches']}/{report['prompts']} prompts identical)")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    
+    if report["token_agreement"] < args.min_agreement:
+        print(f"\nFAIL: agreement below {args.min_agreement}")
+        sys.exit(1)
+    print("\nOK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Serving benchmark: requests/sec and memory per worker of the pre-forking server
+
+For each worker count, starts `chat_command_generator.py --serve` in a
+fresh process, drives it with concurrent HTTP clients for a fixed time
+and reads every worker's RSS and PSS from /proc (Linux). PSS splits the
+weight pages shared copy-on-write between the master and the workers,
+so "sum PSS" is what the server really costs; use it with requests/sec
+to size hosts.
+
+Usage:
+    python benchmarks/bench_serving.py [--workers 1 2 4] [--clients 16] [--seconds 10]
+    python benchmarks/bench_serving.py --endpoint chat --model   # load the configured model
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from src.serving import process_memory
+
+ENDPOINTS = {
+    "status": ("GET", "/api/status", None),
+    "chat": ("POST", "/api/chat", {"message": "What problems are developers struggling with?"}),
+    "metrics": ("GET", "/api/metrics", None),
+}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(port, process, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline and process.poll() is None:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def worker_pids(master_pid):
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children", "r") as f:
+            return [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []
+
+def drive(port, endpoint, clients, seconds):
+    """Send requests from `clients` threads for `seconds`; return latencies and errors"""
+    method, path, payload = ENDPOINTS[endpoint]
+    body = json.dumps(payload) if payload is not None else None
+    headers = {"Content-Type": "application/json"} if body else {}
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+    
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        local = []
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    raise http.client.HTTPException(response.status)
+                local.append(time.perf_counter() - start)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+    
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+def run_case(workers, args):
+    port = free_port()
+    env = dict(os.environ)
+    if not args.model:
+        env["GROK_USE_FALLBACK"] = "1"
+    command = [sys.executable, str(BASE_DIR / "src" / "chat_command_generator.py"),
+               "--serve", "--workers", str(workers), "--port", str(port)]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_port(port, process, args.startup_timeout):
+            raise RuntimeError(f"server with {workers} workers did not start")
+        drive(port, args.endpoint, args.clients, min(2.0, args.seconds))  # warm-up
+        latencies, errors = drive(port, args.endpoint, args.clients, args.seconds)
+        memory = [process_memory(pid) for pid in worker_pids(process.pid)]
+        memory = [m for m in memory if m]
+        master = process_memory(process.pid) or {}
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    
+    latencies.sort()
+    mib = 2 ** 20
+    return {
+        "workers": workers,
+        "requests_per_sec": round(len(latencies) / args.seconds, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2) if latencies else None,
+        "errors": errors,
+        "master_rss_mib": round(master.get("rss", 0) / mib, 1),
+        "worker_rss_mib": round(statistics.mean(m["rss"] for m in memory) / mib, 1) if memory else None,
+        "worker_pss_mib": round(statistics.mean(m["pss"] for m in memory) / mib, 1) if memory else None,
+        "total_pss_mib": round((sum(m["pss"] for m in memory) + master.get("pss", 0)) / mib, 1) if memory else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="GrokBeast serving benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client connections")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measured seconds per case")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="status", help="Endpoint to drive")
+    parser.add_argument("--model", action="store_true", help="Load the configured model instead of fallback mode")
+    parser.add_argument("--startup-timeout", type=float, default=300.0, help="Seconds to wait for the server")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+    
+    results = []
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6} "
+          f"{'master RSS':>11} {'worker RSS':>11} {'worker PSS':>11} {'sum PSS':>9}  (MiB)")
+    for workers in args.workers:
+        result = run_case(workers, args)
+        results.append(result)
+        print(f"{result['workers']:>7} {result['requests_per_sec']:>9} {result['p50_ms']!s:>8} "
+              f"{result['p99_ms']!s:>8} {result['errors']:>6} {result['master_rss_mib']:>11} "
+              f"{result['worker_rss_mib']!s:>11} {result['worker_pss_mib']!s:>11} {result['total_pss_mib']!s:>9}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"endpoint": args.endpoint, "model": args.model, "clients": args.clients,
+                       "cpu_count": os.cpu_count(), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import time and time-to-first-response per mode
+
+Each mode runs in a fresh interpreter. The CLI and fallback modes must
+never import torch or transformers; the benchmark exits non-zero if
+they do (even an attempted import of a framework that is not installed
+counts).
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat N] [--json FILE]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+
+HEAVY_MODULES = ("torch", "transformers")
+
+# Runs inside the child interpreter; records heavy imports even if they fail
+PRELUDE = """
+import json, sys, time
+heavy = set()
+class _Recorder:
+    def find_spec(self, name, path=None, target=None):
+        if name.split(".")[0] in {heavy_modules!r}:
+            heavy.add(name.split(".")[0])
+        return None
+sys.meta_path.insert(0, _Recorder())
+sys.path.insert(0, {base_dir!r})
+start = time.perf_counter()
+"""
+
+REPORT = """
+first_response = time.perf_counter() - start
+print(json.dumps({"import_seconds": imported - start, "first_response_seconds": first_response,
+                  "heavy_modules": sorted(heavy)}))
+"""
+
+# Mode name -> (environment overrides, code timed after the prelude, must stay light)
+MODES = {
+    "package_import": ({}, """
+import src
+imported = time.perf_counter()
+""", True),
+    "cli_parse": ({}, """
+from src.chat_command_generator import parse_chat_instruction
+imported = time.perf_counter()
+parse_chat_instruction("hunt for 3 problems and tweet the best one")
+""", True),
+    "cli_status": ({}, """
+from src.chat_command_generator import parse_chat_instruction, run_command
+imported = time.perf_counter()
+response = run_command(parse_chat_instruction("status"))
+assert response["status"] == "success", response
+""", True),
+    "fallback_chat": ({"GROK_USE_FALLBACK": "1"}, """
+from src.agent_model import GrokAgent
+imported = time.perf_counter()
+GrokAgent().chat_response("can you hunt some bugs?")
+""", True),
+    "model_chat": ({"GROK_USE_FALLBACK": "0"}, """
+from src.agent_model import GrokAgent
+imported = time.perf_counter()
+GrokAgent().chat_response("can you hunt some bugs?")
+""", False),
+}
+
+def run_mode(name, repeat):
+    env_overrides, body, _ = MODES[name]
+    code = PRELUDE.format(heavy_modules=HEAVY_MODULES, base_dir=str(BASE_DIR)) + body + REPORT
+    env = dict(os.environ, **env_overrides)
+    samples = []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1:]}
+        samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return {
+        "import_ms": round(statistics.median(s["import_seconds"] for s in samples) * 1000, 1),
+        "first_response_ms": round(statistics.median(s["first_response_seconds"] for s in samples) * 1000, 1),
+        "heavy_modules": sorted(set().union(*(s["heavy_modules"] for s in samples))),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="GrokBeast startup benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per mode (median is reported)")
+    parser.add_argument("--skip-model", action="store_true", help="Skip the full model mode")
+    parser.add_argument("--json", type=str, default=None, help="Write results to this file")
+    args = parser.parse_args()
+    
+    results = {}
+    failures = []
+    for name, (_, _, must_stay_light) in MODES.items():
+        if name == "model_chat" and args.skip_model:
+            continue
+        result = run_mode(name, args.repeat)
+        results[name] = result
+        if "error" in result:
+            print(f"{name:16s} ERROR {result['error']}")
+            if must_stay_light:
+                failures.append(f"{name} failed to run")
+            continue
+        print(f"{name:16s} import {result['import_ms']:8.1f} ms   first response {result['first_response_ms']:8.1f} ms"
+              f"   heavy: {', '.join(result['heavy_modules']) or '-'}")
+        if must_stay_light and result["heavy_modules"]:
+            failures.append(f"{name} imported {', '.join(result['heavy_modules'])}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK: fast paths stay free of heavy frameworks")
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,14 @@
 GrokBeast v5 - A problem hunting AI assistant
 """
 
-from .agent_model import GrokAgent
 from .chat_command_generator import parse_chat_instruction, execute_command
 
 __version__ = "5.0.0"
-__all__ = ["GrokAgent", "parse_chat_instruction", "execute_command"] 
\ No newline at end of file
+__all__ = ["GrokAgent", "parse_chat_instruction", "execute_command"]
+
+def __getattr__(name):
+    # GrokAgent is loaded on first access so importing the package stays light
+    if name == "GrokAgent":
+        from .agent_model import GrokAgent
+        return GrokAgent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,11 +2,36 @@ import os
 import json
 import logging
 from pathlib import Path
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
 from typing import Optional, Dict, Any
-import torch
 import random
 import re
+import threading
+import time
+
+try:
+    from .batching import MicroBatcher
+    from .config import cache_budget_bytes, get_setting
+    from .dedup import DedupIndex
+    from .hunting import hunt_problems_batch
+    from .metrics import CACHE_LOOKUPS, ERRORS, FALLBACKS, MODEL_MEMORY, model_memory_bytes, stage_timer, timed
+    from .model_loader import load_causal_lm
+    from .prefix_cache import PrefixCache, supports_prefix_reuse
+    from .problems import ProblemSet, pain_level
+    from .ranking import DEFAULT_WEIGHTS, weighted_score
+    from .quantization import quantize_dynamic_int8, quantize_with_guard
+    from .response_cache import ResponseCache, make_key
+except ImportError:
+    from batching import MicroBatcher
+    from config import cache_budget_bytes, get_setting
+    from dedup import DedupIndex
+    from hunting import hunt_problems_batch
+    from metrics import CACHE_LOOKUPS, ERRORS, FALLBACKS, MODEL_MEMORY, model_memory_bytes, stage_timer, timed
+    from model_loader import load_causal_lm
+    from prefix_cache import PrefixCache, supports_prefix_reuse
+    from problems import ProblemSet, pain_level
+    from ranking import DEFAULT_WEIGHTS, weighted_score
+    from quantization import quantize_dynamic_int8, quantize_with_guard
+    from response_cache import ResponseCache, make_key
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -17,32 +42,323 @@ BASE_DIR = Path(__file__).parent.parent
 CONFIG_FILE = BASE_DIR / "config" / "config.json"
 COMMAND_EXAMPLES_FILE = BASE_DIR / "config" / "command_examples.json"
 
+# Fixed system preambles; their KV state is computed once and reused
+GROK_STYLE_PREFIX = "You are an energetic AI assistant. Keep responses short, punchy and full of energy."
+CHAT_PREFIX = "You are an energetic AI assistant. Keep responses short and engaging."
+
+# Keywords that mark a line as describing a problem (matched against lowercased text)
+PROBLEM_KEYWORDS = ["problem", "pain", "frustrat", "struggle", "need", "can't", "difficult"]
+PROBLEM_KEYWORD_PATTERN = re.compile("|".join(re.escape(kw) for kw in PROBLEM_KEYWORDS))
+
+# Numbering and quote prefixes, stripped in this order (each followed by whitespace)
+PROBLEM_PREFIXES = ["- ", "1. ", "2. ", "3. ", "4. ", "5. ", '"', "'"]
+PROBLEM_PREFIX_PATTERN = re.compile(
+    "^" + "".join(f"(?:{re.escape(prefix)}\\s*)?" for prefix in PROBLEM_PREFIXES)
+)
+
+# Amount of text scanned per block when hunting
+HUNT_BLOCK_SIZE = 1 << 20
+
+def iter_text_blocks(source, block_size=HUNT_BLOCK_SIZE):
+    """Split input into blocks of whole lines without materialising every line
+    
+    Args:
+        source (str or iterable): Text, or an iterable of lines such as an open file
+        block_size (int): Approximate number of characters per block
+    
+    Yields:
+        str: Newline-joined lines
+    """
+    if isinstance(source, str):
+        start = 0
+        while True:
+            end = source.find("\n", start + block_size)
+            if end == -1:
+                yield source[start:]
+                return
+            yield source[start:end]
+            start = end + 1
+    
+    lines = []
+    size = 0
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", "replace")
+        if line.endswith("\n"):
+            line = line[:-1]
+        lines.append(line)
+        size += len(line) + 1
+        if size >= block_size:
+            yield "\n".join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield "\n".join(lines)
+
+def iter_problem_lines(source, block_size=HUNT_BLOCK_SIZE):
+    """Yield the lines that contain a problem keyword, in input order
+    
+    Each block is lowercased once and scanned with a single compiled
+    pattern, so lines without a keyword are skipped without being split
+    out. This matches `any(kw in line.lower() for kw in PROBLEM_KEYWORDS)`.
+    
+    Args:
+        source (str or iterable): Text, or an iterable of lines
+        block_size (int): Approximate number of characters scanned at once
+    
+    Yields:
+        str: Matching lines, unstripped
+    """
+    for block in iter_text_blocks(source, block_size):
+        lowered = block.lower()
+        if len(lowered) != len(block):
+            # Some characters lowercase to several (e.g. "İ"), so offsets
+            # no longer line up; check this block line by line instead
+            for line in block.split("\n"):
+                if PROBLEM_KEYWORD_PATTERN.search(line.lower()):
+                    yield line
+            continue
+        
+        pos = 0
+        while True:
+            match = PROBLEM_KEYWORD_PATTERN.search(lowered, pos)
+            if match is None:
+                break
+            line_start = lowered.rfind("\n", 0, match.start()) + 1
+            line_end = lowered.find("\n", match.end())
+            if line_end == -1:
+                yield block[line_start:]
+                break
+            yield block[line_start:line_end]
+            pos = line_end + 1
+
 class GrokAgent:
     """GrokBeast AI agent for problem hunting and command generation"""
     
-    def __init__(self):
+    def __init__(self, load_model=True):
+        """
+        Args:
+            load_model (bool): Load the language model; False gives a
+                lightweight rule-based agent (e.g. for hunting workers)
+        """
         self.use_fallback = False
         self.device = "cuda" if os.getenv("GROK_USE_CUDA", "1") == "1" else "cpu"
+        self.model_id = os.getenv("GROK_MODEL_ID") or get_setting("model.name", "gpt2")
         self.model = None
         self.tokenizer = None
         self.pipeline = None
+        self.batcher = None
+        self.prefix_cache = None
+        self.response_cache = None
+        # Serialises model calls that share KV state (prefix cache, batches)
+        self._model_lock = threading.Lock()
+        self.quantization_report = None
+        self.load_report = None
         self.personality_templates = {}
         self.fallback_responses = {}
         
         # Check if fallback mode is enabled
-        if os.getenv("GROK_USE_FALLBACK") == "1":
-            logger.info("Starting GrokBeast in fallback mode")
+        if os.getenv("GROK_USE_FALLBACK") == "1" or not load_model:
+            if load_model:
+                logger.info("Starting GrokBeast in fallback mode")
             self.use_fallback = True
             self._setup_templates()
             return
-            
+        
         try:
             self._setup_templates()
             self._load_model()
+            self._setup_batcher()
+            self._setup_prefix_cache()
+            self._setup_response_cache()
         except Exception as e:
             logger.error(f"Error initializing model: {e}")
+            ERRORS.inc(stage="model_load")
             self.use_fallback = True
-            
+    
+    def _load_model(self):
+        """Load the tokenizer, model and text-generation pipeline"""
+        # Heavy frameworks are imported only when a model is actually needed
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+        
+        if self.device == "cuda" and not torch.cuda.is_available():
+            logger.warning("CUDA requested but not available, using CPU")
+            self.device = "cpu"
+        
+        logger.info(f"Loading model {self.model_id} on {self.device}")
+        snapshot = get_setting("model.snapshot", {}) or {}
+        if snapshot.get("enabled", True):
+            # Weights are mmapped from a local safetensors snapshot, shared between processes
+            self.model, self.tokenizer, self.load_report = load_causal_lm(
+                self.model_id,
+                BASE_DIR / snapshot.get("dir", "cache/snapshots"),
+                auto_convert=snapshot.get("auto_convert", False),
+            )
+        else:
+            start = time.perf_counter()
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_id)
+            self.model = AutoModelForCausalLM.from_pretrained(self.model_id)
+            self.load_report = {"loader": "from_pretrained", "seconds": round(time.perf_counter() - start, 3)}
+        logger.info(f"Model weights loaded via {self.load_report['loader']} in {self.load_report['seconds']}s")
+        self.model.to(self.device)
+        self.model.eval()
+        
+        # Batched generation needs a pad token; pad on the left for decoder-only models
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.tokenizer.padding_side = "left"
+        self.model.generation_config.pad_token_id = self.tokenizer.pad_token_id
+        
+        # Optional int8 weights for CPU-only hosts
+        if self.device == "cpu" and get_setting("model.quantization", "none") == "dynamic_int8":
+            self._quantize_model()
+        
+        self.pipeline = pipeline(
+            "text-generation",
+            model=self.model,
+            tokenizer=self.tokenizer,
+            device=0 if self.device == "cuda" else -1,
+        )
+        
+        # Dynamically quantized weights are packed outside parameters(), use the measured size
+        if self.quantization_report and self.quantization_report.get("accepted") and "candidate_bytes" in self.quantization_report:
+            MODEL_MEMORY.set(self.quantization_report["candidate_bytes"], model=self.model_id)
+        else:
+            MODEL_MEMORY.set(model_memory_bytes(self.model), model=self.model_id)
+    
+    def _quantize_model(self):
+        """Apply dynamic int8 quantization, optionally guarded by an output comparison"""
+        if get_setting("model.quantization_guard", True):
+            self.model, self.quantization_report = quantize_with_guard(
+                self.model,
+                self.tokenizer,
+                min_agreement=get_setting("model.quantization_min_agreement", 0.5),
+            )
+        else:
+            self.model = quantize_dynamic_int8(self.model)
+            self.quantization_report = {"accepted": True}
+    
+    def _setup_batcher(self):
+        """Put a micro-batching scheduler in front of the pipeline if enabled"""
+        settings = get_setting("model.batching", {}) or {}
+        if not settings.get("enabled", True):
+            return
+        self.batcher = MicroBatcher(
+            self._pipeline_batch,
+            max_batch_size=settings.get("max_batch_size", 8),
+            max_wait_ms=settings.get("max_wait_ms", 10),
+            model_lock=self._model_lock,
+        )
+    
+    def _setup_prefix_cache(self):
+        """Create the KV cache for the fixed system preambles"""
+        settings = get_setting("model.prefix_cache", {}) or {}
+        enabled = settings.get("enabled", True)
+        if enabled and not supports_prefix_reuse():
+            logger.warning("Prefix KV reuse needs a newer transformers release, prefilling prompts in full")
+            enabled = False
+        self.prefix_cache = PrefixCache(
+            self.model,
+            self.tokenizer,
+            self.model_id,
+            device=self.device,
+            max_entries=settings.get("max_entries", 8),
+            enabled=enabled,
+        )
+    
+    def _setup_response_cache(self):
+        """Create the generate() response cache from the cache settings"""
+        if not get_setting("cache.enabled", True):
+            return
+        cache_dir = None
+        if get_setting("cache.responses_on_disk", True):
+            cache_dir = BASE_DIR / get_setting("cache.dir", "cache") / "responses"
+        self.response_cache = ResponseCache(
+            max_bytes=cache_budget_bytes("response_memory"),
+            ttl_seconds=get_setting("cache_ttl_minutes", 60) * 60,
+            disk_dir=cache_dir,
+            cleanup_interval_seconds=get_setting("cache.cleanup_interval_hours", 24) * 3600,
+            disk_max_bytes=cache_budget_bytes("response_disk"),
+        )
+    
+    def _pipeline_batch(self, prompts, kwargs):
+        """Run one batched pipeline call
+        
+        Args:
+            prompts (list): Input prompts
+            kwargs (dict): Generation arguments shared by all prompts
+        
+        Returns:
+            list: Generated text (including the prompt) for each input
+        """
+        outputs = self.pipeline(prompts, batch_size=len(prompts), **kwargs)
+        return [output[0]["generated_text"] for output in outputs]
+    
+    def _max_new_tokens(self, prompt, max_length):
+        """Turn a limit on prompt plus output tokens into a limit on new tokens
+        
+        In a batched call max_length would also count the left padding of
+        shorter prompts, so their output would depend on the rest of the
+        batch. The batcher only groups requests with equal arguments, so
+        with max_new_tokens it batches prompts of the same length together.
+        
+        Args:
+            prompt (str): Input prompt
+            max_length (int): Maximum length of prompt and generated text in tokens
+        
+        Returns:
+            int: Tokens left for generation (at least 1)
+        """
+        return max(1, max_length - len(self.tokenizer(prompt)["input_ids"]))
+    
+    def _run_pipeline(self, prompt, **kwargs):
+        """Generate text for a single prompt, batching with concurrent callers
+        
+        Args:
+            prompt (str): Input prompt
+            **kwargs: Generation arguments passed to the pipeline
+        
+        Returns:
+            str: Generated text including the prompt
+        """
+        with stage_timer("generate"):
+            if self.batcher is not None:
+                return self.batcher.submit(prompt, **kwargs)
+            with self._model_lock:
+                return self.pipeline(prompt, num_return_sequences=1, **kwargs)[0]["generated_text"]
+    
+    def _run_prefixed(self, prefix, prompt, **kwargs):
+        """Generate text for a prompt that starts with a fixed preamble
+        
+        An idle agent decodes straight from the cached prefix state, which
+        cuts prefill latency. While other requests are queued, or another
+        call holds the model, the prompt goes through the micro-batcher
+        instead, where throughput matters more. Prefix-cache calls hold the
+        same lock as batched calls, so the two never run on the model at
+        once.
+        
+        Args:
+            prefix (str): Fixed preamble at the start of the prompt
+            prompt (str): Input prompt
+            **kwargs: Generation arguments
+        
+        Returns:
+            str: Generated text including the prompt
+        """
+        if self.prefix_cache is None:
+            return self._run_pipeline(prompt, **kwargs)
+        if self.batcher is None:
+            with self._model_lock:
+                return self.prefix_cache.generate(prefix, prompt, **kwargs)
+        # A request queued after this check waits for the lock in the batcher
+        if not self.batcher.in_flight() and self._model_lock.acquire(blocking=False):
+            try:
+                return self.prefix_cache.generate(prefix, prompt, **kwargs)
+            finally:
+                self._model_lock.release()
+        return self._run_pipeline(prompt, **kwargs)
+    
     def _setup_templates(self):
         """Set up personality templates and fallback responses"""
         # Personality templates
@@ -116,7 +432,7 @@ class GrokAgent:
         Args:
             message_type (str): Type of message (problem, success, hunting, tweet)
             base_text (str): Text to convert
-            
+        
         Returns:
             str: Styled text
         """
@@ -170,30 +486,38 @@ class GrokAgent:
             temperature (float): Sampling temperature
             top_p (float): Nucleus sampling parameter
             grok_style (bool): Whether to apply personality style to the output
-            
+        
         Returns:
             str: Generated text
         """
         try:
             if self.pipeline:
+                # Identical requests to the same model are served from the cache
+                cache_key = None
+                if self.response_cache is not None:
+                    cache_key = make_key(prompt, temperature, top_p, max_length, grok_style, self.model_id)
+                    cached = self.response_cache.get(cache_key)
+                    CACHE_LOOKUPS.inc(cache="response", result="hit" if cached is not None else "miss")
+                    if cached is not None:
+                        return cached
+                
                 # Add system prompt if grok_style is True
                 if grok_style:
-                    grok_prompt = (
-                        "You are an energetic AI assistant. "
-                        "Keep responses short, punchy and full of energy.\n\n"
-                        f"Prompt: {prompt}\n\nResponse:"
-                    )
+                    grok_prompt = f"{GROK_STYLE_PREFIX}\n\nPrompt: {prompt}\n\nResponse:"
                 else:
                     grok_prompt = prompt
                 
                 # Use shorter sequences and simpler parameters
-                response = self.pipeline(
-                    grok_prompt,
-                    max_length=min(max_length, 256),  # Limit max length
+                generation_args = dict(
+                    max_new_tokens=self._max_new_tokens(grok_prompt, min(max_length, 256)),  # Limit max length
                     do_sample=True,
                     temperature=temperature,
-                    num_return_sequences=1,
-                )[0]["generated_text"]
+                )
+                
+                if grok_style:
+                    response = self._run_prefixed(GROK_STYLE_PREFIX, grok_prompt, **generation_args)
+                else:
+                    response = self._run_pipeline(grok_prompt, **generation_args)
                 
                 # Return only the newly generated text (remove the prompt)
                 generated_text = response[len(grok_prompt):].strip()
@@ -203,9 +527,12 @@ class GrokAgent:
                     # If the model didn't generate in style, apply our template
                     generated_text = self.grokify_text(generated_text)
                 
+                if cache_key is not None:
+                    self.response_cache.put(cache_key, generated_text)
                 return generated_text
             else:
                 # Fallback simple response
+                FALLBACKS.inc(kind="generate")
                 fallbacks = [
                     "Task completed successfully!",
                     "Operation finished!",
@@ -216,14 +543,16 @@ class GrokAgent:
                 return random.choice(fallbacks)
         except Exception as e:
             logger.error(f"Error in text generation: {e}")
+            ERRORS.inc(stage="generate")
             return f"Error encountered: {str(e)}"
     
+    @timed("grokify")
     def grokify_text(self, text):
         """Convert regular text to personality style
         
         Args:
             text (str): Regular text
-            
+        
         Returns:
             str: Styled text
         """
@@ -243,14 +572,19 @@ class GrokAgent:
         endings = [" Task complete!", " Operation successful!", " Analysis complete!", " Update complete!", ""]
         
         return random.choice(intros) + " ".join(words) + random.choice(endings)
-            
-    def hunt_problems(self, source_text, count=3):
+    
+    @timed("hunt")
+    def hunt_problems(self, source_text, count=3, dedup=None):
         """Extract problems from source text
         
         Args:
-            source_text (str): Text to extract problems from
+            source_text (str or iterable): Text to extract problems from, or an
+                iterable of lines such as an open file; lines are processed
+                one at a time and reading stops once enough problems are found
             count (int): Number of problems to extract
-            
+            dedup (DedupIndex): Skip problems already recorded (tweeted) in earlier
+                runs; no generic filler problems are added when an index is given
+        
         Returns:
             list: List of extracted problems
         """
@@ -258,16 +592,14 @@ class GrokAgent:
         problems = []
         
         # Look for problem indicators in the text
-        lines = source_text.split('\n')
-        for line in lines:
-            if any(kw in line.lower() for kw in ["problem", "pain", "frustrat", "struggle", "need", "can't", "difficult"]):
-                problem_text = line.strip()
+        if count > 0:
+            for line in iter_problem_lines(source_text):
                 # Remove numbering and quotes
-                for prefix in ["- ", "1. ", "2. ", "3. ", "4. ", "5. ", '"', "'"]:
-                    if problem_text.startswith(prefix):
-                        problem_text = problem_text[len(prefix):].strip()
+                problem_text = PROBLEM_PREFIX_PATTERN.sub("", line.strip(), count=1)
                 
                 if len(problem_text) > 10:  # Ensure it's a substantial problem
+                    if dedup is not None and dedup.seen(problem_text):
+                        continue
                     pain_level = random.randint(5, 9)  # Random pain level
                     problem_data = {
                         "problem": problem_text,
@@ -276,12 +608,13 @@ class GrokAgent:
                         "grok_comment": self.grok_speak("problem", problem_text)
                     }
                     problems.append(problem_data)
-            
-            if len(problems) >= count:
-                break
-                        
+                    
+                    if len(problems) >= count:
+                        break
+        
         # If we don't have enough problems, create some generic ones
-        while len(problems) < count:
+        # (fillers are repeats by construction, so not when deduplicating)
+        while dedup is None and len(problems) < count:
             generic_problem = f"Generic problem #{len(problems)+1}"
             problems.append({
                 "problem": generic_problem,
@@ -289,26 +622,71 @@ class GrokAgent:
                 "reach": "General",
                 "grok_comment": self.grok_speak("problem", generic_problem)
             })
-            
+        
         return problems
-
-    def rank_problems(self, problems):
+    
+    def hunt_problems_batch(self, documents, count=3, workers=None, chunksize=None, seed=None):
+        """Extract problems from many documents in parallel
+        
+        Args:
+            documents (list): Source texts, one per document
+            count (int): Number of problems to extract per document
+            workers (int): Worker processes (defaults to the CPU count)
+            chunksize (int): Documents sent to a worker per dispatch
+            seed (int): Seed per-document randomness for reproducible output
+        
+        Returns:
+            dict: Per-document results in input order plus throughput stats
+        """
+        return hunt_problems_batch(documents, count=count, workers=workers, chunksize=chunksize, seed=seed)
+    
+    @timed("rank")
+    def rank_problems(self, problems, dedup=None):
         """Rank a list of problems by importance
         
+        Problems are scored with the weights in hunting.ranking.weights and
+        those below hunting.min_pain_level are dropped. The input dicts are
+        left untouched.
+        
         Args:
-            problems (list): List of problem dictionaries
-            
+            problems (list or ProblemSet): Problem dictionaries (or Problems), or a
+                columnar ProblemSet, which is scored without building records
+            dedup (DedupIndex): Drop problems recorded in the index and near-duplicates
+                of earlier problems in this list; nothing is added to the index and,
+                since hunt_problems already counted these lookups, nothing is counted
+        
         Returns:
-            list: Ranked list of problems
+            list: Ranked copies of the problems with rank_score and rank_comment
         """
+        if dedup is not None:
+            # Near-duplicates within the list are caught by a throwaway in-memory index
+            batch = DedupIndex(max_distance=dedup.max_distance, bands=dedup.bands)
+            problems = [
+                problem for problem in problems
+                if not dedup.contains(problem.get("problem", ""), key=problem.get("url"))
+                and not batch.check_and_add(problem.get("problem", ""), key=problem.get("url"))
+            ]
+        
         if not problems:
             return []
-            
-        # Simple sorting by pain level
-        ranked = sorted(problems, key=lambda x: x.get("pain", 0), reverse=True)
+        
+        # Score on the configured factors; a stable sort keeps ties in input order
+        weights = get_setting("hunting.ranking.weights", DEFAULT_WEIGHTS)
+        min_pain = get_setting("hunting.min_pain_level", None)
+        if isinstance(problems, ProblemSet):
+            scored = problems.top(len(problems), weights, min_pain=min_pain)
+        else:
+            scored = [
+                (weighted_score(problem, weights), problem) for problem in problems
+                if min_pain is None or pain_level(problem) >= min_pain
+            ]
+            scored.sort(key=lambda item: item[0], reverse=True)
         
         # Add comments about the ranking
-        for i, problem in enumerate(ranked):
+        ranked = []
+        for i, (score, problem) in enumerate(scored):
+            problem = dict(problem, rank_score=round(score, 3))
+            ranked.append(problem)
             rank_comment = ""
             if i == 0:
                 rank_comment = f"Top priority! Pain level: {problem['pain']}/10"
@@ -318,15 +696,15 @@ class GrokAgent:
                 rank_comment = f"Problem #{i+1} - Pain level: {problem['pain']}/10"
             
             problem["rank_comment"] = rank_comment
-            
+        
         return ranked
-            
+    
     def create_tweet(self, problem):
         """Create a tweet about a problem
         
         Args:
             problem (dict): Problem dictionary
-            
+        
         Returns:
             str: Tweet text
         """
@@ -351,18 +729,15 @@ class GrokAgent:
         # Ensure it's within Twitter limits
         return tweet[:280]
     
-    def chat_response(self, user_input):
-        """Generate a chat response
+    def _canned_chat_response(self, clean_input):
+        """Return a keyword or template response when the model is not used
         
         Args:
-            user_input (str): User's chat message
-            
+            clean_input (str): Stripped, lowercased user message
+        
         Returns:
-            str: Response
+            str: Response, or None if the model should answer
         """
-        # Clean the input for safety
-        clean_input = user_input.strip().lower()
-        
         # Check for fallback responses based on keywords
         for key, responses in self.fallback_responses.items():
             if key in clean_input:
@@ -382,39 +757,172 @@ class GrokAgent:
             response = template.format(topic=topic)
             wrapper = random.choice(self.grok_templates["chat_responses"])
             return wrapper.format(msg=response)
-            
+        
+        return None
+    
+    def _chat_prompt(self, clean_input):
+        """Build the model prompt for a chat message"""
+        return f"{CHAT_PREFIX}\n\nUser: {clean_input}\n\nResponse:"
+    
+    @timed("postprocess")
+    def _finish_chat_text(self, generated_text):
+        """Post-process generated chat text
+        
+        Args:
+            generated_text (str): Raw model output after the prompt
+        
+        Returns:
+            str: Styled, cleaned and length-limited response
+        """
+        # If the response doesn't have energy, apply our template
+        if not any(marker in generated_text for marker in ["Here", "Analysis", "Update", "Status"]):
+            generated_text = self.grokify_text(generated_text)
+        
+        # Clean up any recursive prefixes that might have slipped through
+        generated_text = re.sub(r'(Grok 3:?\s*)+', '', generated_text)
+        
+        # Limit response length
+        if len(generated_text) > 500:
+            generated_text = generated_text[:497] + "..."
+        
+        return generated_text
+    
+    def chat_response(self, user_input):
+        """Generate a chat response
+        
+        Args:
+            user_input (str): User's chat message
+        
+        Returns:
+            str: Response
+        """
+        # Clean the input for safety
+        clean_input = user_input.strip().lower()
+        
+        canned = self._canned_chat_response(clean_input)
+        if canned is not None:
+            FALLBACKS.inc(kind="chat")
+            return canned
+        
         # Use the actual model if available
         try:
             # Create a simple prompt with the system message and user input
-            prompt = f"You are an energetic AI assistant. Keep responses short and engaging.\n\nUser: {clean_input}\n\nResponse:"
+            prompt = self._chat_prompt(clean_input)
             
-            # Generate response
-            response = self.pipeline(
+            # Generate response (a fixed token budget lets concurrent chats batch together)
+            response = self._run_prefixed(
+                CHAT_PREFIX,
                 prompt,
-                max_length=len(prompt) + 150,  # Limit max length
+                max_new_tokens=150,  # Limit response length
                 do_sample=True,
                 temperature=0.8,
-                num_return_sequences=1,
-            )[0]["generated_text"]
+            )
             
             # Extract only the response part
             generated_text = response.split("Response:")[-1].strip()
             
-            # If the response doesn't have energy, apply our template
-            if not any(marker in generated_text for marker in ["Here", "Analysis", "Update", "Status"]):
-                generated_text = self.grokify_text(generated_text)
-            
-            # Clean up any recursive prefixes that might have slipped through
-            generated_text = re.sub(r'(Grok 3:?\s*)+', '', generated_text)
-            
-            # Limit response length
-            if len(generated_text) > 500:
-                generated_text = generated_text[:497] + "..."
-                
-            return generated_text
+            return self._finish_chat_text(generated_text)
         except Exception as e:
             logger.error(f"Error in chat response: {e}")
+            ERRORS.inc(stage="chat")
             return f"Error encountered: {str(e)}"
+    
+    def stream_chat_response(self, user_input):
+        """Generate a chat response incrementally
+        
+        Tokens are yielded as soon as they are decoded. The last event
+        carries the fully post-processed response, matching what
+        chat_response would have returned for the same generation.
+        
+        Args:
+            user_input (str): User's chat message
+        
+        Yields:
+            tuple: ("token", text) for each decoded chunk, then ("done", response)
+        """
+        clean_input = user_input.strip().lower()
+        
+        canned = self._canned_chat_response(clean_input)
+        if canned is not None:
+            FALLBACKS.inc(kind="chat")
+            yield ("token", canned)
+            yield ("done", canned)
+            return
+        
+        from transformers import StoppingCriteriaList, TextIteratorStreamer
+        
+        stop = threading.Event()
+        locked = False
+        try:
+            prompt = self._chat_prompt(clean_input)
+            # Hold the model from the prefill to the end of generation, like batched
+            # and prefix-cache calls; the generation thread releases it
+            self._model_lock.acquire()
+            locked = True
+            inputs = self.prefix_cache.prepare(CHAT_PREFIX, prompt)
+            streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+            generation_args = dict(
+                **inputs,
+                streamer=streamer,
+                max_new_tokens=150,
+                do_sample=True,
+                temperature=0.8,
+                stopping_criteria=StoppingCriteriaList([
+                    _event_stopping_criteria(stop),
+                    self.prefix_cache.prefill_timer("past_key_values" in inputs),
+                ]),
+            )
+            
+            def run():
+                try:
+                    self.model.generate(**generation_args)
+                finally:
+                    self._model_lock.release()
+            
+            worker = threading.Thread(target=run, daemon=True)
+            worker.start()
+            locked = False
+            
+            # Stream raw text until the response length limit is reached
+            parts = []
+            streamed = 0
+            for chunk in streamer:
+                if not chunk:
+                    continue
+                if streamed + len(chunk) > 500:
+                    chunk = chunk[:500 - streamed]
+                    stop.set()
+                parts.append(chunk)
+                streamed += len(chunk)
+                if chunk:
+                    yield ("token", chunk)
+                if stop.is_set():
+                    break
+            stop.set()
+            
+            yield ("done", self._finish_chat_text("".join(parts).strip()))
+        except Exception as e:
+            stop.set()
+            logger.error(f"Error in streaming chat response: {e}")
+            ERRORS.inc(stage="chat_stream")
+            yield ("done", f"Error encountered: {str(e)}")
+        finally:
+            # A client that went away stops generation, so the model is freed soon
+            stop.set()
+            if locked:
+                self._model_lock.release()
+
+
+def _event_stopping_criteria(event):
+    """Build a stopping criterion that ends generation once an event is set"""
+    import torch
+    from transformers import StoppingCriteria
+    
+    class EventStoppingCriteria(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), event.is_set(), dtype=torch.bool, device=input_ids.device)
+    
+    return EventStoppingCriteria()
 
 
 # Test the model
@@ -0,0 +1,138 @@
+"""
+Process-wide registry that keeps one warm GrokAgent per process
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+try:
+    from .metrics import STAGE_SECONDS
+except ImportError:
+    from metrics import STAGE_SECONDS
+
+logger = logging.getLogger("GrokBeast")
+
+def _default_factory():
+    """Build the standard GrokAgent (imported lazily to keep startup fast)"""
+    try:
+        from .agent_model import GrokAgent
+    except ImportError:
+        from agent_model import GrokAgent
+    return GrokAgent()
+
+class AgentRegistry:
+    """Thread-safe holder for a long-lived GrokAgent
+    
+    The agent is built at most once; every caller gets the same warm
+    instance. Construction happens outside the fast path so concurrent
+    requests arriving during the first load simply wait for it.
+    """
+    
+    def __init__(self, factory=None):
+        self._factory = factory or _default_factory
+        self._agent = None
+        self._lock = threading.Lock()
+        self._loading = False
+        self._load_seconds = None
+        self._loaded_at = None
+        self._load_error = None
+        
+    def get_agent(self):
+        """Return the shared agent, loading it on first use
+        
+        Returns:
+            GrokAgent: The warm agent instance
+        """
+        agent = self._agent
+        if agent is not None:
+            return agent
+            
+        with self._lock:
+            if self._agent is None:
+                self._loading = True
+                start = time.perf_counter()
+                try:
+                    self._agent = self._factory()
+                    self._load_error = None
+                except Exception as e:
+                    self._load_error = str(e)
+                    raise
+                finally:
+                    self._loading = False
+                    self._load_seconds = time.perf_counter() - start
+                    self._loaded_at = datetime.now().isoformat()
+                    STAGE_SECONDS.observe(self._load_seconds, stage="agent_load")
+                logger.info(f"Agent loaded in {self._load_seconds:.2f}s")
+            return self._agent
+    
+    def warm_up(self):
+        """Load the agent eagerly, e.g. at server start
+        
+        Returns:
+            GrokAgent: The warm agent instance
+        """
+        return self.get_agent()
+    
+    def is_warm(self):
+        """Check whether the agent has already been loaded"""
+        return self._agent is not None
+    
+    def reset(self):
+        """Drop the current agent so the next call reloads it"""
+        with self._lock:
+            self._agent = None
+            self._load_seconds = None
+            self._loaded_at = None
+    
+    def status(self):
+        """Describe the registry state for status reports
+        
+        Returns:
+            dict: Warm/cold state, load time and model details
+        """
+        agent = self._agent
+        if agent is not None:
+            state = "warm"
+        elif self._loading:
+            state = "loading"
+        else:
+            state = "cold"
+            
+        info = {
+            "state": state,
+            "load_seconds": round(self._load_seconds, 3) if self._load_seconds is not None else None,
+            "loaded_at": self._loaded_at,
+        }
+        if self._load_error:
+            info["error"] = self._load_error
+        if agent is not None:
+            info["model_id"] = getattr(agent, "model_id", None)
+            info["device"] = getattr(agent, "device", None)
+            info["fallback"] = getattr(agent, "use_fallback", True)
+            batcher = getattr(agent, "batcher", None)
+            if batcher is not None:
+                info["batching"] = batcher.stats()
+            if getattr(agent, "load_report", None):
+                info["model_load"] = agent.load_report
+            if getattr(agent, "quantization_report", None):
+                info["quantization"] = agent.quantization_report
+            prefix_cache = getattr(agent, "prefix_cache", None)
+            if prefix_cache is not None:
+                info["prefix_cache"] = prefix_cache.stats()
+            response_cache = getattr(agent, "response_cache", None)
+            if response_cache is not None:
+                info["response_cache"] = response_cache.stats()
+        return info
+
+# Shared registry for this process
+_registry = AgentRegistry()
+
+def get_registry():
+    """Return the process-wide agent registry"""
+    return _registry
+
+def get_agent():
+    """Return the process-wide warm agent"""
+    return _registry.get_agent()
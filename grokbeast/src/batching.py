@@ -0,0 +1,138 @@
+"""
+Dynamic micro-batching for text generation requests
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger("GrokBeast")
+
+class MicroBatcher:
+    """Collect concurrent generation requests into batched calls
+    
+    Callers block in submit() while a single worker thread gathers
+    requests for up to max_wait_ms (or until max_batch_size is reached),
+    runs one batched call per distinct set of generation arguments and
+    hands each result back to its caller. Each call holds `model_lock`,
+    so code driving the same model outside the batcher can take the lock
+    to keep its calls from overlapping a batch.
+    """
+    
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=10, model_lock=None):
+        """
+        Args:
+            run_batch (callable): Function taking (prompts, kwargs) and returning
+                one output per prompt, in order
+            max_batch_size (int): Largest number of prompts per batched call
+            max_wait_ms (float): How long to wait for more requests once
+                the first one has arrived
+            model_lock (threading.Lock): Lock held around each batched call
+                (a new one by default)
+        """
+        self._run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.model_lock = model_lock or threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self._in_flight = 0
+        
+    def _ensure_worker(self):
+        """Start the worker thread (again after a fork)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._worker, name="grok-batcher", daemon=True)
+                self._thread.start()
+    
+    def submit(self, prompt, **kwargs):
+        """Queue a prompt and wait for its result
+        
+        Args:
+            prompt (str): Input prompt
+            **kwargs: Generation arguments; only requests with identical
+                arguments are batched together
+                
+        Returns:
+            The output produced for this prompt
+        """
+        self._ensure_worker()
+        future = Future()
+        key = tuple(sorted(kwargs.items()))
+        with self._lock:
+            self._in_flight += 1
+        try:
+            self._queue.put((key, prompt, kwargs, future))
+            return future.result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+    
+    def in_flight(self):
+        """Return the number of submitted requests still waiting for a result"""
+        return self._in_flight
+    
+    def _collect(self):
+        """Block for one request, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _worker(self):
+        """Serve batches forever"""
+        while True:
+            batch = self._collect()
+            
+            # Only requests with the same generation arguments can share a call
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[0], []).append(item)
+                
+            for items in groups.values():
+                prompts = [item[1] for item in items]
+                kwargs = items[0][2]
+                try:
+                    with self.model_lock:
+                        outputs = self._run_batch(prompts, kwargs)
+                    for item, output in zip(items, outputs):
+                        item[3].set_result(output)
+                except Exception as e:
+                    logger.error(f"Error in batched generation: {e}")
+                    for item in items:
+                        item[3].set_exception(e)
+                self.batches += 1
+                self.requests += len(items)
+    
+    def stats(self):
+        """Return batching counters
+        
+        Returns:
+            dict: Batch count, request count and average batch size
+        """
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0,
+            "in_flight": self._in_flight,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
@@ -5,14 +5,51 @@ import time
 import re
 import random
 import argparse
-import requests
+import queue
 from datetime import datetime
 from pathlib import Path
 
+try:
+    from .agent_registry import get_registry
+    from .config import cache_budget_bytes, get_setting, load_config
+    from .dedup import DedupIndex
+    from .feeds import SeenItems, item_text, read_new_items
+    from .history import CommandHistory
+    from .hunting import hunt_problems_batch, load_cache_documents
+    from .ingestion import DEFAULT_USER_AGENT, IngestionClient, source_urls
+    from .intents import check_examples, get_intent_engine
+    from .jobs import JobQueue
+    from .model_loader import convert_to_snapshot, load_snapshot
+    from .metrics import (COMMAND_SECONDS, CONTENT_TYPE, ERRORS, HTTP_REQUEST_SECONDS, HTTP_REQUESTS,
+                          QUEUE_DEPTH, STAGE_SECONDS, SharedMetrics, render_metrics, timed)
+    from .ranking import DEFAULT_WEIGHTS, TopKRanker
+    from .scheduler import HuntScheduler, TokenBucket
+    from .serving import PreforkServer
+    from .shell_executor import ShellExecutor
+    from .singleflight import SingleFlight
+    from .store import ResultStore
+except ImportError:
+    from agent_registry import get_registry
+    from config import cache_budget_bytes, get_setting, load_config
+    from dedup import DedupIndex
+    from feeds import SeenItems, item_text, read_new_items
+    from history import CommandHistory
+    from hunting import hunt_problems_batch, load_cache_documents
+    from ingestion import DEFAULT_USER_AGENT, IngestionClient, source_urls
+    from intents import check_examples, get_intent_engine
+    from jobs import JobQueue
+    from model_loader import convert_to_snapshot, load_snapshot
+    from metrics import (COMMAND_SECONDS, CONTENT_TYPE, ERRORS, HTTP_REQUEST_SECONDS, HTTP_REQUESTS,
+                         QUEUE_DEPTH, STAGE_SECONDS, SharedMetrics, render_metrics, timed)
+    from ranking import DEFAULT_WEIGHTS, TopKRanker
+    from scheduler import HuntScheduler, TokenBucket
+    from serving import PreforkServer
+    from shell_executor import ShellExecutor
+    from singleflight import SingleFlight
+    from store import ResultStore
+
 # File paths
 BASE_DIR = Path(__file__).parent.parent
-COMMANDS_FILE = BASE_DIR / "cache" / "commands.json"
-RESPONSE_FILE = BASE_DIR / "cache" / "response.json"
 CHAT_INSTRUCTIONS_FILE = BASE_DIR / "cache" / "chat_instructions.txt"
 CACHE_DIR = BASE_DIR / "cache"
 COMMAND_HISTORY_FILE = CACHE_DIR / "command_history.json"
@@ -20,153 +57,469 @@ COMMAND_HISTORY_FILE = CACHE_DIR / "command_history.json"
 # Ensure cache directory exists
 CACHE_DIR.mkdir(exist_ok=True)
 
-def load_command_history():
-    """Load previous command history"""
-    if os.path.exists(COMMAND_HISTORY_FILE):
-        try:
-            with open(COMMAND_HISTORY_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            pass
-    return []
-
-def save_command_history(command):
-    """Save command to history"""
-    history = load_command_history()
-    history.append({
-        "command": command,
-        "timestamp": datetime.now().isoformat()
-    })
-    # Keep only the last 100 commands
-    history = history[-100:]
-    with open(COMMAND_HISTORY_FILE, 'w') as f:
-        json.dump(history, f, indent=2)
+_history = None
+
+def get_command_history():
+    """Return the process-wide command history log"""
+    global _history
+    if _history is None:
+        _history = CommandHistory(
+            CACHE_DIR / "history",
+            max_segment_bytes=get_setting("history.max_segment_mb", 5) * 1024 * 1024,
+            max_segments=get_setting("history.max_segments", 0),
+            legacy_file=COMMAND_HISTORY_FILE
+        )
+    return _history
 
+def load_command_history(limit=100):
+    """Load the most recent commands, oldest first"""
+    return list(reversed(get_command_history().query(limit=limit)["items"]))
+
+def save_command_history(command, instruction=None):
+    """Save command to history, with the instruction it was parsed from if known"""
+    get_command_history().append(command, datetime.now().isoformat(), instruction=instruction)
+
+@timed("parse")
 def parse_chat_instruction(instruction):
     """
     Parse a natural language instruction from the chat into a structured command
     """
-    instruction = instruction.strip().lower()
-    
     # Generate a random command ID
     cmd_id = f"cmd_{int(time.time())}_{random.randint(1000, 9999)}"
     
-    # Handle status commands
-    if any(term in instruction for term in ["status", "what's up", "how are you", "check status", "system status"]):
-        return {
-            "type": "status",
-            "id": cmd_id,
-            "params": {}
-        }
-    
-    # Handle hunt commands
-    if any(term in instruction for term in ["hunt", "find", "search", "look for"]):
-        # Extract sources
-        sources = ["reddit", "web"]  # Default sources
-        if "reddit" in instruction:
-            sources = ["reddit"]
-        if "web" in instruction:
-            if "reddit" not in sources:
-                sources.append("reddit")
-        
-        # Extract count
-        count_match = re.search(r'(\d+)\s+(problem|issue|bug)', instruction)
-        count = 3  # Default count
-        if count_match:
-            count = int(count_match.group(1))
-        
-        # Check if we should tweet
-        should_tweet = "tweet" in instruction
-        
-        # Build the hunt problems command
-        if should_tweet:
-            return {
-                "type": "hunt_problems",
-                "id": cmd_id,
-                "params": {
-                    "sources": sources,
-                    "count": count,
-                    "should_tweet": True
-                }
-            }
-        else:
-            return {
-                "type": "hunt_problems",
-                "id": cmd_id,
-                "params": {
-                    "sources": sources,
-                    "count": count
-                }
-            }
-    
-    # Handle start agent swarm commands
-    if any(term in instruction for term in ["swarm", "agent swarm", "start swarm", "beast mode"]):
-        # Extract model
-        model_id = "gpt2"  # Default model
-        if "phi" in instruction:
-            model_id = "microsoft/phi-2"
-        
-        # Extract count
-        count_match = re.search(r'(\d+)', instruction)
-        count = 3  # Default count
-        if count_match:
-            count = int(count_match.group(1))
-        
-        return {
-            "type": "start_agent_swarm",
-            "id": cmd_id,
-            "params": {
-                "sources": ["reddit", "web"],
-                "count": count,
-                "model_id": model_id
-            }
-        }
-    
-    # Handle tweet commands
-    if any(term in instruction for term in ["tweet", "post", "share"]):
-        # Extract problem text
-        problem_text = instruction
-        
-        # Remove command words
-        for word in ["tweet", "post", "share", "about", "that", "please", "could you"]:
-            problem_text = problem_text.replace(word, "")
-        
-        problem_text = problem_text.strip()
-        
-        if len(problem_text) < 5:
-            problem_text = "New capability discovered! Check out this AI-powered problem hunter!"
-        
-        return {
-            "type": "tweet_problem",
-            "id": cmd_id,
-            "params": {
-                "problem": problem_text
-            }
-        }
-    
-    # Handle shell commands
-    if instruction.startswith("run ") or instruction.startswith("execute "):
-        command = instruction.replace("run ", "").replace("execute ", "")
-        
-        return {
-            "type": "shell",
-            "id": cmd_id,
-            "params": {
-                "command": command,
-                "capture_output": True
-            }
-        }
-    
-    # When all else fails, just start a problem hunt with defaults
+    # Intent rules and their precedence live in config/intent_rules.json
+    return get_intent_engine().parse(instruction, cmd_id)
+
+def reclassify_history(batch_size=1000):
+    """Re-parse every stored instruction with the current intent rules
+    
+    Only entries saved with their original instruction can be replayed.
+    
+    Args:
+        batch_size (int): History entries parsed per batch
+    
+    Returns:
+        dict: Entry counts and the (old type -> new type) changes
+    """
+    history = get_command_history()
+    engine = get_intent_engine()
+    total = len(history)
+    replayed = 0
+    changes = {}
+    for offset in range(0, total, batch_size):
+        page = history.query(offset=offset, limit=batch_size, newest_first=False)
+        entries = [entry for entry in page["items"] if entry.get("instruction")]
+        commands = engine.parse_batch(entry["instruction"] for entry in entries)
+        for entry, command in zip(entries, commands):
+            old_type = entry["command"].get("type")
+            if command["type"] != old_type:
+                key = f"{old_type} -> {command['type']}"
+                changes[key] = changes.get(key, 0) + 1
+        replayed += len(entries)
+    return {"entries": total, "replayed": replayed, "changed": sum(changes.values()), "changes": changes}
+
+_result_store = None
+
+def get_result_store():
+    """Return the process-wide result store, importing legacy cache files on first use"""
+    global _result_store
+    if _result_store is None:
+        store = ResultStore(
+            BASE_DIR / get_setting("store.path", "cache/grokbeast.db"),
+            max_bytes=cache_budget_bytes("store")
+        )
+        if store.is_empty():
+            store.import_cache(CACHE_DIR)
+        _result_store = store
+    return _result_store
+
+def load_source_text(sources):
+    """Build hunting input from the stored search results
+    
+    Args:
+        sources (list): Source names to include ("reddit", "web")
+    
+    Returns:
+        str: One problem statement per line
+    """
+    return "\n".join(line for line in get_result_store().problem_texts(sources) if line)
+
+_ingestion_client = None
+
+def get_ingestion_client():
+    """Return the process-wide pooled fetcher for the problem sources"""
+    global _ingestion_client
+    if _ingestion_client is None:
+        _ingestion_client = IngestionClient(
+            validators_path=BASE_DIR / get_setting("ingestion.validators_path", "cache/http_validators.json"),
+            max_workers=get_setting("ingestion.max_workers", 4),
+            timeout=get_setting("ingestion.timeout_seconds", 10),
+            min_host_interval=get_setting("ingestion.min_host_interval_seconds", 1.0),
+            host_intervals=get_setting("ingestion.host_intervals", {}),
+            user_agent=get_setting("ingestion.user_agent", DEFAULT_USER_AGENT),
+            max_retry_after=get_setting("ingestion.max_retry_after_seconds", 300)
+        )
+    return _ingestion_client
+
+_seen_items = None
+
+def get_seen_items():
+    """Return the process-wide filter of feed entries already ingested"""
+    global _seen_items
+    if _seen_items is None:
+        _seen_items = SeenItems(
+            BASE_DIR / get_setting("feeds.seen_path", "cache/seen_items.bin"),
+            max_entries=get_setting("feeds.max_seen", 200000)
+        )
+    return _seen_items
+
+def _store_feed_items(source, url, items):
+    """Append new feed entries to the stored search for this feed and day"""
+    store = get_result_store()
+    today = datetime.now().strftime("%Y-%m-%d")
+    key = f"{source}_{url}_{today}"
+    entry = store.get_search(key) or {"problems": []}
+    entry["problems"] = entry.get("problems", []) + [
+        {"problem": item_text(item), "source": f"{source.capitalize()} - {url}", "url": item["link"], "date": today}
+        for item in items
+    ]
+    entry["timestamp"] = datetime.now().isoformat()
+    store.put_search(key, entry, source)
+
+def ingest_feeds():
+    """Fetch the enabled feeds in problem_sources and keep only new entries
+    
+    Bodies are streamed through the feed parser and the seen-item filter;
+    new entries are added to the stored search for their feed and day
+    and only then marked as seen.
+    
+    Returns:
+        list: (source name, fetch result) pairs; for changed feeds
+            result["parsed"] holds the new "items" and the "total" read
+    """
+    seen = get_seen_items()
+    max_items = get_setting("feeds.max_items_per_feed", 200)
+    pairs = source_urls(get_setting("problem_sources", {}))
+    results = get_ingestion_client().fetch_all(
+        (url for _, url in pairs),
+        consume=lambda chunks: read_new_items(chunks, seen, max_items=max_items)
+    )
+    for (source, url), result in zip(pairs, results):
+        if result["parsed"] and result["parsed"]["items"]:
+            try:
+                _store_feed_items(source, url, result["parsed"]["items"])
+            except Exception as e:
+                # Left unmarked, the entries are fetched and stored again next cycle
+                print(f"Warning: storing new entries of {url} failed: {e}")
+                result["error"] = f"{type(e).__name__}: {e}"
+                result["parsed"] = None
+                continue
+            seen.mark_seen(result["parsed"]["items"])
+    seen.flush()
+    return [(source, result) for (source, _), result in zip(pairs, results)]
+
+_dedup_index = None
+
+def get_dedup_index():
+    """Return the process-wide near-duplicate index, or None if disabled"""
+    global _dedup_index
+    if _dedup_index is None and get_setting("dedup.enabled", True):
+        _dedup_index = DedupIndex(
+            BASE_DIR / get_setting("dedup.path", "cache/dedup_index.tsv"),
+            max_distance=get_setting("dedup.max_distance", 3),
+            bands=get_setting("dedup.bands", 4)
+        )
+    return _dedup_index
+
+_problem_ranker = None
+
+def get_problem_ranker():
+    """Return the top-K ranking of every problem hunted so far, kept in the result store"""
+    global _problem_ranker
+    if _problem_ranker is None:
+        _problem_ranker = TopKRanker(
+            k=get_setting("hunting.ranking.top_k", 50),
+            weights=get_setting("hunting.ranking.weights", DEFAULT_WEIGHTS),
+            min_pain=get_setting("hunting.min_pain_level", None),
+            store=get_result_store()
+        )
+    return _problem_ranker
+
+_tweet_budget = None
+
+def get_tweet_budget():
+    """Return the token bucket enforcing max_tweets_per_day"""
+    global _tweet_budget
+    if _tweet_budget is None:
+        _tweet_budget = TokenBucket.per_day(
+            get_setting("hunting.max_tweets_per_day", get_setting("max_tweets_per_day", 45)),
+            state_path=CACHE_DIR / "tweet_budget.json"
+        )
+    return _tweet_budget
+
+def _hunt(agent, sources, count, tweet_count=0, source_text=None):
+    """Hunt, rank and draft tweets for the top problems while the daily budget lasts
+    
+    The input is the stored text of `sources` unless `source_text` is given.
+    Problems are recorded in the dedup index only once a tweet is drafted
+    for them, so hunting without tweeting keeps returning the same problems
+    while tweeted ones are not hunted again.
+    """
+    dedup = get_dedup_index()
+    if source_text is None:
+        source_text = load_source_text(sources)
+    problems = agent.hunt_problems(source_text, count=count, dedup=dedup)
+    ranked = agent.rank_problems(problems, dedup=dedup)
+    for problem in ranked[:tweet_count]:
+        if not get_tweet_budget().try_acquire():
+            break
+        problem["tweet"] = agent.create_tweet(problem)
+        if dedup is not None:
+            dedup.add(problem.get("problem", ""), key=problem.get("url"))
+    get_problem_ranker().extend(ranked)
+    return ranked
+
+def _scheduled_hunt():
+    """Run one scheduled hunt cycle
+    
+    With feeds enabled, the feeds are fetched first and only entries not
+    seen in earlier cycles are hunted; a cycle without new entries hunts
+    nothing.
+    
+    Returns:
+        int: Number of new problems (with dedup enabled, problems never tweeted before)
+    """
+    sources = get_setting("hunting.sources", ["reddit", "web"])
+    count = get_setting("hunting.max_problems", 3)
+    source_text = None
+    if get_setting("feeds.enabled", True):
+        source_text = [
+            item_text(item)
+            for source, result in ingest_feeds() if source in sources and result["parsed"]
+            for item in result["parsed"]["items"]
+        ]
+        if not source_text:
+            return 0
+    ranked = _hunt(get_registry().get_agent(), sources, count, tweet_count=count, source_text=source_text)
+    return len(ranked)
+
+_hunt_scheduler = None
+
+def get_hunt_scheduler():
+    """Return the process-wide adaptive hunt scheduler (not started)"""
+    global _hunt_scheduler
+    if _hunt_scheduler is None:
+        if get_dedup_index() is None:
+            print("Warning: dedup is disabled, so every scheduled hunt counts as a full yield")
+        minutes = get_setting("hunting.hunt_interval_minutes", get_setting("hunt_interval_minutes", 60))
+        _hunt_scheduler = HuntScheduler(
+            _scheduled_hunt,
+            interval=minutes * 60,
+            min_interval=get_setting("min_hunt_interval", 15) * 60,
+            max_interval=get_setting("max_hunt_interval", 180) * 60,
+            adaptive=get_setting("adaptive_interval", True),
+            burst_threshold=get_setting("scheduler.burst_threshold", get_setting("hunting.max_problems", 3))
+        )
+    return _hunt_scheduler
+
+_shell_executor = None
+
+def get_shell_executor():
+    """Return the executor running allow-listed shell commands"""
+    global _shell_executor
+    if _shell_executor is None:
+        _shell_executor = ShellExecutor(
+            allowed_commands=get_setting("shell.allowed_commands", []),
+            max_concurrent=get_setting("shell.max_concurrent", 2),
+            timeout=get_setting("jobs.shell_timeout_seconds", 60),
+            max_output_bytes=get_setting("shell.max_output_bytes", 256 * 1024),
+            keep_runs=get_setting("shell.keep_runs", 50)
+        )
+    return _shell_executor
+
+def _run_status(params, agent):
+    status = {
+        "system": "online",
+        "agent": get_registry().status(),
+        "timestamp": datetime.now().isoformat()
+    }
+    if _job_queue is not None:
+        status["jobs"] = _job_queue.stats()
+    if _dedup_index is not None:
+        status["dedup"] = _dedup_index.stats()
+    if _result_store is not None:
+        status["store"] = _result_store.stats()
+    if _problem_ranker is not None:
+        status["ranking"] = _problem_ranker.stats()
+    if _ingestion_client is not None:
+        status["ingestion"] = _ingestion_client.stats()
+    if _seen_items is not None:
+        status["feeds"] = _seen_items.stats()
+    if _hunt_scheduler is not None:
+        status["scheduler"] = _hunt_scheduler.stats()
+    if _tweet_budget is not None:
+        status["tweet_budget"] = _tweet_budget.stats()
+    if _shell_executor is not None:
+        status["shell"] = _shell_executor.stats()
+    return status
+
+def _run_hunt_problems(params, agent):
+    count = params.get("count", 3)
+    tweet_count = 1 if params.get("should_tweet") else 0
     return {
-        "type": "start_agent_swarm",
-        "id": cmd_id,
-        "params": {
-            "sources": ["reddit", "web"],
-            "count": 3,
-            "model_id": "gpt2"
-        }
+        "problems": _hunt(agent, params.get("sources", ["reddit", "web"]), count, tweet_count),
+        "message": agent.grok_speak("hunting")
+    }
+
+def _run_start_agent_swarm(params, agent):
+    start = time.time()
+    count = params.get("count", 3)
+    problems = _hunt(agent, params.get("sources", ["reddit", "web"]), count, tweet_count=count)
+    result = {
+        "problems": problems,
+        "duration_seconds": round(time.time() - start, 2),
+        "model_used": getattr(agent, "model_id", params.get("model_id", "gpt2"))
     }
+    result["run_id"] = get_result_store().record_run(result, started_at=start)
+    return result
+
+def _run_tweet_problem(params, agent):
+    return {
+        "tweet": agent.create_tweet({"problem": params.get("problem", "")})
+    }
+
+def _run_shell(params, agent):
+    # Output is kept in a bounded ring buffer; /api/shell/stream streams it live instead
+    run = get_shell_executor().run(params.get("command", ""), capture_output=params.get("capture_output", True))
+    if run.status in ("timeout", "error"):
+        raise RuntimeError(run.error)
+    return {
+        "run_id": run.id,
+        "returncode": run.returncode,
+        "stdout": run.output("stdout"),
+        "stderr": run.output("stderr"),
+        "dropped_bytes": run.dropped_bytes
+    }
+
+# Command types that need the agent
+AGENT_COMMANDS = {"hunt_problems", "start_agent_swarm", "tweet_problem"}
+
+COMMAND_HANDLERS = {
+    "status": _run_status,
+    "hunt_problems": _run_hunt_problems,
+    "start_agent_swarm": _run_start_agent_swarm,
+    "tweet_problem": _run_tweet_problem,
+    "shell": _run_shell,
+}
+
+def execute_command(command):
+    """
+    Execute a parsed command in-process and return its response
+    """
+    response = {"id": command.get("id"), "type": command.get("type")}
+    handler = COMMAND_HANDLERS.get(command.get("type"))
+    if handler is None:
+        response.update({"status": "error", "error": f"Unknown command type: {command.get('type')}"})
+        return response
+    
+    start = time.perf_counter()
+    try:
+        # Only commands that need the model touch the agent (status must not force a cold load)
+        agent = get_registry().get_agent() if command.get("type") in AGENT_COMMANDS else None
+        result = handler(command.get("params", {}), agent)
+        response.update({"status": "success", "result": result})
+    except Exception as e:
+        ERRORS.inc(stage="command")
+        response.update({"status": "error", "error": str(e)})
+    COMMAND_SECONDS.observe(time.perf_counter() - start, type=command.get("type"))
+    return response
+
+_job_queue = None
+
+def get_job_queue():
+    """Return the process-wide command job queue"""
+    global _job_queue
+    if _job_queue is None:
+        singleflight = None
+        if get_setting("jobs.singleflight.enabled", True):
+            # Identical commands from several tabs or users share one execution
+            singleflight = SingleFlight(
+                result_ttl=get_setting("jobs.singleflight.result_ttl_seconds", {"status": 2}),
+                exclude_types=get_setting("jobs.singleflight.exclude_types", ["shell"])
+            )
+        _job_queue = JobQueue(
+            execute_command,
+            workers=get_setting("jobs.workers", 4),
+            max_queue=get_setting("jobs.max_queue", 100),
+            retain_seconds=get_setting("jobs.retain_seconds", 3600),
+            singleflight=singleflight,
+            # Job states go to the result store so any server worker can answer a poll
+            job_store=get_result_store()
+        )
+    return _job_queue
+
+def run_command(command, timeout=None):
+    """Queue a command and wait for its response
+    
+    Args:
+        command (dict): Parsed command
+        timeout (float): Maximum seconds to wait
+    
+    Returns:
+        dict: Command response
+    """
+    job = get_job_queue().submit(command)
+    if not job.wait(timeout):
+        return {"id": command.get("id"), "status": "error", "error": "Timed out waiting for command"}
+    return job.result or {"id": command.get("id"), "status": "error", "error": job.error}
+
+def detect_command(message):
+    """Parse a chat message into a command if it looks like one
+    
+    Args:
+        message (str): Chat message
+    
+    Returns:
+        dict: Parsed command, or None for plain chat
+    """
+    if get_intent_engine().is_command(message):
+        return parse_chat_instruction(message)
+    return None
+
+def format_sse(event, data):
+    """Format one Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def run_hunt_batch(paths, count=3, workers=None):
+    """Replay cached documents through the parallel hunter and print a summary"""
+    if paths:
+        documents = load_cache_documents(paths)
+        print(f"Hunting {len(documents)} documents from {len(paths)} files...")
+    else:
+        documents = get_result_store().search_documents()
+        print(f"Hunting {len(documents)} stored search documents...")
+    
+    batch = hunt_problems_batch([text for _, text in documents], count=count, workers=workers)
+    found = sum(len(problems) for problems in batch["results"])
+    print(f"Found {found} problems in {batch['duration_seconds']}s "
+          f"({batch['docs_per_sec']} docs/sec, {batch['workers']} workers)")
+    return batch
+
+def convert_models():
+    """Convert the configured models to mmap-able snapshots and time both load paths"""
+    snapshot_dir = BASE_DIR / get_setting("model.snapshot.dir", "cache/snapshots")
+    model_ids = dict.fromkeys(filter(None, [
+        os.getenv("GROK_MODEL_ID") or get_setting("model.name", "gpt2"),
+        get_setting("agent_swarm.model_id"),
+    ]))
+    for model_id in model_ids:
+        start = time.perf_counter()
+        path = convert_to_snapshot(model_id, snapshot_dir)
+        convert_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        load_snapshot(model_id, snapshot_dir)
+        print(f"{model_id}: snapshot in {path} (from_pretrained + save {convert_seconds:.1f}s, "
+              f"mmap load {time.perf_counter() - start:.2f}s)")
 
 def main():
     """Main function to parse arguments and run the appropriate command"""
@@ -174,6 +527,24 @@ def main():
     parser.add_argument("--web", action="store_true", help="Start web interface")
     parser.add_argument("--port", type=int, default=5000, help="Port for web interface")
     parser.add_argument("--command", type=str, help="Command to execute", default=None)
+    parser.add_argument("--hunt-batch", nargs="*", metavar="FILE", default=None,
+                        help="Hunt problems across cached result files in parallel (default: stored searches)")
+    parser.add_argument("--import-cache", action="store_true",
+                        help="Import swarm_results_*.json and search JSON files into the result store")
+    parser.add_argument("--convert-model", action="store_true",
+                        help="Save model.name and agent_swarm.model_id as local safetensors snapshots")
+    parser.add_argument("--serve", action="store_true",
+                        help="Start the pre-forking web server (model shared by all workers)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --hunt-batch or --serve")
+    parser.add_argument("--count", type=int, default=3, help="Problems to extract per document for --hunt-batch")
+    parser.add_argument("--fetch-sources", action="store_true",
+                        help="Fetch the configured RSS/Reddit feeds and store entries not seen before")
+    parser.add_argument("--schedule", action="store_true",
+                        help="Run hunts continuously on the adaptive schedule from config.json")
+    parser.add_argument("--check-intents", action="store_true",
+                        help="Check the intent rules against the instructions in command_examples.json")
+    parser.add_argument("--reclassify-history", action="store_true",
+                        help="Re-parse stored instructions with the current intent rules and report changes")
     
     args = parser.parse_args()
     
@@ -183,7 +554,53 @@ def main():
     print("Starting GrokBeast v5 - Ready to hunt problems!")
     print("="*70 + "\n")
     
-    if args.web:
+    if args.fetch_sources:
+        start = time.time()
+        results = ingest_feeds()
+        for source, result in results:
+            if result["not_modified"]:
+                state = "unchanged"
+            elif result["parsed"]:
+                state = f"{len(result['parsed']['items'])} new of {result['parsed']['total']} entries"
+            else:
+                state = result["error"]
+            print(f"  [{source}] {result['url']}: {state}")
+        stats = get_ingestion_client().stats()
+        feeds = get_seen_items().stats()
+        print(f"Fetched {len(results)} feeds in {time.time() - start:.1f}s: {stats['fetched']} updated, "
+              f"{stats['not_modified']} unchanged, {stats['failed']} failed; "
+              f"skipped {feeds['skipped']} of {feeds['checked']} entries as already seen")
+    elif args.schedule:
+        scheduler = get_hunt_scheduler()
+        print(f"Hunting every {scheduler.interval / 60:.0f} min "
+              f"(adaptive {scheduler.min_interval / 60:.0f}-{scheduler.max_interval / 60:.0f} min), Ctrl+C to stop")
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            print("\nScheduler stopped.")
+    elif args.check_intents:
+        checked, failures = check_examples(get_intent_engine())
+        for failure in failures:
+            print(f"MISMATCH {failure}")
+        print(f"{checked - len(failures)}/{checked} command examples parsed as expected")
+        if failures:
+            raise SystemExit(1)
+    elif args.reclassify_history:
+        summary = reclassify_history()
+        print(f"Replayed {summary['replayed']} of {summary['entries']} history entries, "
+              f"{summary['changed']} would change type")
+        for change, count in sorted(summary["changes"].items()):
+            print(f"  {change}: {count}")
+    elif args.import_cache:
+        counts = get_result_store().import_cache(CACHE_DIR)
+        print(f"Imported {counts['runs']} runs and {counts['searches']} searches")
+    elif args.hunt_batch is not None:
+        run_hunt_batch(args.hunt_batch, count=args.count, workers=args.workers)
+    elif args.convert_model:
+        convert_models()
+    elif args.serve:
+        serve(args.port, workers=args.workers)
+    elif args.web:
         print(f"Starting web interface on port {args.port}...")
         print(f"Connect to http://localhost:{args.port} to interact!")
         print("Web interface launched! Let's get started!\n")
@@ -192,13 +609,10 @@ def main():
         print(f"Executing command: {args.command}")
         try:
             command = parse_chat_instruction(args.command)
-            with open(COMMANDS_FILE, 'w') as f:
-                json.dump(command, f)
-            
             print(f"Command sent: {json.dumps(command, indent=2)}")
             
             # Wait for response
-            response = wait_for_response(command)
+            response = run_command(command)
             print(f"Response received: {json.dumps(response, indent=2)}")
             
             # Print success message
@@ -207,7 +621,7 @@ def main():
                 print("Mission accomplished!")
             else:
                 print("Operation completed with some issues. Check the response for details.")
-            
+        
         except Exception as e:
             print(f"Error: {str(e)}")
             print("\nOperation failed. Please try again with different wording.")
@@ -224,8 +638,7 @@ def main():
                 
                 # Get a response to the input
                 try:
-                    from agent_model import AgentModel
-                    agent = AgentModel(model_id="gpt2")
+                    agent = get_registry().get_agent()
                     response = agent.chat_response(user_input)
                     print(f"Grok 3: {response}")
                 except ImportError:
@@ -237,142 +650,350 @@ def main():
                     
                     print(f"\nExecuting command: {json.dumps(command, indent=2)}")
                     
-                    with open(COMMANDS_FILE, 'w') as f:
-                        json.dump(command, f)
-                    
                     # Wait for response
-                    response = wait_for_response(command)
+                    response = run_command(command)
                     if response.get("status") == "success":
                         print("Command executed successfully! 🔥")
                     else:
                         print(f"Command error: {response.get('error', 'Unknown error')}")
-                    
+                
                 except Exception as e:
                     print(f"Error executing command: {str(e)}")
         
         except KeyboardInterrupt:
             print("\nShutting down... Goodbye!")
 
-def start_web_server(port):
-    """Start a Flask web server for command input"""
-    try:
-        from flask import Flask, request, jsonify, render_template
-        
-        app = Flask(__name__, 
-                   template_folder=str(BASE_DIR / "templates"),
-                   static_folder=str(BASE_DIR / "static"))
-        
-        @app.route('/')
-        def home():
-            return render_template('index.html')
-        
-        @app.route('/api/chat', methods=['POST'])
-        def chat():
+def start_background_services():
+    """Start the store compactor and, if configured, the hunt scheduler
+    
+    In the pre-forking server only the first worker runs these.
+    """
+    # Keep the result store within the configured cache budget
+    get_result_store().start_compaction(get_setting("cache.cleanup_interval_hours", 24) * 3600)
+    
+    # Optionally hunt in the background on the adaptive schedule
+    if get_setting("scheduler.run_with_web", False):
+        get_hunt_scheduler().start()
+
+def create_app():
+    """Build the Flask app serving the chat UI and API
+    
+    Returns:
+        Flask: The application; the shared agent is loaded on first use
+            unless it was warmed up before
+    """
+    from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
+    
+    app = Flask(__name__, 
+               template_folder=str(BASE_DIR / "templates"),
+               static_folder=str(BASE_DIR / "static"))
+    
+    registry = get_registry()
+    jobs = get_job_queue()
+    
+    # Queue depths are read when metrics are scraped
+    def batcher_depth():
+        batcher = getattr(registry.get_agent(), "batcher", None) if registry.is_warm() else None
+        return batcher.in_flight() if batcher is not None else 0
+    
+    QUEUE_DEPTH.set_function(jobs.depth, queue="jobs")
+    QUEUE_DEPTH.set_function(batcher_depth, queue="batcher")
+    
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+    
+    @app.after_request
+    def record_request(response):
+        # Label by route pattern so job IDs don't create new series;
+        # streaming responses are timed to their first byte
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        started = getattr(g, "request_started", None)
+        if started is not None:
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route=route)
+        HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        return response
+    
+    @app.route('/')
+    def home():
+        return render_template('index.html')
+    
+    @app.route('/api/chat', methods=['POST'])
+    def chat():
+        try:
+            data = request.json
+            user_message = data.get('message', '').strip()
+            
+            if not user_message:
+                return jsonify({
+                    'response': "Please enter a message so I can help you!",
+                    'command': None
+                })
+            
+            # Use the shared warm agent for responses
+            agent = registry.get_agent()
+            
+            # Check if this is a command first
+            command = detect_command(user_message)
+            
+            # Generate a response with error handling
             try:
-                data = request.json
-                user_message = data.get('message', '').strip()
+                response = agent.chat_response(user_message)
                 
-                if not user_message:
-                    return jsonify({
-                        'response': "Please enter a message so I can help you!",
-                        'command': None
-                    })
+                # Safety checks on response
+                if not response or len(response) < 5:
+                    response = "Ready to help! What would you like me to do?"
                 
-                # Initialize the agent model for responses
-                from agent_model import AgentModel
-                agent = AgentModel(model_id="gpt2")
-                
-                # Check if this is a command first
-                command = None
-                command_keywords = ['hunt', 'search', 'find', 'tweet', 'status', 'start', 'check', 'run', 'execute']
-                if any(cmd in user_message.lower() for cmd in command_keywords):
-                    command = parse_chat_instruction(user_message)
-                
-                # Generate a response with error handling
-                try:
-                    response = agent.chat_response(user_message)
-                    
-                    # Safety checks on response
-                    if not response or len(response) < 5:
-                        response = "Ready to help! What would you like me to do?"
-                    
-                    # Prevent recursive prefixes
-                    import re
-                    response = re.sub(r'(Grok 3:?\s*)+', '', response)
-                    
-                    # Limit response length
-                    if len(response) > 500:
-                        response = response[:497] + "..."
-                except Exception as e:
-                    print(f"Error generating response: {str(e)}")
-                    response = "Error generating response. Please try again."
+                # Prevent recursive prefixes
+                import re
+                response = re.sub(r'(Grok 3:?\s*)+', '', response)
                 
-                return jsonify({
-                    'response': response,
-                    'command': command
-                })
+                # Limit response length
+                if len(response) > 500:
+                    response = response[:497] + "..."
             except Exception as e:
-                print(f"Error in chat endpoint: {str(e)}")
-                return jsonify({
-                    'response': f"Error: {str(e)[:50]}... Please try again.",
+                print(f"Error generating response: {str(e)}")
+                response = "Error generating response. Please try again."
+            
+            return jsonify({
+                'response': response,
+                'command': command
+            })
+        except Exception as e:
+            print(f"Error in chat endpoint: {str(e)}")
+            return jsonify({
+                'response': f"Error: {str(e)[:50]}... Please try again.",
+                'command': None
+            })
+    
+    @app.route('/api/chat/stream', methods=['POST'])
+    def chat_stream():
+        data = request.json or {}
+        user_message = data.get('message', '').strip()
+        
+        def events():
+            if not user_message:
+                yield format_sse("done", {
+                    'response': "Please enter a message so I can help you!",
                     'command': None
                 })
-                
-        @app.route('/api/command', methods=['POST'])
-        def process_command():
+                return
+            
             try:
-                data = request.json
-                instruction = data.get('instruction')
-                command = data.get('command')
-                
-                # If we received a raw instruction, parse it
-                if instruction and not command:
-                    command = parse_chat_instruction(instruction)
-                
-                if not command:
-                    return jsonify({
-                        "error": "No valid command or instruction provided"
-                    })
-                
-                # Save command to history
-                save_command_history(command)
-                
-                # Write command to file
-                with open(COMMANDS_FILE, 'w') as f:
-                    json.dump(command, f, indent=2)
-                
-                # Wait for response
-                response = wait_for_response(command)
-                
-                # Style the response
-                if response.get("result") and isinstance(response["result"], dict):
-                    if "problems" in response["result"]:
-                        problems = response["result"]["problems"]
-                        if problems and isinstance(problems, list):
-                            for problem in problems:
-                                if "tweet" in problem and not any(marker in problem["tweet"] for marker in ["Here", "Analysis", "Update", "Status"]):
-                                    from agent_model import AgentModel
-                                    agent = AgentModel()
-                                    problem["tweet"] = agent.grok_speak("tweet", problem["tweet"])
-                
-                return jsonify(response)
+                command = detect_command(user_message)
+                agent = registry.get_agent()
+                for kind, text in agent.stream_chat_response(user_message):
+                    if kind == "token":
+                        yield format_sse("token", {'text': text})
+                    else:
+                        if not text or len(text) < 5:
+                            text = "Ready to help! What would you like me to do?"
+                        yield format_sse("done", {'response': text, 'command': command})
             except Exception as e:
-                print(f"Error processing command: {str(e)}")
+                print(f"Error in chat stream: {str(e)}")
+                yield format_sse("done", {
+                    'response': f"Error: {str(e)[:50]}... Please try again.",
+                    'command': None
+                })
+        
+        return Response(stream_with_context(events()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    @app.route('/api/command', methods=['POST'])
+    def process_command():
+        try:
+            data = request.json
+            instruction = data.get('instruction')
+            command = data.get('command')
+            
+            # If we received a raw instruction, parse it
+            if instruction and not command:
+                command = parse_chat_instruction(instruction)
+            else:
+                instruction = None
+            
+            if not command:
                 return jsonify({
-                    "error": f"Error processing command: {str(e)}"
+                    "error": "No valid command or instruction provided"
                 })
+            
+            # Save command to history
+            save_command_history(command, instruction)
+            
+            # Queue the command; clients poll /api/jobs/<job_id> for the result
+            try:
+                job = jobs.submit(command)
+            except queue.Full:
+                return jsonify({
+                    "error": "Command queue is full. Please try again shortly."
+                }), 503
+            
+            return jsonify({
+                "job_id": job.id,
+                "status": job.status,
+                "command": command
+            }), 202
+        except Exception as e:
+            print(f"Error processing command: {str(e)}")
+            return jsonify({
+                "error": f"Error processing command: {str(e)}"
+            })
+    
+    @app.route('/api/shell/stream', methods=['POST'])
+    def shell_stream():
+        data = request.json or {}
+        instruction = data.get('instruction')
+        command = data.get('command')
+        if instruction and not command:
+            command = parse_chat_instruction(instruction)
+        else:
+            instruction = None
+        if not command or command.get("type") != "shell":
+            return jsonify({"error": "Not a shell command"}), 400
         
-        @app.route('/api/history', methods=['GET'])
-        def get_history():
-            history = load_command_history()
-            return jsonify(history)
+        try:
+            run = get_shell_executor().submit(command.get("params", {}).get("command", ""))
+        except PermissionError as e:
+            return jsonify({"error": str(e)}), 403
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        save_command_history(command, instruction)
         
-        print(f"🦖 GrokBeast v5 running at http://localhost:{port}")
-        app.run(host='0.0.0.0', port=port)
+        def events():
+            yield format_sse("start", run.to_dict())
+            # Heartbeats let the server notice clients that went away
+            for stream, text in run.follow(heartbeat=15):
+                if stream == "heartbeat":
+                    yield ": heartbeat\n\n"
+                else:
+                    yield format_sse(stream, {'text': text})
+            yield format_sse("done", run.to_dict())
         
+        return Response(stream_with_context(events()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    def get_job(job_id):
+        # Optional long-poll so clients don't have to spin
+        wait = min(request.args.get('wait', 0, type=float), 30.0)
+        if wait > 0:
+            with STAGE_SECONDS.time(stage="job_wait"):
+                job = jobs.lookup(job_id, wait=wait)
+        else:
+            job = jobs.lookup(job_id)
+        if job is None:
+            return jsonify({"error": f"Unknown job: {job_id}"}), 404
+        return jsonify(job)
+    
+    @app.route('/api/status', methods=['GET'])
+    def get_status():
+        return jsonify({"agent": registry.status(), "jobs": jobs.stats()})
+    
+    @app.route('/api/history', methods=['GET'])
+    def get_history():
+        page = get_command_history().query(
+            command_type=request.args.get('type') or None,
+            since=request.args.get('since') or None,
+            until=request.args.get('until') or None,
+            offset=request.args.get('offset', 0, type=int),
+            limit=min(request.args.get('limit', 50, type=int), 500),
+            newest_first=request.args.get('order', 'desc') != 'asc'
+        )
+        return jsonify(page)
+    
+    @app.route('/api/problems/top', methods=['GET'])
+    def get_top_problems():
+        ranker = get_problem_ranker()
+        n = min(request.args.get('n', 10, type=int), ranker.k)
+        return jsonify({
+            "problems": [dict(problem, rank_score=round(score, 3)) for score, problem in ranker.top(n)],
+            "ranking": ranker.stats()
+        })
+    
+    @app.route('/api/metrics', methods=['GET'])
+    def get_metrics():
+        # Under --serve the workers' metrics are merged from their snapshots
+        text = _shared_metrics.render() if _shared_metrics is not None else render_metrics()
+        return Response(text, content_type=CONTENT_TYPE)
+    
+    return app
+
+_shared_metrics = None
+
+def start_web_server(port):
+    """Start the single-process Flask development server for command input"""
+    try:
+        app = create_app()
+    except ImportError:
+        print("Flask is required for web server mode. Install with: pip install flask")
+        return
+    
+    # Load the agent once so every request shares the same warm model
+    get_registry().warm_up()
+    start_background_services()
+    
+    print(f"🦖 GrokBeast v5 running at http://localhost:{port}")
+    app.run(host='0.0.0.0', port=port)
+
+def serve(port, workers=None):
+    """Run the pre-forking production server
+    
+    The model is loaded once in the master and shared copy-on-write by the
+    workers. Send SIGHUP to the master to re-read config.json and reload
+    the model without dropping requests.
+    
+    Args:
+        port (int): Port to listen on
+        workers (int): Worker processes (default serving.workers)
+    """
+    try:
+        import werkzeug.serving  # noqa: F401 (fail before loading the model)
     except ImportError:
         print("Flask is required for web server mode. Install with: pip install flask")
         return
+    
+    workers = workers or get_setting("serving.workers", 2)
+    # By default the cores are split between the workers
+    torch_threads = get_setting("serving.torch_threads_per_worker", 0) or max(1, (os.cpu_count() or 1) // workers)
+    
+    global _shared_metrics
+    _shared_metrics = SharedMetrics(CACHE_DIR / "metrics",
+                                    interval_seconds=get_setting("serving.metrics_interval_seconds", 5))
+    _shared_metrics.clear()
+    
+    def on_worker_start(index):
+        _shared_metrics.start()
+        if index == 0:
+            start_background_services()
+    
+    def on_worker_stop(index, timeout):
+        # Jobs accepted with a 202 finish (or are reported as failed) before the worker exits
+        if _job_queue is not None:
+            _job_queue.close(timeout)
+    
+    def on_reload():
+        load_config(reload=True)
+        get_registry().reset()
+    
+    server = PreforkServer(
+        create_app,
+        host=get_setting("serving.host", "0.0.0.0"),
+        port=port,
+        workers=workers,
+        threaded=get_setting("serving.threaded", True),
+        torch_threads=torch_threads,
+        preload=get_registry().warm_up,
+        on_worker_start=on_worker_start,
+        on_worker_stop=on_worker_stop,
+        on_reload=on_reload,
+        graceful_timeout=get_setting("serving.graceful_timeout_seconds", 30),
+        stats_interval=get_setting("serving.stats_interval_seconds", 60),
+        stats_path=CACHE_DIR / "serving_stats.json"
+    )
+    server.bind()
+    print(f"🦖 GrokBeast v5 serving at http://localhost:{server.port} "
+          f"({workers} workers, {torch_threads} torch threads each, master pid {os.getpid()})")
+    server.run()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
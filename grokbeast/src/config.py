@@ -0,0 +1,75 @@
+"""
+Configuration loading for GrokBeast
+"""
+
+import json
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger("GrokBeast")
+
+# File paths
+BASE_DIR = Path(__file__).parent.parent
+CONFIG_FILE = BASE_DIR / "config" / "config.json"
+
+# Share of cache.max_size_mb given to each cache tier unless it has its own cache.<tier>_mb
+CACHE_BUDGET_SHARES = {"response_memory": 0.2, "response_disk": 0.3, "store": 0.5}
+
+_config = None
+_config_lock = threading.Lock()
+
+def load_config(reload=False):
+    """Load config.json once per process
+    
+    Args:
+        reload (bool): Re-read the file even if it was already loaded
+        
+    Returns:
+        dict: Parsed configuration, empty if the file is missing or invalid
+    """
+    global _config
+    with _config_lock:
+        if _config is None or reload:
+            try:
+                with open(CONFIG_FILE, 'r') as f:
+                    _config = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not load config from {CONFIG_FILE}: {e}")
+                _config = {}
+        return _config
+
+def get_setting(path, default=None):
+    """Look up a dotted config key such as "cache.max_size_mb"
+    
+    Args:
+        path (str): Dotted path into the config dict
+        default: Value returned when the key is missing
+        
+    Returns:
+        The configured value or the default
+    """
+    node = load_config()
+    for part in path.split("."):
+        if not isinstance(node, dict) or part not in node:
+            return default
+        node = node[part]
+    return node
+
+def cache_budget_bytes(tier):
+    """Return the size budget of one cache tier in bytes
+    
+    A tier uses cache.<tier>_mb when it is set and otherwise its share of
+    cache.max_size_mb (see CACHE_BUDGET_SHARES), so together the tiers
+    stay within max_size_mb.
+    
+    Args:
+        tier (str): "response_memory", "response_disk" or "store"
+        
+    Returns:
+        int: Budget in bytes
+    """
+    megabytes = get_setting(f"cache.{tier}_mb")
+    if megabytes is None:
+        megabytes = get_setting("cache.max_size_mb", 100) * CACHE_BUDGET_SHARES[tier]
+    return int(megabytes * 1024 * 1024)
@@ -0,0 +1,244 @@
+"""
+Near-duplicate detection for hunted problems using SimHash
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    from .filelock import file_lock
+except ImportError:
+    from filelock import file_lock
+
+logger = logging.getLogger("GrokBeast")
+
+FINGERPRINT_BITS = 64
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+_DIGITS_PATTERN = re.compile(r"\d+")
+
+def _features(text):
+    """Words and word pairs of the normalised text (numbers collapsed)"""
+    words = _WORD_PATTERN.findall(_DIGITS_PATTERN.sub("0", text.lower()))
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def simhash(text):
+    """Compute a 64-bit SimHash fingerprint of a text
+    
+    Similar texts get fingerprints that differ in only a few bits.
+    
+    Args:
+        text (str): Text to fingerprint
+        
+    Returns:
+        int: Fingerprint, 0 for text without any words
+    """
+    features = _features(text)
+    if not features:
+        return 0
+    
+    # Bit strings of each feature hash, most significant bit first; a column
+    # of the transposed strings holds one bit position across all features
+    hashes = [
+        format(int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little"), "064b")
+        for feature in features
+    ]
+    majority = len(hashes) / 2
+    fingerprint = 0
+    for column in zip(*hashes):
+        fingerprint = fingerprint << 1 | (column.count("1") > majority)
+    return fingerprint
+
+def hamming_distance(a, b):
+    """Number of differing bits between two fingerprints"""
+    return bin(a ^ b).count("1")
+
+class DedupIndex:
+    """Persistent index of seen problems supporting near-duplicate lookup
+    
+    Fingerprints are split into bands; two fingerprints within
+    max_distance bits must agree exactly on at least one band when there
+    are more bands than max_distance, so a lookup only compares against
+    the few fingerprints sharing a band value instead of every one seen.
+    Exact keys (e.g. URLs or Reddit IDs) are tracked alongside.
+    
+    Several processes (e.g. server workers) can share one file: lookups
+    and appends hold a file lock and first index whatever the other
+    processes appended since.
+    """
+    
+    def __init__(self, path=None, max_distance=3, bands=4):
+        """
+        Args:
+            path (Path): Append-only file persisting fingerprints and keys
+            max_distance (int): Largest Hamming distance still counted as a duplicate
+            bands (int): Number of bands (must exceed max_distance)
+        """
+        if bands <= max_distance:
+            raise ValueError("bands must be greater than max_distance")
+        self.path = Path(path) if path else None
+        self.max_distance = max_distance
+        self.bands = bands
+        self._band_bits = FINGERPRINT_BITS // bands
+        self._band_mask = (1 << self._band_bits) - 1
+        self._tables = [{} for _ in range(bands)]
+        self._keys = set()
+        self._count = 0
+        self._handle = None
+        self._offset = 0
+        self._lock = threading.Lock()
+        self._lock_path = Path(f"{self.path}.lock") if self.path is not None else None
+        self.hits = 0
+        self.misses = 0
+        
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._load()
+    
+    def _load(self):
+        """Read previously persisted fingerprints"""
+        with file_lock(self._lock_path):
+            self._refresh()
+        if self._count:
+            logger.info(f"Loaded {self._count} fingerprints from {self.path}")
+    
+    def _refresh(self):
+        """Index fingerprints other processes appended since the last look
+        
+        Must be called with the file lock held.
+        """
+        try:
+            if self.path.stat().st_size <= self._offset:
+                return
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                for line in f:
+                    self._offset += len(line)
+                    fingerprint, _, key = line.decode("utf-8", "replace").rstrip("\n").partition("\t")
+                    try:
+                        self._insert(int(fingerprint, 16), key or None)
+                    except ValueError:
+                        # Skip a torn write
+                        continue
+        except FileNotFoundError:
+            return
+    
+    @contextmanager
+    def _shared(self):
+        """Hold the index lock and, with a file, the file lock after catching up on it"""
+        with self._lock:
+            if self.path is None:
+                yield
+                return
+            with file_lock(self._lock_path):
+                self._refresh()
+                yield
+    
+    def _band_values(self, fingerprint):
+        return [(fingerprint >> (i * self._band_bits)) & self._band_mask for i in range(self.bands)]
+    
+    def _insert(self, fingerprint, key):
+        if fingerprint:
+            for table, value in zip(self._tables, self._band_values(fingerprint)):
+                table.setdefault(value, []).append(fingerprint)
+        if key:
+            self._keys.add(key)
+        self._count += 1
+    
+    def _find(self, fingerprint, key):
+        if key and key in self._keys:
+            return True
+        if not fingerprint:
+            return False
+        for table, value in zip(self._tables, self._band_values(fingerprint)):
+            for candidate in table.get(value, ()):
+                if hamming_distance(fingerprint, candidate) <= self.max_distance:
+                    return True
+        return False
+    
+    def seen(self, text, key=None):
+        """Check whether a problem (or a near-duplicate) was seen before
+        
+        Args:
+            text (str): Problem text
+            key (str): Optional exact identifier such as a URL
+            
+        Returns:
+            bool: True for a duplicate
+        """
+        fingerprint = simhash(text)
+        with self._shared():
+            duplicate = self._find(fingerprint, key)
+            if duplicate:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return duplicate
+    
+    def contains(self, text, key=None):
+        """Check like seen(), without counting the lookup in stats()
+        
+        For re-checking problems whose first lookup was already counted.
+        """
+        fingerprint = simhash(text)
+        with self._shared():
+            return self._find(fingerprint, key)
+    
+    def add(self, text, key=None):
+        """Record a problem as seen"""
+        fingerprint = simhash(text)
+        with self._shared():
+            self._add(fingerprint, key)
+    
+    def _add(self, fingerprint, key):
+        self._insert(fingerprint, key)
+        if self.path is not None:
+            line = f"{fingerprint:016x}\t{key or ''}\n".encode("utf-8")
+            if self._handle is None:
+                self._handle = open(self.path, 'ab')
+            self._handle.write(line)
+            self._handle.flush()
+            self._offset += len(line)
+    
+    def check_and_add(self, text, key=None):
+        """Record a problem unless it is a duplicate
+        
+        Args:
+            text (str): Problem text
+            key (str): Optional exact identifier such as a URL
+            
+        Returns:
+            bool: True if the problem was a duplicate (and was not added)
+        """
+        fingerprint = simhash(text)
+        with self._shared():
+            if self._find(fingerprint, key):
+                self.hits += 1
+                return True
+            self.misses += 1
+            self._add(fingerprint, key)
+            return False
+    
+    def __len__(self):
+        with self._shared():
+            return self._count
+    
+    def close(self):
+        """Close the persistence file"""
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+    
+    def stats(self):
+        """Return index size and lookup counters"""
+        with self._shared():
+            return {
+                "fingerprints": self._count,
+                "keys": len(self._keys),
+                "duplicates": self.hits,
+                "new": self.misses,
+            }
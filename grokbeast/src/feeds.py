@@ -0,0 +1,260 @@
+"""
+Streaming RSS/Atom parsing and a persistent filter of seen feed entries
+"""
+
+import hashlib
+import html
+import logging
+import os
+import re
+import threading
+from array import array
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from metrics import REGISTRY
+
+logger = logging.getLogger("GrokBeast")
+
+# RSS <item> and Atom <entry>
+ITEM_TAGS = {"item", "entry"}
+
+# Longest summary kept per entry; feeds sometimes embed whole articles
+MAX_SUMMARY_CHARS = 2000
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+SPACE_PATTERN = re.compile(r"\s+")
+
+FEED_ITEMS = REGISTRY.counter("grokbeast_feed_items", "Feed entries by outcome (new or seen)")
+FEED_SKIP_RATIO = REGISTRY.gauge("grokbeast_feed_skip_ratio", "Share of feed entries skipped as already seen")
+
+_local_names = {}
+
+def _local_name(tag):
+    """Strip the namespace from a tag (cached; feeds reuse a handful of tags)"""
+    name = _local_names.get(tag)
+    if name is None:
+        name = _local_names[tag] = tag.rsplit("}", 1)[-1]
+    return name
+
+def _plain_text(text):
+    """Strip markup and collapse whitespace in an entry's text"""
+    text = html.unescape(TAG_PATTERN.sub(" ", text)) if "<" in text or "&" in text else text
+    return SPACE_PATTERN.sub(" ", text).strip()
+
+def _item_record(element):
+    """Turn a finished <item>/<entry> element into a dict"""
+    record = {"guid": None, "title": "", "link": None, "summary": "", "published": None}
+    for child in element:
+        name = _local_name(child.tag)
+        text = (child.text or "").strip()
+        if name in ("guid", "id"):
+            record["guid"] = text or None
+        elif name == "title":
+            record["title"] = _plain_text(text)
+        elif name == "link":
+            # Atom links carry the URL in href; prefer the alternate (HTML) one
+            href = child.get("href")
+            if href is None:
+                record["link"] = text or record["link"]
+            elif record["link"] is None and child.get("rel", "alternate") == "alternate":
+                record["link"] = href
+        elif name in ("description", "summary", "content") and not record["summary"]:
+            record["summary"] = _plain_text(text[:MAX_SUMMARY_CHARS * 2])[:MAX_SUMMARY_CHARS]
+        elif name in ("pubDate", "published", "updated") and record["published"] is None:
+            record["published"] = text or None
+    return record
+
+def iter_feed_items(chunks, max_items=None):
+    """Parse an RSS or Atom document incrementally
+    
+    The document is fed to an XMLPullParser chunk by chunk and each entry
+    is yielded as soon as its closing tag arrives, then detached from the
+    tree, so memory stays bounded by the chunk size and the largest entry
+    rather than the feed. A malformed document ends the iteration with a
+    warning after the entries parsed so far.
+    
+    Args:
+        chunks (iterable): Bytes (or str) chunks of the document
+        max_items (int): Stop after this many entries
+    
+    Yields:
+        dict: guid, title, link, summary and published of each entry
+    """
+    parser = XMLPullParser(events=("start", "end"))
+    stack = []
+    emitted = 0
+    
+    def entries():
+        for event, element in parser.read_events():
+            if event == "start":
+                stack.append(element)
+                continue
+            stack.pop()
+            if _local_name(element.tag) in ITEM_TAGS:
+                yield element
+    
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            for element in entries():
+                yield _item_record(element)
+                emitted += 1
+                if stack:
+                    stack[-1].remove(element)
+                element.clear()
+                if max_items is not None and emitted >= max_items:
+                    return
+        parser.close()
+        for element in entries():
+            yield _item_record(element)
+            emitted += 1
+            if max_items is not None and emitted >= max_items:
+                return
+    except ParseError as e:
+        logger.warning(f"Stopped parsing feed after {emitted} entries: {e}")
+
+def item_text(item):
+    """Render an entry as one line of hunting input"""
+    if item["summary"] and item["summary"] != item["title"]:
+        return f"{item['title']}: {item['summary']}"
+    return item["title"]
+
+class SeenItems:
+    """Persistent set of feed entries that were already processed
+    
+    Entries are identified by GUID, falling back to link and then title,
+    and kept as 8-byte BLAKE2b digests. This is an exact hash set rather
+    than a Bloom filter: a false positive would silently drop a new
+    entry, and at 8 bytes per entry the exact set is small anyway. The
+    file is append-only; once it holds more than twice max_entries
+    digests it is rewritten with the newest max_entries.
+    """
+    
+    def __init__(self, path=None, max_entries=200000):
+        """
+        Args:
+            path (Path): Binary file of digests (None keeps them in memory)
+            max_entries (int): Digests retained when the file is compacted
+        """
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self._order = array("Q")
+        self._seen = set()
+        self._pending = array("Q")
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0
+        self._load()
+    
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            logger.warning(f"Ignoring unreadable seen-items file {self.path}: {e}")
+            return
+        # A torn trailing record from an interrupted append is dropped
+        self._order.frombytes(data[:len(data) - len(data) % self._order.itemsize])
+        self._seen.update(self._order)
+    
+    @staticmethod
+    def item_key(item):
+        """Return the digest identifying an entry"""
+        key = item.get("guid") or item.get("link") or item.get("title") or ""
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+    
+    def is_new(self, item):
+        """Check whether an entry has not been processed yet
+        
+        The entry is not remembered; call mark_seen once it has been
+        stored, so entries of a failed cycle are picked up again.
+        
+        Args:
+            item (dict): Feed entry from iter_feed_items
+        
+        Returns:
+            bool: True if the entry was never marked as seen
+        """
+        digest = self.item_key(item)
+        with self._lock:
+            self.checked += 1
+            new = digest not in self._seen
+            if not new:
+                self.skipped += 1
+            FEED_SKIP_RATIO.set(self.skipped / self.checked)
+        FEED_ITEMS.inc(outcome="new" if new else "seen")
+        return new
+    
+    def mark_seen(self, items):
+        """Remember processed entries (persisted by the next flush)
+        
+        Args:
+            items (iterable): Feed entries from iter_feed_items
+        """
+        digests = [self.item_key(item) for item in items]
+        with self._lock:
+            for digest in digests:
+                if digest not in self._seen:
+                    self._seen.add(digest)
+                    self._order.append(digest)
+                    self._pending.append(digest)
+    
+    def flush(self):
+        """Persist entries added since the last flush"""
+        if self.path is None:
+            return
+        with self._lock:
+            if len(self._order) > 2 * self.max_entries:
+                self._order = self._order[-self.max_entries:]
+                self._seen = set(self._order)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    self._order.tofile(f)
+                os.replace(tmp_path, self.path)
+            elif self._pending:
+                with open(self.path, 'ab') as f:
+                    self._pending.tofile(f)
+            self._pending = array("Q")
+    
+    def __len__(self):
+        return len(self._seen)
+    
+    def stats(self):
+        """Return the filter size and skip counters"""
+        with self._lock:
+            return {
+                "entries": len(self._seen),
+                "checked": self.checked,
+                "skipped": self.skipped,
+                "skip_ratio": round(self.skipped / self.checked, 3) if self.checked else None,
+            }
+
+def read_new_items(chunks, seen, max_items=None):
+    """Stream a feed body through the parser and the seen filter
+    
+    Suitable as the `consume` callback of IngestionClient.fetch. Entries
+    are only checked; mark them with seen.mark_seen once stored.
+    
+    Args:
+        chunks (iterable): Body chunks
+        seen (SeenItems): Filter of processed entries
+        max_items (int): Entries read per feed at most
+    
+    Returns:
+        dict: "items" (new entries) and "total" (entries read)
+    """
+    total = 0
+    new_items = []
+    keys = set()
+    for item in iter_feed_items(chunks, max_items=max_items):
+        total += 1
+        key = seen.item_key(item)
+        if key not in keys and seen.is_new(item):
+            keys.add(key)
+            new_items.append(item)
+    return {"items": new_items, "total": total}
@@ -0,0 +1,32 @@
+"""
+Advisory file locks for state shared between processes
+"""
+
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows, where the pre-forking server doesn't run either
+    fcntl = None
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on a lock file for the duration of a with-block
+    
+    The file is opened on every call, so a forked child never shares its
+    parent's open file description (and with it the lock).
+    
+    Args:
+        path (Path or str): Lock file, created if missing
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
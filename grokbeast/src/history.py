@@ -0,0 +1,304 @@
+"""
+Append-only command history log with rotation and an in-memory index
+"""
+
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+try:
+    from .filelock import file_lock
+except ImportError:
+    from filelock import file_lock
+
+logger = logging.getLogger("GrokBeast")
+
+class CommandHistory:
+    """Command history stored as rotating JSONL segments
+    
+    Each command is appended as one line to the current segment, so
+    recording a command costs the same no matter how much history exists.
+    An in-memory index of (timestamp, type, segment, offset) supports
+    filtered, paginated queries without parsing the whole log.
+    
+    Several processes (e.g. server workers) can share one directory:
+    appends and queries hold a file lock and first index whatever the
+    other processes appended or rotated since.
+    """
+    
+    def __init__(self, directory, basename="command_history", max_segment_bytes=5 * 1024 * 1024,
+                 max_segments=0, legacy_file=None):
+        """
+        Args:
+            directory (Path): Directory holding the log segments
+            basename (str): Segment file name prefix
+            max_segment_bytes (int): Size at which a new segment is started
+            max_segments (int): Segments to keep (0 keeps everything)
+            legacy_file (Path): Old command_history.json to import on first use
+        """
+        self.directory = Path(directory)
+        self.basename = basename
+        self.max_segment_bytes = max(1024, int(max_segment_bytes))
+        self.max_segments = max(0, int(max_segments))
+        self._lock = threading.Lock()
+        self._lock_path = self.directory / f"{basename}.lock"
+        self._handle = None
+        self._segment = 1
+        self._segment_size = 0
+        
+        # Index: parallel lists in append order, plus per-type (timestamps, positions)
+        self._timestamps = []
+        self._entry_types = []
+        self._locations = []
+        self._types = {}
+        
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with file_lock(self._lock_path):
+            # Under the lock, so only the first of several processes imports the legacy file
+            self._load_index()
+            if not self._locations and legacy_file is not None:
+                self._import_legacy(Path(legacy_file))
+    
+    def _segment_path(self, segment):
+        return self.directory / f"{self.basename}.{segment:06d}.jsonl"
+    
+    def _segments(self):
+        """List existing segment numbers in order"""
+        segments = []
+        for path in self.directory.glob(f"{self.basename}.*.jsonl"):
+            number = path.name[len(self.basename) + 1:-len(".jsonl")]
+            if number.isdigit():
+                segments.append(int(number))
+        return sorted(segments)
+    
+    def _index(self, timestamp, command_type, location):
+        position = len(self._locations)
+        self._timestamps.append(timestamp)
+        self._entry_types.append(command_type)
+        self._locations.append(location)
+        timestamps, positions = self._types.setdefault(command_type, ([], []))
+        timestamps.append(timestamp)
+        positions.append(position)
+    
+    def _index_entry(self, entry, segment, offset, length):
+        command = entry.get("command")
+        command_type = command.get("type", "unknown") if isinstance(command, dict) else "unknown"
+        self._index(entry.get("timestamp", ""), command_type, (segment, offset, length))
+    
+    def _scan(self, segment, offset=0):
+        """Index the entries of a segment from offset on
+        
+        Returns:
+            int: Offset of the end of the segment
+        """
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Skip a torn write
+                    entry = None
+                if isinstance(entry, dict):
+                    self._index_entry(entry, segment, offset, len(line))
+                offset += len(line)
+        return offset
+    
+    def _load_index(self):
+        """Scan existing segments once to rebuild the index"""
+        segments = self._segments()
+        for segment in segments:
+            self._segment_size = self._scan(segment)
+        if segments:
+            self._segment = segments[-1]
+    
+    def _refresh(self):
+        """Index what other processes appended, rotated or deleted since the last look
+        
+        Must be called with the file lock held.
+        """
+        if self._locations and not self._segment_path(self._locations[0][0]).exists():
+            existing = set(self._segments())
+            self._drop_segments({location[0] for location in self._locations} - existing)
+        if not self._segment_path(self._segment).exists():
+            # Our segment was rotated out; resume at the oldest one left
+            later = [segment for segment in self._segments() if segment > self._segment]
+            if later:
+                self._switch_segment(later[0])
+        
+        while True:
+            try:
+                size = self._segment_path(self._segment).stat().st_size
+            except FileNotFoundError:
+                size = 0
+            if size > self._segment_size:
+                self._segment_size = self._scan(self._segment, self._segment_size)
+            if not self._segment_path(self._segment + 1).exists():
+                break
+            # Another process started a new segment
+            self._switch_segment(self._segment + 1)
+    
+    def _switch_segment(self, segment):
+        """Continue in another process's segment, to be scanned from its start"""
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        self._segment = segment
+        self._segment_size = 0
+    
+    def _import_legacy(self, legacy_file):
+        """Copy entries from the old single-file history"""
+        try:
+            with open(legacy_file, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        imported = 0
+        for entry in entries:
+            if isinstance(entry, dict) and "command" in entry:
+                self._append_entry(entry)
+                imported += 1
+        if imported:
+            logger.info(f"Imported {imported} history entries from {legacy_file}")
+    
+    def _rotate(self):
+        """Start a new segment and drop the oldest beyond max_segments"""
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        self._segment += 1
+        self._segment_size = 0
+        
+        if self.max_segments:
+            segments = self._segments()
+            expired = segments[:max(0, len(segments) + 1 - self.max_segments)]
+            for segment in expired:
+                os.remove(self._segment_path(segment))
+            if expired:
+                self._drop_segments(set(expired))
+    
+    def _drop_segments(self, segments):
+        """Rebuild the index without entries from deleted segments"""
+        kept = [
+            (timestamp, command_type, location)
+            for timestamp, command_type, location in zip(self._timestamps, self._entry_types, self._locations)
+            if location[0] not in segments
+        ]
+        self._timestamps = []
+        self._entry_types = []
+        self._locations = []
+        self._types = {}
+        for timestamp, command_type, location in kept:
+            self._index(timestamp, command_type, location)
+    
+    def _append_entry(self, entry):
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        if self._segment_size and self._segment_size + len(line) > self.max_segment_bytes:
+            self._rotate()
+        if self._handle is None:
+            self._handle = open(self._segment_path(self._segment), 'ab')
+        offset = self._segment_size
+        self._handle.write(line)
+        self._handle.flush()
+        self._segment_size += len(line)
+        self._index_entry(entry, self._segment, offset, len(line))
+    
+    def append(self, command, timestamp, instruction=None):
+        """Record a command
+        
+        Args:
+            command (dict): Parsed command
+            timestamp (str): ISO timestamp of the command
+            instruction (str): Chat instruction the command was parsed from, if any
+        """
+        entry = {"command": command, "timestamp": timestamp}
+        if instruction is not None:
+            entry["instruction"] = instruction
+        with self._lock, file_lock(self._lock_path):
+            self._refresh()
+            self._append_entry(entry)
+    
+    def __len__(self):
+        with self._lock, file_lock(self._lock_path):
+            self._refresh()
+            return len(self._locations)
+    
+    def _read(self, positions):
+        """Load the entries at the given index positions"""
+        entries = []
+        handles = {}
+        try:
+            for position in positions:
+                segment, offset, length = self._locations[position]
+                handle = handles.get(segment)
+                if handle is None:
+                    handle = handles[segment] = open(self._segment_path(segment), 'rb')
+                handle.seek(offset)
+                entries.append(json.loads(handle.read(length)))
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return entries
+    
+    def query(self, command_type=None, since=None, until=None, offset=0, limit=50, newest_first=True):
+        """Return a page of history entries
+        
+        Args:
+            command_type (str): Only include commands of this type
+            since (str): Only include entries at or after this ISO timestamp
+            until (str): Only include entries at or before this ISO timestamp
+            offset (int): Number of matching entries to skip
+            limit (int): Maximum number of entries to return
+            newest_first (bool): Page from the most recent entry backwards
+            
+        Returns:
+            dict: Matching entries with the total count and paging info
+        """
+        with self._lock, file_lock(self._lock_path):
+            self._refresh()
+            if command_type is None:
+                timestamps = self._timestamps
+                positions = None
+            else:
+                timestamps, positions = self._types.get(command_type, ([], []))
+            
+            # Timestamps are appended in order, so the time window is a slice
+            start = bisect_left(timestamps, since) if since else 0
+            end = bisect_right(timestamps, until) if until else len(timestamps)
+            total = max(0, end - start)
+            
+            offset = max(0, int(offset))
+            limit = max(0, int(limit))
+            if newest_first:
+                page = range(end - 1 - offset, max(start, end - offset - limit) - 1, -1)
+            else:
+                page = range(start + offset, min(end, start + offset + limit))
+            if positions is not None:
+                page = [positions[i] for i in page]
+            
+            if self._handle is not None:
+                self._handle.flush()
+            items = self._read(page)
+        
+        return {
+            "items": items,
+            "total": total,
+            "offset": offset,
+            "limit": limit
+        }
+    
+    def type_counts(self):
+        """Return the number of recorded commands per type"""
+        with self._lock, file_lock(self._lock_path):
+            self._refresh()
+            return {command_type: len(positions) for command_type, (_, positions) in self._types.items()}
+    
+    def close(self):
+        """Close the current segment"""
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
@@ -0,0 +1,127 @@
+"""
+Bulk problem hunting across many documents using a process pool
+"""
+
+import json
+import logging
+import os
+import random
+import time
+from pathlib import Path
+
+logger = logging.getLogger("GrokBeast")
+
+# Rule-based agent used inside each worker process
+_worker_agent = None
+
+def _init_worker():
+    """Build a model-free agent once per worker process"""
+    global _worker_agent
+    try:
+        from .agent_model import GrokAgent
+    except ImportError:
+        from agent_model import GrokAgent
+    _worker_agent = GrokAgent(load_model=False)
+
+def _init_pool_worker():
+    """Pool initializer: reseed, then build the worker's agent
+    
+    Each worker seeds from OS entropy, so workers never share a random
+    stream, whatever the start method. Without a seed from the caller,
+    workers would otherwise rely on the interpreter to reseed forked
+    children. Seeded runs reseed per document anyway.
+    """
+    random.seed()
+    _init_worker()
+
+def _hunt_document(task):
+    """Hunt one document; runs inside a worker process"""
+    index, text, count, seed = task
+    if _worker_agent is None:
+        _init_worker()
+    if seed is not None:
+        random.seed(seed + index)
+    return _worker_agent.hunt_problems(text, count=count)
+
+def hunt_problems_batch(documents, count=3, workers=None, chunksize=None, seed=None):
+    """Run hunt_problems over many documents, sharded across processes
+    
+    Results come back in input order whatever the worker count. With a
+    seed, each document's randomness is seeded from its index, so the
+    output is reproducible and independent of how work was sharded.
+    
+    Args:
+        documents (list): Source texts, one per document
+        count (int): Number of problems to extract per document
+        workers (int): Worker processes (defaults to the CPU count)
+        chunksize (int): Documents sent to a worker per dispatch
+        seed (int): Base seed for per-document randomness
+        
+    Returns:
+        dict: Results per document plus document count, duration and docs/sec
+    """
+    documents = list(documents)
+    workers = max(1, workers or os.cpu_count() or 1)
+    if chunksize is None:
+        # A few chunks per worker balances load without per-document IPC
+        chunksize = max(1, len(documents) // (workers * 4))
+    tasks = [(index, text, count, seed) for index, text in enumerate(documents)]
+    
+    start = time.perf_counter()
+    if workers == 1 or len(documents) <= chunksize:
+        results = [_hunt_document(task) for task in tasks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_pool_worker) as executor:
+            results = list(executor.map(_hunt_document, tasks, chunksize=chunksize))
+    duration = time.perf_counter() - start
+    
+    docs_per_sec = len(documents) / duration if duration > 0 else 0.0
+    logger.info(f"Hunted {len(documents)} documents in {duration:.2f}s ({docs_per_sec:.1f} docs/sec, {workers} workers)")
+    return {
+        "results": results,
+        "documents": len(documents),
+        "workers": workers,
+        "duration_seconds": round(duration, 3),
+        "docs_per_sec": round(docs_per_sec, 1)
+    }
+
+def load_cache_documents(paths):
+    """Turn cached search and swarm result files into hunting documents
+    
+    Reddit search entries become one document each; web search entries
+    and swarm results become one document per feed or run.
+    
+    Args:
+        paths (list): JSON files such as reddit_searches.json
+        
+    Returns:
+        list: (document_id, text) pairs
+    """
+    documents = []
+    for path in paths:
+        path = Path(path)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping {path}: {e}")
+            continue
+            
+        if isinstance(data, dict) and isinstance(data.get("problems"), list):
+            # Swarm results file
+            lines = [p.get("problem", "") for p in data["problems"] if isinstance(p, dict)]
+            documents.append((path.stem, "\n".join(lines)))
+            continue
+            
+        if not isinstance(data, dict):
+            continue
+        for key, entry in data.items():
+            if not isinstance(entry, dict):
+                continue
+            if isinstance(entry.get("problem"), dict):
+                documents.append((key, entry["problem"].get("problem", "")))
+            elif isinstance(entry.get("problems"), list):
+                lines = [p.get("problem", "") for p in entry["problems"] if isinstance(p, dict)]
+                documents.append((key, "\n".join(lines)))
+    return documents
@@ -0,0 +1,407 @@
+"""
+Pooled, conditional-GET fetching of the configured problem sources
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from metrics import REGISTRY
+
+logger = logging.getLogger("GrokBeast")
+
+DEFAULT_USER_AGENT = "GrokBeast/1.0 (problem hunter)"
+
+# Bytes read at a time when a response body is streamed to a consumer
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Back-off after a 429/503 without a usable Retry-After header
+DEFAULT_RETRY_AFTER = 60.0
+
+# Statuses asking the client to slow down
+THROTTLE_STATUSES = (429, 503)
+
+SOURCE_FETCHES = REGISTRY.counter("grokbeast_source_fetches", "Source fetches by host and outcome")
+SOURCE_FETCH_SECONDS = REGISTRY.histogram("grokbeast_source_fetch_seconds", "Source fetch latency by host")
+
+def source_urls(problem_sources):
+    """List the feed URLs of the enabled problem sources
+    
+    Subreddits are read through their public RSS feeds. X search terms
+    need the API and are not fetched here.
+    
+    Args:
+        problem_sources (dict): The problem_sources section of config.json
+    
+    Returns:
+        list: (source name, url) pairs
+    """
+    urls = []
+    reddit = problem_sources.get("reddit", {})
+    if reddit.get("enabled", False):
+        for subreddit in reddit.get("subreddits", []):
+            urls.append(("reddit", f"https://www.reddit.com/r/{subreddit}/new/.rss"))
+    web = problem_sources.get("web", {})
+    if web.get("enabled", False):
+        for feed in web.get("rss_feeds", []):
+            urls.append(("web", feed))
+    return urls
+
+def _host(url):
+    return urlsplit(url).netloc.lower()
+
+def retry_after_seconds(value, now=None):
+    """Parse a Retry-After header (delay seconds or an HTTP date)
+    
+    Args:
+        value (str): Header value
+        now (float): Current UNIX time (for HTTP dates)
+    
+    Returns:
+        float: Seconds to wait (never negative), None if absent or unparseable
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return max(0.0, when - (time.time() if now is None else now))
+
+def _interleave_by_host(urls):
+    """Order URLs round-robin across hosts
+    
+    Workers then spread over hosts instead of queueing behind one host's
+    rate limit.
+    """
+    by_host = {}
+    for url in urls:
+        by_host.setdefault(_host(url), []).append(url)
+    queues = list(by_host.values())
+    ordered = []
+    while queues:
+        ordered.extend(queue.pop(0) for queue in queues)
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+class HostRateLimiter:
+    """Minimum spacing between requests to the same host
+    
+    A caller reserves the next free slot for its host under the lock and
+    sleeps outside it, so requests to other hosts are never held up.
+    """
+    
+    def __init__(self, min_interval=1.0, host_intervals=None):
+        """
+        Args:
+            min_interval (float): Default seconds between requests to one host
+            host_intervals (dict): Host -> seconds, overriding the default
+        """
+        self.min_interval = float(min_interval)
+        self.host_intervals = {host.lower(): float(seconds) for host, seconds in (host_intervals or {}).items()}
+        self._next_slot = {}
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.waited_seconds = 0.0
+        self.backoffs = 0
+    
+    def interval(self, host):
+        """Return the spacing applied to a host"""
+        return self.host_intervals.get(host, self.min_interval)
+    
+    def wait(self, host):
+        """Block until a request to `host` is allowed
+        
+        Returns:
+            float: Seconds waited
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval(host)
+            delay = slot - now
+            if delay > 0:
+                self.waits += 1
+                self.waited_seconds += delay
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+    
+    def back_off(self, host, seconds):
+        """Hold back every request to `host` for at least `seconds`
+        
+        Used when the host answers 429/503; slots already reserved are
+        not moved, so only later requests wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._next_slot[host] = max(self._next_slot.get(host, now), now + seconds)
+            self.backoffs += 1
+
+class ValidatorStore:
+    """ETag / Last-Modified validators per URL, persisted as JSON"""
+    
+    def __init__(self, path=None):
+        """
+        Args:
+            path (Path): JSON file keeping validators between runs (None keeps them in memory)
+        """
+        self.path = path
+        self._validators = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self._validators = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable validator file {self.path}: {e}")
+    
+    def request_headers(self, url):
+        """Return the conditional headers for a URL"""
+        with self._lock:
+            validators = self._validators.get(url)
+        if not validators:
+            return {}
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+    
+    def update(self, url, response_headers):
+        """Remember the validators of a full (200) response"""
+        validators = {
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified"),
+        }
+        with self._lock:
+            if not validators["etag"] and not validators["last_modified"]:
+                self._dirty = self._validators.pop(url, None) is not None or self._dirty
+                return
+            if self._validators.get(url) != validators:
+                self._validators[url] = validators
+                self._dirty = True
+    
+    def save(self):
+        """Write the validators if they changed"""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = dict(self._validators)
+            self._dirty = False
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, indent=1)
+        os.replace(tmp_path, self.path)
+    
+    def __len__(self):
+        return len(self._validators)
+
+class IngestionClient:
+    """Fetch many source URLs over pooled keep-alive connections
+    
+    Each worker thread keeps its own requests.Session with a connection
+    pool, so repeated fetches to a host reuse TCP/TLS connections. At
+    most max_workers fetches run at once, requests to one host are
+    spaced by the rate limiter, and stored validators turn unchanged
+    feeds into 304 responses without a body. A 429 or 503 reply backs
+    the host off for its Retry-After delay (capped at max_retry_after);
+    the throttled URL itself is not retried until the next run.
+    """
+    
+    def __init__(self, validators_path=None, max_workers=4, timeout=10, min_host_interval=1.0,
+                 host_intervals=None, user_agent=DEFAULT_USER_AGENT, max_retry_after=300):
+        """
+        Args:
+            validators_path (Path): JSON file persisting ETag/Last-Modified per URL
+            max_workers (int): Maximum concurrent fetches
+            timeout (float): Connect/read timeout per request in seconds
+            min_host_interval (float): Default seconds between requests to one host
+            host_intervals (dict): Host -> seconds, overriding the default
+            user_agent (str): User-Agent header sent with every request
+            max_retry_after (float): Longest back-off a Retry-After header may impose
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.max_retry_after = float(max_retry_after)
+        self.validators = ValidatorStore(validators_path)
+        self.rate_limiter = HostRateLimiter(min_host_interval, host_intervals)
+        self._local = threading.local()
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.fetched = 0
+        self.not_modified = 0
+        self.failed = 0
+        self.throttled = 0
+        self.bytes_received = 0
+    
+    def _session(self):
+        """Return this thread's pooled session, creating it on first use"""
+        session = getattr(self._local, "session", None)
+        if session is None or self._local.pid != os.getpid():
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = self.user_agent
+            self._local.session = session
+            self._local.pid = os.getpid()
+        return session
+    
+    def _get_executor(self):
+        """Return the worker pool, recreating it after a fork"""
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="grok-fetch")
+                self._pid = os.getpid()
+            return self._executor
+    
+    def fetch(self, url, consume=None):
+        """Fetch one URL with conditional headers
+        
+        Args:
+            url (str): URL to fetch
+            consume (callable): Optional function taking an iterator of body
+                chunks; the body is then streamed to it instead of being
+                buffered, and its return value is kept as "parsed"
+        
+        Returns:
+            dict: url, status, not_modified, body (bytes, None unless 200 and
+                no consumer), parsed, bytes, elapsed seconds, retry_after (seconds
+                the host was backed off, None unless throttled) and error (None on success)
+        """
+        import requests
+        host = _host(url)
+        self.rate_limiter.wait(host)
+        result = {"url": url, "status": None, "not_modified": False, "body": None, "parsed": None,
+                  "bytes": 0, "elapsed": 0.0, "retry_after": None, "error": None}
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self._session().get(url, headers=self.validators.request_headers(url),
+                                           timeout=self.timeout, stream=consume is not None)
+            result["status"] = response.status_code
+            if response.status_code == 304:
+                result["not_modified"] = True
+                outcome = "not_modified"
+            elif response.ok:
+                if consume is None:
+                    result["body"] = response.content
+                    result["bytes"] = len(response.content)
+                else:
+                    def chunks():
+                        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                            result["bytes"] += len(chunk)
+                            yield chunk
+                    result["parsed"] = consume(chunks())
+                self.validators.update(url, response.headers)
+                outcome = "ok"
+            elif response.status_code in THROTTLE_STATUSES:
+                delay = retry_after_seconds(response.headers.get("Retry-After"))
+                delay = min(DEFAULT_RETRY_AFTER if delay is None else delay, self.max_retry_after)
+                self.rate_limiter.back_off(host, delay)
+                result["retry_after"] = delay
+                result["error"] = f"HTTP {response.status_code}, backing off {host} for {delay:.0f}s"
+                outcome = "throttled"
+            else:
+                result["error"] = f"HTTP {response.status_code}"
+                outcome = "error"
+        except requests.RequestException as e:
+            result["error"] = str(e)
+            outcome = "error"
+        except Exception as e:
+            # A failing consumer (bad encoding, broken feed handler) only loses this source
+            logger.debug(f"Processing {url} failed", exc_info=True)
+            result["error"] = f"{type(e).__name__}: {e}"
+            result["parsed"] = None
+            outcome = "error"
+        finally:
+            if response is not None:
+                response.close()
+        result["elapsed"] = time.perf_counter() - start
+        
+        SOURCE_FETCHES.inc(host=host, outcome=outcome)
+        SOURCE_FETCH_SECONDS.observe(result["elapsed"], host=host)
+        with self._lock:
+            if outcome == "ok":
+                self.fetched += 1
+                self.bytes_received += result["bytes"]
+            elif outcome == "not_modified":
+                self.not_modified += 1
+            elif outcome == "throttled":
+                self.throttled += 1
+            else:
+                self.failed += 1
+        if result["error"]:
+            logger.warning(f"Fetching {url} failed: {result['error']}")
+        return result
+    
+    def fetch_all(self, urls, consume=None):
+        """Fetch URLs concurrently and persist the new validators
+        
+        Args:
+            urls (iterable): URLs to fetch
+            consume (callable): Optional body consumer (see fetch), called from
+                worker threads
+        
+        Returns:
+            list: Fetch results (see fetch) in input order
+        """
+        urls = list(urls)
+        executor = self._get_executor()
+        futures = {url: executor.submit(self.fetch, url, consume)
+                   for url in _interleave_by_host(dict.fromkeys(urls))}
+        results = [futures[url].result() for url in urls]
+        self.validators.save()
+        return results
+    
+    def close(self):
+        """Shut down the worker pool and save validators"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        self.validators.save()
+    
+    def stats(self):
+        """Return fetch counters
+        
+        Returns:
+            dict: Fetches by outcome, bytes received, stored validators, time
+                spent waiting on host rate limits and Retry-After back-offs
+        """
+        return {
+            "max_workers": self.max_workers,
+            "fetched": self.fetched,
+            "not_modified": self.not_modified,
+            "failed": self.failed,
+            "throttled": self.throttled,
+            "bytes_received": self.bytes_received,
+            "validators": len(self.validators),
+            "rate_limit_waits": self.rate_limiter.waits,
+            "rate_limit_wait_seconds": round(self.rate_limiter.waited_seconds, 3),
+            "backoffs": self.rate_limiter.backoffs,
+        }
@@ -0,0 +1,239 @@
+"""
+Compiled intent matching for chat instructions
+"""
+
+import json
+import logging
+import re
+from pathlib import Path
+
+logger = logging.getLogger("GrokBeast")
+
+BASE_DIR = Path(__file__).parent.parent
+INTENT_RULES_FILE = BASE_DIR / "config" / "intent_rules.json"
+COMMAND_EXAMPLES_FILE = BASE_DIR / "config" / "command_examples.json"
+
+def load_intent_rules(path=INTENT_RULES_FILE):
+    """Read the intent rule table
+    
+    Args:
+        path (str or Path): JSON rule file
+    
+    Returns:
+        dict: Rule table with command_keywords, intents and default
+    """
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _copy_value(value):
+    """Copy a JSON parameter value so commands never share lists with the rule table"""
+    if isinstance(value, list):
+        return [_copy_value(item) for item in value]
+    if isinstance(value, dict):
+        return _copy_params(value)
+    return value
+
+def _copy_params(params):
+    """Copy a params dict from the rule table"""
+    return {key: _copy_value(value) for key, value in params.items()}
+
+def _compile_extractor(rule):
+    """Compile one extraction rule into a function updating a params dict
+    
+    Supported rules set `param` to `value` when `if_contains` occurs in
+    the instruction, to a regex group (`pattern`, `group`, `type`), or to
+    the instruction with each `remove` string deleted in order (then
+    optionally stripped and replaced by `default` when shorter than
+    `min_length`). Matching is on the lowercased instruction; a `remove`
+    rule with `keep_case` deletes its strings case-insensitively from the
+    instruction as typed, so free text such as a shell command keeps its
+    capitalisation.
+    
+    Args:
+        rule (dict): Extraction rule from the rule table
+        
+    Returns:
+        callable: Function taking (instruction, original, params) where
+            instruction is lowercased and original is only stripped
+    """
+    name = rule["param"]
+    
+    if "if_contains" in rule:
+        needle, value = rule["if_contains"], rule["value"]
+        def extract(instruction, original, params):
+            if needle in instruction:
+                params[name] = _copy_value(value)
+        return extract
+    
+    if "pattern" in rule:
+        search = re.compile(rule["pattern"]).search
+        group = rule.get("group", 1)
+        convert = int if rule.get("type") == "int" else str
+        def extract(instruction, original, params):
+            match = search(instruction)
+            if match:
+                params[name] = convert(match.group(group))
+        return extract
+    
+    if "remove" in rule:
+        keep_case = rule.get("keep_case", False)
+        if keep_case:
+            patterns = [re.compile(re.escape(word), re.IGNORECASE) for word in rule["remove"]]
+            removals = [lambda text, pattern=pattern: pattern.sub("", text) for pattern in patterns]
+        else:
+            removals = [lambda text, word=word: text.replace(word, "") for word in rule["remove"]]
+        strip = rule.get("strip", False)
+        min_length = rule.get("min_length", 0)
+        default = rule.get("default")
+        def extract(instruction, original, params):
+            # Sequential replacement, so removals apply in table order
+            text = original if keep_case else instruction
+            for remove in removals:
+                text = remove(text)
+            if strip:
+                text = text.strip()
+            if len(text) < min_length and default is not None:
+                text = default
+            params[name] = text
+        return extract
+    
+    raise ValueError(f"Unsupported extraction rule for {name}: {rule}")
+
+class IntentEngine:
+    """Intent classifier compiled from a rule table
+    
+    Each intent's trigger terms are compiled once into a single
+    alternation, and intents are tried in table order until one matches,
+    so precedence is exactly that of a cascade of
+    `any(term in instruction ...)` checks. One combined pattern for all
+    intents was measured slower: it has to scan the whole instruction to
+    rule out higher-precedence triggers, while the per-intent patterns
+    stop at the first intent that matches.
+    """
+    
+    def __init__(self, rules):
+        """
+        Args:
+            rules (dict): Rule table as returned by load_intent_rules
+        """
+        self.intents = rules["intents"]
+        self.default = rules["default"]
+        
+        self._triggers = []
+        for index, intent in enumerate(self.intents):
+            alternatives = [re.escape(term) for term in intent.get("contains", [])]
+            # Prefix triggers only match at the start of the instruction
+            alternatives += ["^" + re.escape(prefix) for prefix in intent.get("prefixes", [])]
+            if alternatives:
+                self._triggers.append((index, re.compile("|".join(alternatives)).search))
+        
+        keywords = rules.get("command_keywords", [])
+        self._command_pattern = re.compile("|".join(re.escape(kw) for kw in keywords)) if keywords else None
+        
+        # Parameter extractors are compiled to closures once
+        self._extractors = [[_compile_extractor(rule) for rule in intent.get("extract", [])]
+                            for intent in self.intents]
+    
+    def classify(self, instruction):
+        """Find the intent for a normalised instruction
+        
+        Args:
+            instruction (str): Stripped, lowercased instruction
+        
+        Returns:
+            int: Index of the winning intent, or None for the default
+        """
+        for index, search in self._triggers:
+            if search(instruction):
+                return index
+        return None
+    
+    def _extract(self, index, instruction, original):
+        """Build the params of intent `index` for an instruction"""
+        params = _copy_params(self.intents[index].get("params", {}))
+        for extract in self._extractors[index]:
+            extract(instruction, original, params)
+        return params
+    
+    def parse(self, instruction, command_id=None):
+        """Turn an instruction into a command dict
+        
+        Args:
+            instruction (str): Raw chat instruction
+            command_id (str): ID to put in the command
+        
+        Returns:
+            dict: Command with type, id and params
+        """
+        original = instruction.strip()
+        instruction = original.lower()
+        index = self.classify(instruction)
+        if index is None:
+            return {
+                "type": self.default["type"],
+                "id": command_id,
+                "params": _copy_params(self.default.get("params", {})),
+            }
+        return {
+            "type": self.intents[index]["type"],
+            "id": command_id,
+            "params": self._extract(index, instruction, original),
+        }
+    
+    def parse_batch(self, instructions, command_ids=None):
+        """Parse many instructions, e.g. to re-classify stored history
+        
+        Args:
+            instructions (iterable): Raw chat instructions
+            command_ids (iterable): Optional IDs, one per instruction
+        
+        Returns:
+            list: Command dicts in input order
+        """
+        parse = self.parse
+        if command_ids is None:
+            return [parse(instruction) for instruction in instructions]
+        return [parse(instruction, command_id) for instruction, command_id in zip(instructions, command_ids)]
+    
+    def is_command(self, message):
+        """Check whether a chat message mentions any command keyword"""
+        return self._command_pattern is not None and self._command_pattern.search(message.lower()) is not None
+
+def check_examples(engine, path=COMMAND_EXAMPLES_FILE):
+    """Parse every example instruction and compare with its expected command
+    
+    Examples without an "instruction" field are skipped.
+    
+    Args:
+        engine (IntentEngine): Engine under test
+        path (str or Path): Command examples file
+    
+    Returns:
+        tuple: (number of examples checked, list of failure descriptions)
+    """
+    with open(path, 'r') as f:
+        examples = json.load(f)
+    
+    checked = 0
+    failures = []
+    for group, variants in examples.items():
+        for name, example in variants.items():
+            instruction = example.get("instruction")
+            if instruction is None:
+                continue
+            checked += 1
+            command = engine.parse(instruction)
+            expected = {"type": example["type"], "params": example["params"]}
+            actual = {"type": command["type"], "params": command["params"]}
+            if actual != expected:
+                failures.append(f"{group}.{name}: {instruction!r} -> {actual}, expected {expected}")
+    return checked, failures
+
+_engine = None
+
+def get_intent_engine():
+    """Return the process-wide intent engine, compiling the rule table on first use"""
+    global _engine
+    if _engine is None:
+        _engine = IntentEngine(load_intent_rules())
+    return _engine
@@ -0,0 +1,316 @@
+"""
+In-process job queue for executing commands
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+try:
+    from .metrics import STAGE_SECONDS
+except ImportError:
+    from metrics import STAGE_SECONDS
+
+logger = logging.getLogger("GrokBeast")
+
+class Job:
+    """A single queued command and its outcome"""
+    
+    def __init__(self, command):
+        self.id = f"job_{uuid.uuid4().hex[:16]}"
+        self.command = command
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+    
+    def wait(self, timeout=None):
+        """Block until the job has finished
+        
+        Args:
+            timeout (float): Maximum seconds to wait, None for no limit
+        
+        Returns:
+            bool: True if the job finished within the timeout
+        """
+        return self._done.wait(timeout)
+    
+    def done(self):
+        """Check whether the job has finished"""
+        return self._done.is_set()
+    
+    def to_dict(self):
+        """Serialise the job for API responses"""
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "command": self.command,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat() if self.started_at else None,
+            "finished_at": datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+class JobQueue:
+    """Bounded queue of command jobs served by a pool of worker threads
+    
+    Finished jobs are kept for retain_seconds so clients can fetch their
+    results, then dropped. With a SingleFlight, identical commands
+    submitted while one is running share that job. With a job store, each
+    state change is also written there, so lookup() finds jobs queued by
+    other processes (e.g. the other workers of the pre-forking server).
+    close() lets the accepted jobs finish before a process exits.
+    """
+    
+    # Statuses after which a job no longer changes
+    FINISHED = ("done", "error")
+    
+    def __init__(self, handler, workers=4, max_queue=100, retain_seconds=3600, singleflight=None,
+                 job_store=None, poll_interval=0.1):
+        """
+        Args:
+            handler (callable): Function executing a command dict and returning its response
+            workers (int): Number of worker threads
+            max_queue (int): Maximum number of jobs waiting to run
+            retain_seconds (float): How long finished jobs stay queryable
+            singleflight (SingleFlight): Coalesces identical commands (None runs each one)
+            job_store (ResultStore): Store sharing job states between processes (None keeps them local)
+            poll_interval (float): Seconds between store reads while waiting for another process's job
+        """
+        self._handler = handler
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.retain_seconds = retain_seconds
+        self.singleflight = singleflight
+        self.job_store = job_store
+        self.poll_interval = poll_interval
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._closed = False
+        self.completed = 0
+        self.failed = 0
+    
+    def _ensure_workers(self):
+        """Start the worker threads (again after a fork)"""
+        if self._threads and self._pid == os.getpid():
+            return
+        with self._lock:
+            if not self._threads or self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._pid = os.getpid()
+                self._closed = False
+                self._threads = []
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self._worker, name=f"grok-job-{i}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+    
+    def submit(self, command):
+        """Queue a command for execution
+        
+        Args:
+            command (dict): Command produced by parse_chat_instruction
+        
+        Returns:
+            Job: The queued job, or the job of an identical command in flight
+        
+        Raises:
+            queue.Full: If the queue is at capacity or closed
+        """
+        self._ensure_workers()
+        self._prune()
+        if self.singleflight is not None:
+            return self.singleflight.submit(command, self._enqueue)
+        return self._enqueue(command)
+    
+    def _enqueue(self, command):
+        """Create a job for a command and put it on the queue"""
+        job = Job(command)
+        with self._lock:
+            if self._closed:
+                raise queue.Full("Job queue is closed")
+            self._jobs[job.id] = job
+        # Published before a worker can pick it up, so "queued" never overwrites a later state
+        self._publish(job)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            job.status = "error"
+            job.error = "Queue full"
+            job.finished_at = time.time()
+            self._publish(job)
+            raise
+        return job
+    
+    def _publish(self, job):
+        """Write a job's current state to the shared store"""
+        if self.job_store is None:
+            return
+        try:
+            self.job_store.put_job(job.to_dict())
+        except Exception as e:
+            logger.warning(f"Could not store state of job {job.id}: {e}")
+    
+    def get(self, job_id):
+        """Look up a job by ID
+        
+        Returns:
+            Job: The job, or None if unknown or expired
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def lookup(self, job_id, wait=0):
+        """Return a job's state, whichever process queued it
+        
+        Args:
+            job_id (str): Job ID
+            wait (float): Seconds to wait for the job to finish
+        
+        Returns:
+            dict: The job as returned by Job.to_dict(), or None if unknown or expired
+        """
+        job = self.get(job_id)
+        if job is not None:
+            if wait > 0:
+                job.wait(wait)
+            return job.to_dict()
+        if self.job_store is None:
+            return None
+        
+        deadline = time.monotonic() + wait
+        while True:
+            data = self.job_store.get_job(job_id)
+            remaining = deadline - time.monotonic()
+            if data is None or data.get("status") in self.FINISHED or remaining <= 0:
+                return data
+            time.sleep(min(self.poll_interval, remaining))
+    
+    def depth(self):
+        """Number of jobs waiting to run"""
+        return self._queue.qsize()
+    
+    def stats(self):
+        """Return queue counters
+        
+        Returns:
+            dict: Queue depth, capacity, workers and completion counts
+        """
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == "running")
+        return {
+            "queued": self.depth(),
+            "running": running,
+            "max_queue": self.max_queue,
+            "workers": self.workers,
+            "completed": self.completed,
+            "failed": self.failed,
+            "singleflight": self.singleflight.stats() if self.singleflight is not None else None,
+        }
+    
+    def close(self, timeout=None):
+        """Stop accepting jobs and let the queued and running ones finish
+        
+        Jobs still unfinished after the timeout are abandoned: they are
+        published as failed ("worker restarted"), so clients waiting on
+        them in any process get an answer instead of a job that never ends.
+        
+        Args:
+            timeout (float): Maximum seconds to wait, None for no limit
+        
+        Returns:
+            int: Number of jobs abandoned
+        """
+        with self._lock:
+            self._closed = True
+            pending = [job for job in self._jobs.values() if not job.done()]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job in pending:
+            job.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        
+        abandoned = []
+        with self._lock:
+            for job in pending:
+                # finished_at is set under the lock once a job's outcome is decided
+                if job.finished_at is None:
+                    job.status = "error"
+                    job.error = "worker restarted"
+                    job.finished_at = time.time()
+                    abandoned.append(job)
+        for job in abandoned:
+            self._publish(job)
+            job._done.set()
+        if abandoned:
+            logger.warning(f"Abandoned {len(abandoned)} unfinished jobs")
+        return len(abandoned)
+    
+    def _prune(self):
+        """Forget finished jobs older than the retention window"""
+        cutoff = time.time() - self.retain_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if self.job_store is not None:
+            try:
+                self.job_store.prune_jobs(cutoff)
+            except Exception as e:
+                logger.warning(f"Could not prune stored jobs: {e}")
+    
+    def _worker(self):
+        """Run jobs forever"""
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                abandoned = job.finished_at is not None
+                if not abandoned:
+                    job.status = "running"
+                    job.started_at = time.time()
+            if abandoned:
+                self._queue.task_done()
+                continue
+            STAGE_SECONDS.observe(job.started_at - job.created_at, stage="job_queue_wait")
+            self._publish(job)
+            if job.finished_at is not None:
+                # Abandoned while "running" was being written; don't leave that as its last state
+                self._publish(job)
+            try:
+                result, error = self._handler(job.command), None
+            except Exception as e:
+                logger.error(f"Error running job {job.id}: {e}")
+                result, error = None, str(e)
+            with self._lock:
+                # An abandoned job was already published as failed
+                abandoned = job.finished_at is not None
+                if not abandoned:
+                    if error is None:
+                        job.result = result
+                        job.status = "done"
+                        self.completed += 1
+                    else:
+                        job.error = error
+                        job.status = "error"
+                        self.failed += 1
+                    job.finished_at = time.time()
+            if not abandoned:
+                STAGE_SECONDS.observe(job.finished_at - job.started_at, stage="job_run")
+                self._publish(job)
+                job._done.set()
+            self._queue.task_done()
@@ -0,0 +1,411 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition
+"""
+
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger("GrokBeast")
+
+# Latency buckets in seconds, from sub-millisecond parsing to slow generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _label_key(labels):
+    """Turn a label dict into a hashable, ordered key"""
+    return tuple(sorted(labels.items())) if labels else ()
+
+def _escape(value):
+    """Escape a label value for the text format"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(key, extra=None):
+    """Render a label key as {name="value",...}"""
+    pairs = list(key) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    """Render a sample value the way Prometheus expects"""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels"""
+    
+    kind = "counter"
+    
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount=1, **labels):
+        """Add amount to the counter for these labels"""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels):
+        """Return the current count for these labels"""
+        return self._values.get(_label_key(labels), 0)
+    
+    def samples(self):
+        """Return (sample name, label key, value) tuples"""
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name + "_total", key, value) for key, value in items]
+
+class Gauge:
+    """Value that can go up and down, set directly or read from a callback"""
+    
+    kind = "gauge"
+    
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._callbacks = {}
+        self._lock = threading.Lock()
+    
+    def set(self, value, **labels):
+        """Set the gauge for these labels"""
+        with self._lock:
+            self._values[_label_key(labels)] = value
+    
+    def set_function(self, fn, **labels):
+        """Compute the gauge at scrape time
+        
+        Args:
+            fn (callable): Zero-argument function returning a number
+        """
+        with self._lock:
+            self._callbacks[_label_key(labels)] = fn
+    
+    def samples(self):
+        """Return (sample name, label key, value) tuples, evaluating callbacks"""
+        with self._lock:
+            items = dict(self._values)
+            callbacks = list(self._callbacks.items())
+        for key, fn in callbacks:
+            try:
+                items[key] = fn()
+            except Exception:
+                continue
+        return [(self.name, key, value) for key, value in items.items() if value is not None]
+
+class Histogram:
+    """Distribution of observations in fixed buckets
+    
+    Observations only touch one bucket count, a sum and a total under a
+    lock; cumulative bucket counts are computed at scrape time.
+    """
+    
+    kind = "histogram"
+    
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value, **labels):
+        """Record one observation for these labels"""
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def snapshot(self, **labels):
+        """Return (count, sum) for these labels"""
+        state = self._values.get(_label_key(labels))
+        return (state[2], state[1]) if state else (0, 0.0)
+    
+    def samples(self):
+        """Return bucket, sum and count samples; buckets carry an extra le label"""
+        with self._lock:
+            items = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        out = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                out.append((self.name + "_bucket", key, cumulative, (("le", _format_value(float(bound))),)))
+            out.append((self.name + "_sum", key, total))
+            out.append((self.name + "_count", key, count))
+        return out
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together"""
+    
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+    
+    def counter(self, name, help_text=""):
+        """Return the counter called name, creating it if needed"""
+        return self._get_or_create(Counter, name, help_text)
+    
+    def gauge(self, name, help_text=""):
+        """Return the gauge called name, creating it if needed"""
+        return self._get_or_create(Gauge, name, help_text)
+    
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        """Return the histogram called name, creating it if needed"""
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+    
+    def collect(self):
+        """Return (name, kind, help, samples) for every metric, sorted by name"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        return [(metric.name, metric.kind, metric.help, metric.samples()) for metric in metrics]
+    
+    def render(self):
+        """Render every metric in the Prometheus text exposition format
+        
+        Returns:
+            str: Exposition text (version 0.0.4)
+        """
+        return _render(self.collect())
+
+def _render(collected):
+    """Render collected (name, kind, help, samples) tuples as exposition text"""
+    lines = []
+    for name, kind, help_text, samples in collected:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample in samples:
+            sample_name, key, value = sample[:3]
+            extra = sample[3] if len(sample) > 3 else None
+            lines.append(f"{sample_name}{_format_labels(key, extra)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def _pairs(value):
+    """Turn JSON label lists back into a label key"""
+    return tuple(tuple(pair) for pair in value) if value else ()
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class SharedMetrics:
+    """Metrics of several processes (e.g. server workers) rendered together
+    
+    Each process writes a snapshot of its registry to <directory>/<pid>.json
+    every interval_seconds, and again before it renders. Rendering merges
+    the snapshots of all live processes: counters and histograms are
+    summed, gauges keep one series per process with a pid label.
+    Snapshots of processes that have exited are deleted.
+    """
+    
+    def __init__(self, directory, registry=None, interval_seconds=5):
+        """
+        Args:
+            directory (Path): Directory holding one snapshot file per process
+            registry (MetricsRegistry): Registry to share (default the process-wide one)
+            interval_seconds (float): Seconds between snapshots
+        """
+        self.directory = Path(directory)
+        self.registry = registry or REGISTRY
+        self.interval_seconds = interval_seconds
+        self._thread = None
+        self._pid = None
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    def clear(self):
+        """Delete all snapshots, e.g. those left by a previous server run"""
+        for path in self.directory.glob("*.json"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+    
+    def write(self):
+        """Write this process's snapshot"""
+        path = self.directory / f"{os.getpid()}.json"
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.registry.collect(), f)
+        os.replace(tmp_path, path)
+    
+    def start(self):
+        """Write snapshots periodically on a background thread (once per process)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        
+        def loop():
+            while True:
+                try:
+                    self.write()
+                except Exception as e:
+                    logger.warning(f"Could not write metrics snapshot: {e}")
+                time.sleep(self.interval_seconds)
+        
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=loop, name="grok-metrics", daemon=True)
+        self._thread.start()
+    
+    def _snapshots(self):
+        """Yield (pid, collected metrics) for every live process"""
+        for path in sorted(self.directory.glob("*.json")):
+            if not path.stem.isdigit():
+                continue
+            pid = int(path.stem)
+            if not _alive(pid):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path, "r") as f:
+                    yield pid, json.load(f)
+            except (OSError, ValueError):
+                continue
+    
+    def collect(self):
+        """Merge the snapshots of all live processes
+        
+        Returns:
+            list: (name, kind, help, samples) tuples, sorted by name
+        """
+        self.write()
+        merged = {}
+        for pid, collected in self._snapshots():
+            for name, kind, help_text, samples in collected:
+                values = merged.setdefault(name, (kind, help_text, {}))[2]
+                for sample in samples:
+                    key = _pairs(sample[1])
+                    if kind == "gauge":
+                        key += (("pid", str(pid)),)
+                    series = (sample[0], key, _pairs(sample[3]) if len(sample) > 3 else ())
+                    values[series] = values.get(series, 0) + sample[2]
+        return [
+            (name, kind, help_text, [(sample_name, key, value, extra)
+                                     for (sample_name, key, extra), value in values.items()])
+            for name, (kind, help_text, values) in sorted(merged.items())
+        ]
+    
+    def render(self):
+        """Render the merged metrics in the Prometheus text exposition format"""
+        return _render(self.collect())
+
+# Content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Process-wide registry
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "grokbeast_stage_seconds", "Time spent in each processing stage")
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "grokbeast_http_request_seconds", "HTTP request latency by route")
+HTTP_REQUESTS = REGISTRY.counter(
+    "grokbeast_http_requests", "HTTP requests by route, method and status")
+FALLBACKS = REGISTRY.counter(
+    "grokbeast_fallback_responses", "Responses served from templates instead of the model")
+ERRORS = REGISTRY.counter(
+    "grokbeast_errors", "Errors by stage")
+CACHE_LOOKUPS = REGISTRY.counter(
+    "grokbeast_cache_lookups", "Cache lookups by cache and result")
+PREFILL_SECONDS = REGISTRY.histogram(
+    "grokbeast_prefill_seconds", "Time to the first generated token, by prefix cache use")
+COMMAND_SECONDS = REGISTRY.histogram(
+    "grokbeast_command_seconds", "Command execution time by command type")
+MODEL_MEMORY = REGISTRY.gauge(
+    "grokbeast_model_memory_bytes", "Memory held by model weights")
+QUEUE_DEPTH = REGISTRY.gauge(
+    "grokbeast_queue_depth", "Items waiting in each queue")
+RESIDENT_MEMORY = REGISTRY.gauge(
+    "process_resident_memory_bytes", "Resident memory of this process")
+
+def stage_timer(stage):
+    """Time a with-block as one processing stage
+    
+    Args:
+        stage (str): Stage name, e.g. "tokenize" or "generate"
+    """
+    return STAGE_SECONDS.time(stage=stage)
+
+def timed(stage):
+    """Decorator recording each call of a function as a processing stage
+    
+    Args:
+        stage (str): Stage name
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+        return wrapper
+    return decorator
+
+def resident_memory_bytes():
+    """Return the current resident set size, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+RESIDENT_MEMORY.set_function(resident_memory_bytes)
+
+def model_memory_bytes(model):
+    """Return the bytes held by a model's parameters and buffers
+    
+    Args:
+        model: torch module
+        
+    Returns:
+        int: Total tensor storage in bytes
+    """
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+def render_metrics():
+    """Render the process-wide registry in Prometheus text format"""
+    return REGISTRY.render()
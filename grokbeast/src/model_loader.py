@@ -0,0 +1,234 @@
+"""
+Local safetensors snapshots of causal LMs, loaded through mmap
+"""
+
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger("GrokBeast")
+
+WEIGHTS_FILE = "model.safetensors"
+MANIFEST_FILE = "snapshot.json"
+
+# safetensors dtype codes -> torch dtype names
+SAFETENSORS_DTYPES = {
+    "F64": "float64",
+    "F32": "float32",
+    "F16": "float16",
+    "BF16": "bfloat16",
+    "I64": "int64",
+    "I32": "int32",
+    "I16": "int16",
+    "I8": "int8",
+    "U8": "uint8",
+    "BOOL": "bool",
+}
+
+def snapshot_path(model_id, snapshot_dir):
+    """Return the snapshot directory of a model
+    
+    Args:
+        model_id (str): Hugging Face model ID or local path
+        snapshot_dir (str or Path): Root directory of all snapshots
+    
+    Returns:
+        Path: Directory holding the model's snapshot
+    """
+    name = re.sub(r"[^A-Za-z0-9._-]+", "--", str(model_id)).strip("-") or "model"
+    return Path(snapshot_dir) / name
+
+def has_snapshot(model_id, snapshot_dir):
+    """Check whether a complete snapshot of the model exists"""
+    path = snapshot_path(model_id, snapshot_dir)
+    return (path / MANIFEST_FILE).exists() and (path / WEIGHTS_FILE).exists()
+
+def convert_to_snapshot(model_id, snapshot_dir, local_files_only=False):
+    """Load a model once the regular way and save it as a local snapshot
+    
+    The snapshot holds the config, tokenizer and generation config plus a
+    single safetensors file with every parameter and buffer (including
+    non-persistent ones, so the model can be rebuilt without running its
+    initialisers). Tied weights are stored once. The directory is built
+    next to its final location and renamed into place, so a crash never
+    leaves a partial snapshot behind.
+    
+    Args:
+        model_id (str): Hugging Face model ID or local path
+        snapshot_dir (str or Path): Root directory of all snapshots
+        local_files_only (bool): Don't try to download the model
+    
+    Returns:
+        Path: The snapshot directory
+    """
+    import torch
+    import transformers
+    from safetensors.torch import save_file
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_id, local_files_only=local_files_only)
+    model = AutoModelForCausalLM.from_pretrained(model_id, local_files_only=local_files_only)
+    
+    # Tied parameters are the same object and are only listed once
+    tensors = {name: tensor.detach().contiguous() for name, tensor in model.named_parameters()}
+    tensors.update({name: tensor.contiguous() for name, tensor in model.named_buffers()})
+    
+    target = snapshot_path(model_id, snapshot_dir)
+    staging = target.with_name(f"{target.name}.tmp-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    try:
+        model.config.save_pretrained(staging)
+        if model.generation_config is not None:
+            model.generation_config.save_pretrained(staging)
+        tokenizer.save_pretrained(staging)
+        save_file(tensors, str(staging / WEIGHTS_FILE), metadata={"format": "pt"})
+        with open(staging / MANIFEST_FILE, 'w') as f:
+            json.dump({
+                "model_id": str(model_id),
+                "created_at": datetime.now().isoformat(),
+                "torch": torch.__version__,
+                "transformers": transformers.__version__,
+                "tensors": len(tensors),
+                "bytes": sum(t.numel() * t.element_size() for t in tensors.values()),
+            }, f, indent=2)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    
+    logger.info(f"Wrote snapshot of {model_id} to {target} in {time.perf_counter() - start:.1f}s")
+    return target
+
+def mmap_safetensors(path):
+    """Map a safetensors file and return tensors viewing the mapping
+    
+    The file is mapped copy-on-write (ACCESS_COPY): pages are read
+    lazily from the page cache and shared by every process mapping the
+    same file, and a process that writes to a tensor gets a private copy
+    of the touched pages instead of changing the file.
+    
+    Args:
+        path (str or Path): safetensors file
+    
+    Returns:
+        dict: Tensor name -> CPU tensor backed by the mapping
+    """
+    import torch
+    
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    header_size = int.from_bytes(mapping[:8], "little")
+    header = json.loads(mapping[8:8 + header_size])
+    header.pop("__metadata__", None)
+    data_start = 8 + header_size
+    
+    tensors = {}
+    for name, info in header.items():
+        dtype = getattr(torch, SAFETENSORS_DTYPES[info["dtype"]])
+        begin, end = info["data_offsets"]
+        if end == begin:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        # frombuffer keeps the mapping alive for as long as the tensor exists
+        flat = torch.frombuffer(mapping, dtype=dtype, count=(end - begin) // dtype.itemsize,
+                                offset=data_start + begin)
+        tensors[name] = flat.view(info["shape"])
+    return tensors
+
+def load_snapshot(model_id, snapshot_dir):
+    """Build a model and tokenizer from a snapshot without copying weights
+    
+    The model skeleton is created on the meta device (no allocation, no
+    random initialisation) and every parameter and buffer is then set to
+    a tensor viewing the mmapped file. Everything is read from the
+    snapshot directory; nothing touches the network.
+    
+    Args:
+        model_id (str): Hugging Face model ID or local path
+        snapshot_dir (str or Path): Root directory of all snapshots
+    
+    Returns:
+        tuple: (model, tokenizer) with the model on the CPU in eval mode
+    """
+    import torch
+    from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer
+    
+    path = snapshot_path(model_id, snapshot_dir)
+    config = AutoConfig.from_pretrained(path, local_files_only=True)
+    tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+    with torch.device("meta"):
+        model = AutoModelForCausalLM.from_config(config)
+    
+    for name, tensor in mmap_safetensors(path / WEIGHTS_FILE).items():
+        module_name, _, attr = name.rpartition(".")
+        module = model.get_submodule(module_name)
+        if attr in module._parameters:
+            module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+        else:
+            module._buffers[attr] = tensor
+    model.tie_weights()
+    
+    missing = [name for name, tensor in list(model.named_parameters()) + list(model.named_buffers())
+               if tensor.is_meta]
+    if missing:
+        raise ValueError(f"Snapshot {path} has no data for {', '.join(missing[:5])}")
+    
+    if (path / "generation_config.json").exists():
+        from transformers import GenerationConfig
+        model.generation_config = GenerationConfig.from_pretrained(path, local_files_only=True)
+    model.eval()
+    return model, tokenizer
+
+def load_causal_lm(model_id, snapshot_dir, auto_convert=False, local_files_only=False):
+    """Load a model from its snapshot, falling back to from_pretrained
+    
+    Snapshots are normally created ahead of time with --convert-model.
+    With auto_convert a missing snapshot is created here instead, which
+    runs from_pretrained (possibly downloading the model) and writes the
+    snapshot before the first load returns.
+    
+    Args:
+        model_id (str): Hugging Face model ID or local path
+        snapshot_dir (str or Path): Root directory of all snapshots
+        auto_convert (bool): Convert the model when no snapshot exists yet
+        local_files_only (bool): Don't try to download the model when converting
+    
+    Returns:
+        tuple: (model, tokenizer, report) where report says how the model
+            was loaded and how long it took
+    """
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    
+    start = time.perf_counter()
+    report = {"loader": "from_pretrained", "converted": False}
+    try:
+        if not has_snapshot(model_id, snapshot_dir) and auto_convert:
+            logger.warning(f"No snapshot of {model_id} in {snapshot_dir}; converting it now "
+                           f"(loads {model_id} with from_pretrained, which may download it)")
+            convert_to_snapshot(model_id, snapshot_dir, local_files_only=local_files_only)
+            report["converted"] = True
+        if has_snapshot(model_id, snapshot_dir):
+            model, tokenizer = load_snapshot(model_id, snapshot_dir)
+            report["loader"] = "mmap_snapshot"
+            report["seconds"] = round(time.perf_counter() - start, 3)
+            return model, tokenizer, report
+    except Exception as e:
+        logger.warning(f"Snapshot load of {model_id} failed, using from_pretrained: {e}")
+        report["error"] = str(e)
+    else:
+        logger.info(f"No snapshot of {model_id} in {snapshot_dir}, using from_pretrained "
+                    f"(run --convert-model to create one)")
+    
+    tokenizer = AutoTokenizer.from_pretrained(model_id, local_files_only=local_files_only)
+    model = AutoModelForCausalLM.from_pretrained(model_id, local_files_only=local_files_only)
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    return model, tokenizer, report
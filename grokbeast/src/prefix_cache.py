@@ -0,0 +1,213 @@
+"""
+Reusable KV caches for fixed prompt prefixes
+"""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from .metrics import CACHE_LOOKUPS, PREFILL_SECONDS, stage_timer
+except ImportError:
+    from metrics import CACHE_LOOKUPS, PREFILL_SECONDS, stage_timer
+
+logger = logging.getLogger("GrokBeast")
+
+# Earliest transformers release whose generate() continues from a
+# prefilled cache when given the full prompt (via cache_position)
+MIN_TRANSFORMERS_VERSION = "4.39.0"
+
+def supports_prefix_reuse():
+    """Check whether the installed transformers can decode from a cached prefix
+    
+    Returns:
+        bool: True if model.generate accepts a partial past_key_values
+    """
+    import transformers
+    from packaging import version
+    
+    return version.parse(transformers.__version__) >= version.parse(MIN_TRANSFORMERS_VERSION)
+
+class PrefixCache:
+    """Keep the past_key_values of fixed prompt prefixes and decode from them
+    
+    The system preambles used by chat and styled generation are the same
+    on every call. Each one is run through the model once; later prompts
+    that start with the same tokens get a copy of the stored cache, so
+    only the per-request suffix has to be prefilled.
+    
+    Entries are keyed by (model_id, prefix) and evicted least recently
+    used first.
+    """
+    
+    def __init__(self, model, tokenizer, model_id, device="cpu", max_entries=8, enabled=True):
+        """
+        Args:
+            model: Causal language model
+            tokenizer: Tokenizer matching the model
+            model_id (str): Model name, part of every cache key
+            device (str): Device the model runs on
+            max_entries (int): Number of prefixes kept
+            enabled (bool): Reuse cached prefixes; when False every prompt
+                is prefilled in full but latency is still recorded
+        """
+        self.enabled = enabled
+        self.model = model
+        self.tokenizer = tokenizer
+        self.model_id = model_id
+        self.device = device
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.mismatches = 0
+        self._prefill = {"cached": [], "full": []}
+    
+    def _entry(self, prefix):
+        """Return (prefix_ids, past_key_values) for a prefix, computing it once"""
+        key = (self.model_id, prefix)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_LOOKUPS.inc(cache="prefix", result="hit")
+                return entry
+        
+        import torch
+        
+        ids = self.tokenizer(prefix, return_tensors="pt")["input_ids"].to(self.device)
+        with torch.no_grad():
+            past = self.model(input_ids=ids, use_cache=True).past_key_values
+        entry = (ids[0].tolist(), past)
+        
+        CACHE_LOOKUPS.inc(cache="prefix", result="miss")
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        logger.info(f"Cached KV state for a {len(entry[0])}-token prefix of {self.model_id}")
+        return entry
+    
+    def prepare(self, prefix, prompt):
+        """Tokenize a prompt and attach a copy of its prefix cache
+        
+        The prompt is tokenized as a whole; the stored cache is only used
+        when its tokens are exactly the start of the prompt's tokens, so
+        output is the same as without the cache.
+        
+        Args:
+            prefix (str): Fixed leading part of the prompt
+            prompt (str): Full prompt
+        
+        Returns:
+            dict: input_ids, attention_mask and (when usable) past_key_values,
+                ready to pass to model.generate
+        """
+        with stage_timer("tokenize"):
+            inputs = dict(self.tokenizer(prompt, return_tensors="pt").to(self.device))
+        if not self.enabled or not prompt.startswith(prefix):
+            return inputs
+        
+        prefix_ids, past = self._entry(prefix)
+        prompt_ids = inputs["input_ids"][0]
+        if len(prompt_ids) <= len(prefix_ids) or prompt_ids[:len(prefix_ids)].tolist() != prefix_ids:
+            # The prefix tokenizes differently at its boundary with the rest of the prompt
+            self.mismatches += 1
+            return inputs
+        
+        # generate() extends the cache in place, so every call gets its own copy
+        inputs["past_key_values"] = copy.deepcopy(past)
+        return inputs
+    
+    def generate(self, prefix, prompt, **kwargs):
+        """Generate a continuation of prompt, reusing the prefix cache
+        
+        Args:
+            prefix (str): Fixed leading part of the prompt
+            prompt (str): Full prompt
+            **kwargs: Generation arguments for model.generate
+        
+        Returns:
+            str: The prompt followed by the generated text, like the
+                text-generation pipeline
+        """
+        import torch
+        
+        inputs = self.prepare(prefix, prompt)
+        criteria = list(kwargs.pop("stopping_criteria", None) or [])
+        criteria.append(self.prefill_timer("past_key_values" in inputs))
+        
+        from transformers import StoppingCriteriaList
+        
+        with torch.no_grad(), stage_timer("generate"):
+            output = self.model.generate(**inputs, stopping_criteria=StoppingCriteriaList(criteria), **kwargs)
+        new_tokens = output[0][inputs["input_ids"].shape[1]:]
+        return prompt + self.tokenizer.decode(new_tokens, skip_special_tokens=True)
+    
+    def prefill_timer(self, cached):
+        """Build a stopping criterion that records time to the first token
+        
+        Stopping criteria are first evaluated right after the prompt has
+        been prefilled and the first token sampled, which makes this a
+        cheap prefill-latency probe.
+        
+        Args:
+            cached (bool): Whether this call starts from a cached prefix
+        
+        Returns:
+            StoppingCriteria: Criterion that never stops generation
+        """
+        import torch
+        from transformers import StoppingCriteria
+        
+        kind = "cached" if cached else "full"
+        samples = self._prefill[kind]
+        lock = self._lock
+        
+        class PrefillTimer(StoppingCriteria):
+            def __init__(self):
+                self.started = time.perf_counter()
+                self.recorded = False
+            
+            def __call__(self, input_ids, scores, **kwargs):
+                if not self.recorded:
+                    self.recorded = True
+                    elapsed = time.perf_counter() - self.started
+                    PREFILL_SECONDS.observe(elapsed, prefix=kind)
+                    with lock:
+                        samples.append(elapsed)
+                        del samples[:-1000]
+                return torch.zeros((input_ids.shape[0],), dtype=torch.bool, device=input_ids.device)
+        
+        return PrefillTimer()
+    
+    def stats(self):
+        """Return hit counters and prefill latency for cached and full prompts
+        
+        Returns:
+            dict: Entries, hits, misses, boundary mismatches and per-kind
+                prefill latency (count, mean and p50 in milliseconds)
+        """
+        with self._lock:
+            prefill = {}
+            for kind, samples in self._prefill.items():
+                ordered = sorted(samples)
+                prefill[kind] = {
+                    "count": len(ordered),
+                    "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else None,
+                    "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2) if ordered else None,
+                }
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "mismatches": self.mismatches,
+                "prefill": prefill,
+            }
@@ -0,0 +1,299 @@
+"""
+Compact problem records and a columnar container for large problem sets
+"""
+
+import heapq
+import math
+import sys
+from array import array
+from collections.abc import Mapping
+
+# Fields of a problem record; anything else (e.g. raw_data) is an extra
+NUMERIC_FIELDS = ("pain", "urgency", "trend", "score", "rank_score")
+# Mostly distinct per problem
+TEXT_FIELDS = ("problem", "url", "grok_comment")
+# Few distinct values, shared by many problems
+CATEGORY_FIELDS = ("source", "reach", "date", "rank_comment")
+PROBLEM_FIELDS = ("problem", "source", "url", "pain", "reach", "urgency", "trend", "score", "date",
+                  "grok_comment", "rank_score", "rank_comment")
+
+# Few distinct values each; interned so records share one copy
+INTERNED_FIELDS = ("source", "reach", "date")
+
+_FIELD_SET = frozenset(PROBLEM_FIELDS)
+
+# Per-row kind of a numeric value in a ProblemSet column
+_MISSING, _INT, _FLOAT = 0, 1, 2
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def pain_level(problem):
+    """Return a problem's pain level for min_pain filtering
+    
+    Missing, NaN and non-numeric values (e.g. "7" or None from cached
+    swarm files) count as 0, as they do in a ProblemSet's pain column.
+    """
+    pain = problem.get("pain")
+    if not _is_number(pain) or (isinstance(pain, float) and math.isnan(pain)):
+        return 0
+    return pain
+
+class Problem(Mapping):
+    """One hunted problem, stored in slots instead of a per-instance dict
+    
+    A Problem is a read-only mapping with the same keys as the dict it
+    was built from, so code written for problem dicts (get, [], items,
+    dict(problem, ...)) keeps working. Unknown keys are kept in `extra`.
+    None values count as missing, as they do in the result store.
+    """
+    
+    __slots__ = PROBLEM_FIELDS + ("extra",)
+    
+    def __init__(self, **fields):
+        for name in PROBLEM_FIELDS:
+            setattr(self, name, fields.pop(name, None))
+        self.extra = {k: v for k, v in fields.items() if v is not None} or None
+    
+    @classmethod
+    def from_dict(cls, data, keep_extra=True):
+        """Build a Problem from a problem dict
+        
+        Args:
+            data (dict): Problem record
+            keep_extra (bool): Keep keys outside PROBLEM_FIELDS (such as raw_data)
+        
+        Returns:
+            Problem: The record
+        """
+        if isinstance(data, Problem):
+            return data
+        if not keep_extra:
+            data = {k: v for k, v in data.items() if k in _FIELD_SET}
+        else:
+            data = dict(data)
+        for name in INTERNED_FIELDS:
+            if isinstance(data.get(name), str):
+                data[name] = sys.intern(data[name])
+        return cls(**data)
+    
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __iter__(self):
+        for name in PROBLEM_FIELDS:
+            if getattr(self, name) is not None:
+                yield name
+        if self.extra is not None:
+            yield from self.extra
+    
+    def __len__(self):
+        return sum(1 for _ in self)
+    
+    def to_dict(self):
+        """Return the record as a plain dict (e.g. for JSON)"""
+        return dict(self)
+    
+    def __repr__(self):
+        return f"Problem({self.to_dict()!r})"
+
+def as_problem(problem, keep_extra=True):
+    """Return a Problem for a problem dict (Problems are returned unchanged)"""
+    return Problem.from_dict(problem, keep_extra=keep_extra)
+
+class ProblemSet:
+    """Column-oriented store for large numbers of problems
+    
+    Numeric fields live in array('d') columns (8 bytes per value) with a
+    byte per value recording whether it was missing, an int or a float,
+    so values round-trip with their type. Problem texts, URLs and
+    comments are packed as UTF-8 into one buffer per field with an
+    offsets array, so they cost their bytes instead of a str object
+    each. Category fields (source, reach, date, rank comment) are
+    array('I') codes into a table of distinct strings. Keys outside
+    PROBLEM_FIELDS, and values whose type doesn't fit their column, are
+    kept in a sparse per-row dict.
+    
+    Indexing or iterating materialises Problem records on demand.
+    """
+    
+    def __init__(self, problems=(), keep_extra=True):
+        """
+        Args:
+            problems (iterable): Problem dicts or Problems to add
+            keep_extra (bool): Keep keys outside PROBLEM_FIELDS (such as raw_data)
+        """
+        self.keep_extra = keep_extra
+        self._numbers = {name: array("d") for name in NUMERIC_FIELDS}
+        self._kinds = {name: bytearray() for name in NUMERIC_FIELDS}
+        self._text_data = {name: bytearray() for name in TEXT_FIELDS}
+        self._text_ends = {name: array("Q") for name in TEXT_FIELDS}
+        self._text_present = {name: bytearray() for name in TEXT_FIELDS}
+        self._categories = {name: array("I") for name in CATEGORY_FIELDS}
+        self._strings = [None]
+        self._string_codes = {}
+        self._extras = {}
+        self._size = 0
+        self.extend(problems)
+    
+    @classmethod
+    def from_dicts(cls, problems, keep_extra=True):
+        """Build a set from problem dicts"""
+        return cls(problems, keep_extra=keep_extra)
+    
+    def _code(self, text):
+        code = self._string_codes.get(text)
+        if code is None:
+            code = self._string_codes[text] = len(self._strings)
+            self._strings.append(text)
+        return code
+    
+    def append(self, problem):
+        """Add one problem (a dict or a Problem)"""
+        row = self._size
+        extra = {}
+        for name in NUMERIC_FIELDS:
+            value = problem.get(name)
+            if _is_number(value) and not (isinstance(value, float) and math.isnan(value)):
+                self._numbers[name].append(float(value))
+                self._kinds[name].append(_INT if isinstance(value, int) else _FLOAT)
+            else:
+                self._numbers[name].append(0.0)
+                self._kinds[name].append(_MISSING)
+                if value is not None:
+                    extra[name] = value
+        for name in TEXT_FIELDS:
+            value = problem.get(name)
+            data = self._text_data[name]
+            if isinstance(value, str):
+                data += value.encode("utf-8", "surrogatepass")
+            elif value is not None:
+                extra[name] = value
+            self._text_present[name].append(isinstance(value, str))
+            self._text_ends[name].append(len(data))
+        for name in CATEGORY_FIELDS:
+            value = problem.get(name)
+            if isinstance(value, str):
+                self._categories[name].append(self._code(sys.intern(value)))
+            else:
+                self._categories[name].append(0)
+                if value is not None:
+                    extra[name] = value
+        if self.keep_extra:
+            extra.update((k, v) for k, v in problem.items() if k not in _FIELD_SET and v is not None)
+        if extra:
+            self._extras[row] = extra
+        self._size += 1
+    
+    def extend(self, problems):
+        """Add several problems"""
+        for problem in problems:
+            self.append(problem)
+    
+    def __len__(self):
+        return self._size
+    
+    def _value(self, name, row):
+        if name in self._kinds:
+            kind = self._kinds[name][row]
+            if kind == _MISSING:
+                return None
+            value = self._numbers[name][row]
+            return int(value) if kind == _INT else value
+        if name in self._text_data:
+            if not self._text_present[name][row]:
+                return None
+            ends = self._text_ends[name]
+            start = ends[row - 1] if row else 0
+            return self._text_data[name][start:ends[row]].decode("utf-8", "surrogatepass")
+        return self._strings[self._categories[name][row]]
+    
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("problem index out of range")
+        fields = {name: self._value(name, index) for name in PROBLEM_FIELDS}
+        fields.update(self._extras.get(index, ()))
+        return Problem(**fields)
+    
+    def __iter__(self):
+        for index in range(self._size):
+            yield self[index]
+    
+    def column(self, name):
+        """Return the values of one field, None where missing
+        
+        Args:
+            name (str): A field from PROBLEM_FIELDS
+        
+        Returns:
+            list: One value per problem
+        """
+        return [self._value(name, row) for row in range(self._size)]
+    
+    def scores(self, weights):
+        """Compute weighted_score for every problem without materialising them
+        
+        Args:
+            weights (dict): Factor name -> weight
+        
+        Returns:
+            array: One score per problem, in order
+        """
+        result = array("d", bytes(8 * self._size))
+        for factor, weight in weights.items():
+            if factor in self._numbers:
+                # Missing values are stored as 0.0 and add nothing
+                for row, value in enumerate(self._numbers[factor]):
+                    if value:
+                        result[row] += weight * value
+        for row, extra in self._extras.items():
+            for factor, weight in weights.items():
+                if _is_number(extra.get(factor)):
+                    result[row] += weight * extra[factor]
+        return result
+    
+    def top(self, n, weights, min_pain=None):
+        """Return the n best problems, ties in insertion order
+        
+        Args:
+            n (int): Number of problems
+            weights (dict): Factor name -> weight for the score
+            min_pain (float): Ignore problems with a lower pain level
+        
+        Returns:
+            list: (score, Problem) pairs, best first
+        """
+        scores = self.scores(weights)
+        rows = range(self._size)
+        if min_pain is not None:
+            # Missing and non-numeric pain levels are stored as 0.0, like pain_level() returns
+            pain = self._numbers["pain"]
+            rows = [row for row in rows if pain[row] >= min_pain]
+        best = heapq.nlargest(n, rows, key=lambda row: (scores[row], -row))
+        return [(scores[row], self[row]) for row in best]
+    
+    def to_dicts(self):
+        """Return every problem as a plain dict"""
+        return [problem.to_dict() for problem in self]
+    
+    def stats(self):
+        """Return the set's size and approximate memory use in bytes"""
+        arrays = list(self._numbers.values()) + list(self._text_ends.values()) + list(self._categories.values())
+        columns = sum(len(col) * col.itemsize for col in arrays)
+        columns += sum(len(flags) for flags in list(self._kinds.values()) + list(self._text_present.values()))
+        return {
+            "problems": self._size,
+            "distinct_categories": len(self._strings) - 1,
+            "rows_with_extra": len(self._extras),
+            "column_bytes": columns,
+            "text_bytes": sum(len(data) for data in self._text_data.values()),
+            "category_bytes": sum(sys.getsizeof(text) for text in self._strings if text is not None),
+        }
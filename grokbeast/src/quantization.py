@@ -0,0 +1,159 @@
+"""
+CPU int8 dynamic quantization for causal language models
+"""
+
+import copy
+import io
+import logging
+import time
+
+logger = logging.getLogger("GrokBeast")
+
+# Fixed prompts used to check that quantization keeps outputs close to fp32
+QUALITY_PROMPTS = [
+    "Many developers struggle with",
+    "The biggest problem for small businesses is",
+    "Users are frustrated because",
+    "Here's what I found:",
+    "Remote teams have difficulty",
+]
+
+def conv1d_to_linear(module):
+    """Replace transformers Conv1D layers (used by GPT-2) with equivalent nn.Linear layers
+    
+    Dynamic quantization only targets nn.Linear, and GPT-2 implements its
+    attention and MLP projections as Conv1D with a transposed weight.
+    
+    Args:
+        module (torch.nn.Module): Model or submodule, modified in place
+        
+    Returns:
+        torch.nn.Module: The same module
+    """
+    import torch
+    try:
+        from transformers.pytorch_utils import Conv1D
+    except ImportError:
+        from transformers.modeling_utils import Conv1D
+    
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            linear = torch.nn.Linear(in_features, out_features, bias=child.bias is not None)
+            with torch.no_grad():
+                linear.weight.copy_(child.weight.t())
+                if child.bias is not None:
+                    linear.bias.copy_(child.bias)
+            setattr(module, name, linear)
+        else:
+            conv1d_to_linear(child)
+    return module
+
+def quantize_dynamic_int8(model):
+    """Apply dynamic int8 quantization to the model's linear layers
+    
+    Only the transformer body is quantized; the output head stays in
+    fp32 so it can keep sharing weights with the input embeddings.
+    
+    Args:
+        model: Loaded causal LM on the CPU, modified in place
+        
+    Returns:
+        The quantized model
+    """
+    import torch
+    
+    body = getattr(model, "base_model", model)
+    conv1d_to_linear(body)
+    torch.ao.quantization.quantize_dynamic(body, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+def model_size_bytes(model):
+    """Serialised size of the model's state dict (counts packed int8 weights too)"""
+    import torch
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+def greedy_continuations(model, tokenizer, prompts, max_new_tokens=16):
+    """Generate deterministic continuations for a prompt set
+    
+    Returns:
+        tuple: (list of generated token ID lists, tokens per second)
+    """
+    import torch
+    
+    outputs = []
+    generated = 0
+    start = time.perf_counter()
+    with torch.no_grad():
+        for prompt in prompts:
+            inputs = tokenizer(prompt, return_tensors="pt")
+            sequence = model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id,
+            )[0]
+            new_tokens = sequence[inputs["input_ids"].shape[1]:].tolist()
+            outputs.append(new_tokens)
+            generated += len(new_tokens)
+    duration = time.perf_counter() - start
+    return outputs, generated / duration if duration > 0 else 0.0
+
+def token_agreement(reference, candidate):
+    """Fraction of positions where two sets of continuations pick the same token"""
+    matches = 0
+    total = 0
+    for ref_tokens, cand_tokens in zip(reference, candidate):
+        total += max(len(ref_tokens), len(cand_tokens))
+        for a, b in zip(ref_tokens, cand_tokens):
+            if a != b:
+                break
+            matches += 1
+    return matches / total if total else 1.0
+
+def compare_models(reference, candidate, tokenizer, prompts=None, max_new_tokens=16):
+    """Compare size, speed and greedy outputs of two models
+    
+    Token agreement counts matching tokens up to the first divergence per
+    prompt, so 1.0 means identical continuations.
+    
+    Returns:
+        dict: Sizes, tokens/sec and agreement
+    """
+    prompts = prompts or QUALITY_PROMPTS
+    ref_outputs, ref_speed = greedy_continuations(reference, tokenizer, prompts, max_new_tokens)
+    cand_outputs, cand_speed = greedy_continuations(candidate, tokenizer, prompts, max_new_tokens)
+    return {
+        "reference_bytes": model_size_bytes(reference),
+        "candidate_bytes": model_size_bytes(candidate),
+        "reference_tokens_per_sec": round(ref_speed, 1),
+        "candidate_tokens_per_sec": round(cand_speed, 1),
+        "token_agreement": round(token_agreement(ref_outputs, cand_outputs), 3),
+        "exact_matches": sum(1 for a, b in zip(ref_outputs, cand_outputs) if a == b),
+        "prompts": len(prompts),
+    }
+
+def quantize_with_guard(model, tokenizer, min_agreement=0.5, prompts=None, max_new_tokens=16):
+    """Quantize a copy of the model and keep it only if outputs stay close to fp32
+    
+    Args:
+        model: fp32 model on the CPU
+        tokenizer: Matching tokenizer
+        min_agreement (float): Lowest acceptable token agreement
+        prompts (list): Prompts for the comparison (defaults to QUALITY_PROMPTS)
+        max_new_tokens (int): Tokens generated per prompt
+        
+    Returns:
+        tuple: (model to use, comparison report)
+    """
+    quantized = quantize_dynamic_int8(copy.deepcopy(model))
+    report = compare_models(model, quantized, tokenizer, prompts, max_new_tokens)
+    report["accepted"] = report["token_agreement"] >= min_agreement
+    if report["accepted"]:
+        logger.info(f"Using int8 model: {report['candidate_bytes'] / 2**20:.0f}MB vs "
+                    f"{report['reference_bytes'] / 2**20:.0f}MB fp32, agreement {report['token_agreement']}")
+        return quantized, report
+    logger.warning(f"int8 model rejected (agreement {report['token_agreement']} < {min_agreement}), keeping fp32")
+    return model, report
@@ -0,0 +1,232 @@
+"""
+Streaming top-K ranking of hunted problems
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+
+try:
+    from .problems import as_problem, pain_level
+except ImportError:
+    from problems import as_problem, pain_level
+
+logger = logging.getLogger("GrokBeast")
+
+# Default weights of the numeric problem factors in the ranking score
+DEFAULT_WEIGHTS = {"pain": 0.5, "urgency": 0.2, "reach": 0.2, "trend": 0.1}
+
+def weighted_score(problem, weights):
+    """Combine a problem's numeric factors into one score
+    
+    Factors that are missing or not numeric (e.g. a "SMB" reach label)
+    contribute nothing.
+    
+    Args:
+        problem (dict): Problem record
+        weights (dict): Factor name -> weight
+    
+    Returns:
+        float: Weighted sum of the factors
+    """
+    score = 0.0
+    for factor, weight in weights.items():
+        value = problem.get(factor)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            score += weight * value
+    return score
+
+class TopKRanker:
+    """Bounded best-K set of problems, maintained as they arrive
+    
+    A min-heap holds the K best problems seen so far, so each insert is
+    O(log K) and history is never re-sorted. Ties keep the earlier
+    problem, matching a stable sort of everything seen. Problems are
+    identified by URL (or text) so a re-hunted problem is not ranked
+    twice: offering it again replaces the ranked entry with the new
+    record and score (it keeps its place among ties if the score is
+    unchanged). A re-scored entry is only marked dead and skipped when it
+    surfaces, so updates stay O(log K) too; the heap is rebuilt once dead
+    entries outnumber the live ones. Problems that enter the top K are
+    kept as slotted Problem records rather than the caller's dicts.
+    
+    With a ResultStore the ranking is kept in the store instead, with the
+    same rules, so processes sharing the store (e.g. server workers) all
+    add to and serve one ranking.
+    """
+    
+    def __init__(self, k=10, weights=None, min_pain=None, store=None):
+        """
+        Args:
+            k (int): Number of problems kept
+            weights (dict): Factor name -> weight for the score
+            min_pain (float): Ignore problems with a lower pain level
+            store (ResultStore): Keep the ranking in this store instead of in memory
+        """
+        self.k = max(1, int(k))
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.min_pain = min_pain
+        self.store = store
+        # Entries are [score, order, key, problem, live]
+        self._heap = []
+        self._entries = {}
+        self._size = 0
+        self._order = itertools.count()
+        self._sorted = None
+        self._lock = threading.Lock()
+        self.seen = 0
+        self.filtered = 0
+    
+    @staticmethod
+    def _key(problem):
+        return problem.get("url") or problem.get("problem")
+    
+    def _admit(self, problem):
+        """Count an offered problem and score it
+        
+        Returns:
+            tuple: (key, score), or None if its pain level is too low
+        """
+        self.seen += 1
+        if self.min_pain is not None and pain_level(problem) < self.min_pain:
+            self.filtered += 1
+            return None
+        return self._key(problem), weighted_score(problem, self.weights)
+    
+    def add(self, problem):
+        """Offer one problem to the ranking
+        
+        Args:
+            problem (dict or Problem): Problem record
+        
+        Returns:
+            bool: True if the problem is now among the top K
+        """
+        if self.store is not None:
+            return self.extend([problem]) == 1
+        with self._lock:
+            admitted = self._admit(problem)
+            if admitted is None:
+                return False
+            key, score = admitted
+            old = self._entries.get(key) if key is not None else None
+            if old is not None:
+                if score == old[0]:
+                    # Same score: swap in the new record where the old one stands
+                    old[3] = as_problem(problem)
+                    self._sorted = None
+                    return True
+                # Re-scored (or re-hunted) problem: retire its old entry and rank it afresh
+                self._invalidate(old)
+            # Negated arrival order makes older entries win ties
+            order = -next(self._order)
+            self._drop_dead()
+            if self._size == self.k and (score, order) <= (self._heap[0][0], self._heap[0][1]):
+                return False
+            # Only problems that make the cut are converted
+            entry = [score, order, key, as_problem(problem), True]
+            heapq.heappush(self._heap, entry)
+            self._size += 1
+            if key is not None:
+                self._entries[key] = entry
+            if self._size > self.k:
+                self._drop_dead()
+                self._invalidate(heapq.heappop(self._heap))
+            if len(self._heap) > 2 * self.k:
+                self._heap = [entry for entry in self._heap if entry[4]]
+                heapq.heapify(self._heap)
+            self._sorted = None
+            return True
+    
+    def _invalidate(self, entry):
+        """Mark an entry dead; it stays in the heap until it surfaces"""
+        entry[4] = False
+        self._size -= 1
+        if entry[2] is not None:
+            self._entries.pop(entry[2], None)
+    
+    def _drop_dead(self):
+        """Pop dead entries off the top of the heap"""
+        while self._heap and not self._heap[0][4]:
+            heapq.heappop(self._heap)
+    
+    def extend(self, problems):
+        """Offer several problems
+        
+        Returns:
+            int: Number of problems that entered the top K
+        """
+        if self.store is None:
+            return sum(1 for problem in problems if self.add(problem))
+        entries = []
+        with self._lock:
+            for problem in problems:
+                admitted = self._admit(problem)
+                if admitted is not None:
+                    key, score = admitted
+                    entries.append((key, score, as_problem(problem).to_dict()))
+        if not entries:
+            return 0
+        # One transaction for the whole batch
+        return sum(self.store.update_ranking(entries, self.k))
+    
+    def top(self, n=None):
+        """Return the current best problems
+        
+        Args:
+            n (int): Number of problems, at most K (default K)
+        
+        Returns:
+            list: (score, Problem) pairs, best first
+        """
+        if self.store is not None:
+            limit = self.k if n is None else min(max(0, n), self.k)
+            return [(score, as_problem(problem)) for score, problem in self.store.ranking(limit)]
+        with self._lock:
+            if self._sorted is None:
+                live = [entry for entry in self._heap if entry[4]]
+                self._sorted = [(entry[0], entry[3]) for entry in sorted(live, key=lambda e: e[:2], reverse=True)]
+            ranked = self._sorted
+        return list(ranked) if n is None else ranked[:n]
+    
+    def __len__(self):
+        if self.store is not None:
+            return self.store.ranking_stats()["size"]
+        return self._size
+    
+    def clear(self):
+        """Forget every ranked problem"""
+        if self.store is not None:
+            self.store.clear_ranking()
+            return
+        with self._lock:
+            self._heap = []
+            self._entries = {}
+            self._size = 0
+            self._sorted = None
+    
+    def stats(self):
+        """Return ranking counters
+        
+        Returns:
+            dict: Size, capacity, problems seen, filtered by pain and the
+                lowest score still in the top K
+        """
+        if self.store is not None:
+            ranked = self.store.ranking_stats()
+            size, min_score = ranked["size"], ranked["min_score"]
+        else:
+            with self._lock:
+                self._drop_dead()
+                size = self._size
+                min_score = self._heap[0][0] if self._heap else None
+        return {
+            "size": size,
+            "k": self.k,
+            "seen": self.seen,
+            "filtered": self.filtered,
+            "min_score": round(min_score, 3) if min_score is not None else None,
+            "weights": self.weights,
+            "min_pain": self.min_pain,
+        }
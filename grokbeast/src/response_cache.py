@@ -0,0 +1,227 @@
+"""
+TTL and size-bounded LRU cache for generated responses
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger("GrokBeast")
+
+# Rough per-entry bookkeeping cost on top of key and value bytes
+_ENTRY_OVERHEAD = 200
+
+def make_key(*parts):
+    """Build a stable cache key from JSON-serialisable parts"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """In-memory LRU cache with per-entry TTL and an optional disk tier
+    
+    Memory use is bounded by the summed size of cached keys and values;
+    the least recently used entries are evicted first. Entries written to
+    disk survive restarts and are promoted back into memory on a hit.
+    The disk tier has its own budget, enforced by cleanup().
+    """
+    
+    def __init__(self, max_bytes, ttl_seconds, disk_dir=None, cleanup_interval_seconds=None,
+                 disk_max_bytes=None):
+        """
+        Args:
+            max_bytes (int): Size budget of the memory tier
+            ttl_seconds (float): Lifetime of an entry
+            disk_dir (Path): Directory for the on-disk tier, None for memory only
+            cleanup_interval_seconds (float): How often expired disk entries are purged
+            disk_max_bytes (int): Size budget of the disk tier (default max_bytes)
+        """
+        self.max_bytes = max(0, int(max_bytes))
+        self.disk_max_bytes = self.max_bytes if disk_max_bytes is None else max(0, int(disk_max_bytes))
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.cleanup_interval_seconds = cleanup_interval_seconds
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._last_cleanup = time.time()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _disk_path(self, key):
+        return self.disk_dir / key[:2] / f"{key}.json"
+    
+    def get(self, key):
+        """Look up a cached value
+        
+        Args:
+            key (str): Cache key from make_key
+            
+        Returns:
+            str: Cached value, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires, size = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self._bytes -= size
+        
+        value = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self.hits += 1
+        return value
+    
+    def put(self, key, value):
+        """Store a value
+        
+        Args:
+            key (str): Cache key from make_key
+            value (str): Value to cache
+        """
+        expires = time.time() + self.ttl_seconds
+        self._put_memory(key, value, expires)
+        if self.disk_dir is not None:
+            self._write_disk(key, value, expires)
+            self._maybe_cleanup()
+    
+    def _put_memory(self, key, value, expires):
+        size = len(key) + len(value.encode("utf-8")) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            while self._entries and self._bytes + size > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+            self._entries[key] = (value, expires, size)
+            self._bytes += size
+    
+    def _read_disk(self, key, now):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("expires", 0) <= now:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+        value = record.get("value")
+        if isinstance(value, str):
+            self._put_memory(key, value, record["expires"])
+            return value
+        return None
+    
+    def _write_disk(self, key, value, expires):
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump({"value": value, "expires": expires}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write response cache entry: {e}")
+    
+    def _maybe_cleanup(self):
+        if not self.cleanup_interval_seconds:
+            return
+        now = time.time()
+        with self._lock:
+            if now - self._last_cleanup < self.cleanup_interval_seconds:
+                return
+            self._last_cleanup = now
+        self.cleanup()
+    
+    def cleanup(self):
+        """Purge expired disk entries and trim the disk tier to disk_max_bytes
+        
+        Returns:
+            int: Number of files removed
+        """
+        if self.disk_dir is None:
+            return 0
+        now = time.time()
+        removed = 0
+        live = []
+        for path in self.disk_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+                with open(path, 'r') as f:
+                    expires = json.load(f).get("expires", 0)
+            except (OSError, ValueError):
+                expires = 0
+                stat = None
+            if expires <= now:
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+            elif stat is not None:
+                live.append((stat.st_mtime, stat.st_size, path))
+        
+        # Oldest entries go first when the disk tier is over budget
+        total = sum(size for _, size, _ in live)
+        for _, size, path in sorted(live):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                path.unlink()
+                removed += 1
+                total -= size
+            except OSError:
+                pass
+        return removed
+    
+    def clear(self):
+        """Drop all in-memory entries"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self):
+        """Return cache counters
+        
+        Returns:
+            dict: Hits, misses, evictions, entry count and memory use
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir is not None else None,
+            }
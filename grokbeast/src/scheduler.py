@@ -0,0 +1,249 @@
+"""
+Adaptive hunt scheduling and a token bucket for the daily tweet budget
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    from .filelock import file_lock
+    from .metrics import REGISTRY
+except ImportError:
+    from filelock import file_lock
+    from metrics import REGISTRY
+
+logger = logging.getLogger("GrokBeast")
+
+HUNT_INTERVAL = REGISTRY.gauge("grokbeast_hunt_interval_seconds", "Current delay between scheduled hunts")
+HUNT_YIELD = REGISTRY.counter("grokbeast_hunt_new_problems", "New problems found by scheduled hunts")
+HUNT_CYCLES = REGISTRY.counter("grokbeast_hunt_cycles", "Scheduled hunt cycles by outcome")
+
+class TokenBucket:
+    """Token bucket that refills continuously up to its capacity
+    
+    With capacity N and a refill of N per day it allows at most N
+    actions in any 24 hours while letting them bunch up when there is
+    something worth acting on. The state can be persisted so restarts
+    don't hand out a fresh day's budget. A persisted bucket is re-read
+    under a file lock on every use, so processes sharing the state file
+    (e.g. server workers) share one budget.
+    """
+    
+    def __init__(self, capacity, refill_per_second, state_path=None):
+        """
+        Args:
+            capacity (float): Maximum number of tokens
+            refill_per_second (float): Tokens added per second
+            state_path (Path): Optional JSON file keeping the bucket across restarts
+        """
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.state_path = state_path
+        self._tokens = self.capacity
+        self._updated = time.time()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.denied = 0
+        self._load()
+    
+    @classmethod
+    def per_day(cls, limit, state_path=None):
+        """Build a bucket allowing `limit` tokens per day"""
+        return cls(limit, limit / 86400.0, state_path=state_path)
+    
+    def _load(self):
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+            self._tokens = min(self.capacity, float(state["tokens"]))
+            self._updated = float(state["updated"])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable token bucket state {self.state_path}: {e}")
+    
+    def _save(self):
+        if self.state_path is None:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"tokens": self._tokens, "updated": self._updated}, f)
+        os.replace(tmp_path, self.state_path)
+    
+    @contextmanager
+    def _shared(self):
+        """Hold the bucket, picking up changes other processes saved"""
+        with self._lock:
+            if self.state_path is None:
+                yield
+                return
+            with file_lock(f"{self.state_path}.lock"):
+                self._load()
+                yield
+    
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+        self._updated = now
+    
+    def try_acquire(self, tokens=1):
+        """Take tokens if available
+        
+        Args:
+            tokens (float): Tokens needed
+        
+        Returns:
+            bool: True if the tokens were taken
+        """
+        with self._shared():
+            self._refill(time.time())
+            if self._tokens < tokens:
+                self.denied += 1
+                return False
+            self._tokens -= tokens
+            self.granted += 1
+            self._save()
+            return True
+    
+    def available(self):
+        """Return the number of whole tokens currently available"""
+        with self._shared():
+            self._refill(time.time())
+            return int(self._tokens)
+    
+    def stats(self):
+        """Return bucket state and counters"""
+        return {
+            "available": self.available(),
+            "capacity": self.capacity,
+            "granted": self.granted,
+            "denied": self.denied,
+        }
+
+class HuntScheduler:
+    """Run hunt cycles on an interval that adapts to how much they find
+    
+    After each cycle the delay is adjusted from the number of new
+    (non-duplicate) problems it produced:
+    
+    - none: the delay doubles, up to max_interval, so quiet periods cost little
+    - at least burst_threshold: the delay drops straight to min_interval
+    - some: the delay halves, down to min_interval
+    
+    With adaptive=False the delay stays at the base interval.
+    """
+    
+    def __init__(self, run_cycle, interval, min_interval, max_interval, adaptive=True, burst_threshold=3):
+        """
+        Args:
+            run_cycle (callable): Runs one hunt and returns the number of new problems
+            interval (float): Starting (and non-adaptive) delay in seconds
+            min_interval (float): Shortest delay in seconds
+            max_interval (float): Longest delay in seconds
+            adaptive (bool): Adjust the delay from each cycle's yield
+            burst_threshold (int): New problems in one cycle that count as a burst
+        """
+        self._run_cycle = run_cycle
+        self.min_interval = float(min_interval)
+        self.max_interval = max(self.min_interval, float(max_interval))
+        self.base_interval = min(max(float(interval), self.min_interval), self.max_interval)
+        self.interval = self.base_interval
+        self.adaptive = adaptive
+        self.burst_threshold = max(1, int(burst_threshold))
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.cycles = 0
+        self.empty_cycles = 0
+        self.failed_cycles = 0
+        self.last_yield = None
+        self.last_run_at = None
+        self.next_run_at = None
+        HUNT_INTERVAL.set(self.interval)
+    
+    def next_interval(self, new_problems):
+        """Compute the delay before the next cycle
+        
+        Args:
+            new_problems (int): New problems found by the last cycle
+        
+        Returns:
+            float: Delay in seconds
+        """
+        if not self.adaptive:
+            return self.base_interval
+        if new_problems <= 0:
+            return min(self.max_interval, self.interval * 2)
+        if new_problems >= self.burst_threshold:
+            return self.min_interval
+        return max(self.min_interval, self.interval / 2)
+    
+    def run_once(self):
+        """Run one cycle and adapt the interval
+        
+        Returns:
+            int: New problems found (0 if the cycle failed)
+        """
+        self.last_run_at = datetime.now().isoformat()
+        try:
+            new_problems = int(self._run_cycle() or 0)
+            HUNT_CYCLES.inc(outcome="empty" if new_problems == 0 else "found")
+        except Exception as e:
+            logger.error(f"Scheduled hunt failed: {e}")
+            HUNT_CYCLES.inc(outcome="error")
+            self.failed_cycles += 1
+            new_problems = 0
+        self.cycles += 1
+        if new_problems == 0:
+            self.empty_cycles += 1
+        HUNT_YIELD.inc(new_problems)
+        self.last_yield = new_problems
+        self.interval = self.next_interval(new_problems)
+        HUNT_INTERVAL.set(self.interval)
+        logger.info(f"Hunt cycle found {new_problems} new problems, next in {self.interval / 60:.1f} min")
+        return new_problems
+    
+    def run_forever(self):
+        """Run cycles until stop() is called"""
+        while not self._stop.is_set():
+            self.run_once()
+            self.next_run_at = datetime.fromtimestamp(time.time() + self.interval).isoformat()
+            self._stop.wait(self.interval)
+    
+    def start(self):
+        """Run the scheduler in a background thread (again after a fork)"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._stop.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self.run_forever, name="grok-hunt-scheduler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop after the current cycle"""
+        self._stop.set()
+    
+    def stats(self):
+        """Return scheduler state
+        
+        Returns:
+            dict: Interval bounds, cycle counts and the last yield
+        """
+        return {
+            "running": self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+            "adaptive": self.adaptive,
+            "interval_seconds": self.interval,
+            "min_interval_seconds": self.min_interval,
+            "max_interval_seconds": self.max_interval,
+            "cycles": self.cycles,
+            "empty_cycles": self.empty_cycles,
+            "failed_cycles": self.failed_cycles,
+            "last_yield": self.last_yield,
+            "last_run_at": self.last_run_at,
+            "next_run_at": self.next_run_at,
+        }
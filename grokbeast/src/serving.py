@@ -0,0 +1,327 @@
+"""
+Pre-forking web server sharing one preloaded model across worker processes
+"""
+
+import gc
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+logger = logging.getLogger("GrokBeast")
+
+# smaps_rollup fields (kB) reported per process
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+def process_memory(pid="self"):
+    """Read a process's memory breakdown from /proc/<pid>/smaps_rollup
+    
+    RSS counts every resident page, including model weights shared
+    copy-on-write with the master and the other workers. PSS divides each
+    shared page among the processes mapping it, so summing PSS over the
+    workers gives their real footprint.
+    
+    Args:
+        pid (int or str): Process ID, or "self"
+    
+    Returns:
+        dict: rss, pss, shared and private bytes, or None where unavailable
+    """
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].rstrip(":") in SMAPS_FIELDS:
+                    values[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except (OSError, ValueError):
+        return None
+    if "Rss" not in values:
+        return None
+    return {
+        "rss": values["Rss"],
+        "pss": values.get("Pss"),
+        "shared": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+        "private": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+def set_torch_threads(threads):
+    """Set torch's intra-op thread count if torch is loaded
+    
+    Several workers each running a full-width thread pool oversubscribe
+    the CPU, so workers usually get cores / workers threads.
+    
+    Args:
+        threads (int): Threads per process (0 or None leaves torch alone)
+    
+    Returns:
+        bool: True if the setting was applied
+    """
+    torch = sys.modules.get("torch")
+    if torch is None or not threads:
+        return False
+    torch.set_num_threads(int(threads))
+    return True
+
+def _make_werkzeug_server(host, port, app, threaded, sock):
+    """Serve `app` on an inherited listening socket with werkzeug"""
+    from werkzeug.serving import make_server
+    server = make_server(host, port, app, threaded=threaded, fd=sock.fileno())
+    # Let server_close() wait for requests still in flight
+    server.daemon_threads = False
+    return server
+
+class PreforkServer:
+    """Master process that preloads the model and forks WSGI workers
+    
+    The master binds the listening socket and runs `preload` (loading the
+    model), then moves every surviving object into the permanent GC
+    generation with gc.freeze() so collections in the workers don't
+    write to, and thereby copy, the shared pages. Each forked worker builds
+    its app with `app_factory` and accepts connections on the inherited
+    socket; the kernel spreads connections over the workers.
+    
+    Signals to the master:
+    
+    - SIGHUP: graceful reload; `on_reload` runs in the master (e.g. to
+      re-read config and reload the model), a new generation of workers
+      is started and the old one finishes its in-flight requests and exits
+    - SIGTERM / SIGINT: graceful shutdown of all workers
+    
+    A stopping worker finishes its in-flight requests, then runs
+    `on_worker_stop` (e.g. to drain background jobs) with what is left of
+    graceful_timeout. Workers that die unexpectedly are replaced.
+    """
+    
+    def __init__(self, app_factory, host="0.0.0.0", port=5000, workers=2, threaded=True, torch_threads=None,
+                 preload=None, on_worker_start=None, on_worker_stop=None, on_reload=None, graceful_timeout=30,
+                 stats_interval=60, stats_path=None, make_server=_make_werkzeug_server):
+        """
+        Args:
+            app_factory (callable): Builds the WSGI app inside each worker
+            host (str): Interface to bind
+            port (int): Port to bind
+            workers (int): Worker processes
+            threaded (bool): Handle requests on threads within each worker
+            torch_threads (int): torch intra-op threads per worker (None keeps torch's default)
+            preload (callable): Runs in the master before forking, e.g. to load the model
+            on_worker_start (callable): Called with the worker index in each new worker
+            on_worker_stop (callable): Called with the worker index and the seconds left
+                before the worker is killed, once a stopping worker stopped serving
+            on_reload (callable): Runs in the master on SIGHUP before new workers start
+            graceful_timeout (float): Seconds a stopping worker may take before it is killed
+            stats_interval (float): Seconds between per-worker memory reports
+            stats_path (Path): Optional JSON file receiving the memory reports
+            make_server (callable): Builds a server from (host, port, app, threaded, sock)
+        """
+        self.app_factory = app_factory
+        self.host = host
+        self.port = port
+        self.workers = max(1, int(workers))
+        self.threaded = threaded
+        self.torch_threads = torch_threads
+        self.preload = preload
+        self.on_worker_start = on_worker_start
+        self.on_worker_stop = on_worker_stop
+        self.on_reload = on_reload
+        self.graceful_timeout = graceful_timeout
+        self.stats_interval = stats_interval
+        self.stats_path = stats_path
+        self.make_server = make_server
+        self.socket = None
+        self.generation = 0
+        self.reloads = 0
+        self.respawns = 0
+        self._children = {}
+        self._stopping = {}
+        self._shutdown = False
+        self._reload_requested = False
+        self._last_stats = 0.0
+    
+    def bind(self):
+        """Open the listening socket shared by all workers"""
+        sock = socket.create_server((self.host, self.port), backlog=2048)
+        # Non-blocking so a worker that loses the race for a connection
+        # goes back to waiting instead of blocking in accept()
+        sock.setblocking(False)
+        sock.set_inheritable(True)
+        self.socket = sock
+        self.port = sock.getsockname()[1]
+        return sock
+    
+    def _preload(self):
+        set_torch_threads(self.torch_threads)
+        if self.preload is not None:
+            self.preload()
+        gc.collect()
+        gc.freeze()
+    
+    def _spawn(self, index):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker(index)
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self._children[pid] = (index, self.generation)
+        return pid
+    
+    def _run_worker(self, index):
+        """Serve requests until SIGTERM (runs in the forked child)"""
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        set_torch_threads(self.torch_threads)
+        if self.on_worker_start is not None:
+            self.on_worker_start(index)
+        
+        server = self.make_server(self.host, self.port, self.app_factory(), self.threaded, self.socket)
+        # The master kills this worker graceful_timeout after sending SIGTERM
+        deadline = None
+        
+        def stop(signum, frame):
+            nonlocal deadline
+            deadline = time.monotonic() + self.graceful_timeout
+            # shutdown() blocks until serve_forever returns, so not on this thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+        
+        signal.signal(signal.SIGTERM, stop)
+        logger.info(f"Worker {index} (pid {os.getpid()}) serving on port {self.port}")
+        server.serve_forever()
+        server.server_close()
+        if self.on_worker_stop is not None:
+            # Keep a second back to finish up before the master's SIGKILL
+            remaining = self.graceful_timeout if deadline is None else deadline - time.monotonic()
+            self.on_worker_stop(index, max(0.0, remaining - 1))
+    
+    def _handle_signal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self._reload_requested = True
+        else:
+            self._shutdown = True
+    
+    def _stop_children(self, pids):
+        for pid in pids:
+            if pid in self._children and pid not in self._stopping:
+                self._stopping[pid] = time.monotonic() + self.graceful_timeout
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+    
+    def _reap(self):
+        """Collect exited workers and replace the ones that died unexpectedly"""
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            index, generation = self._children.pop(pid, (None, None))
+            expected = self._stopping.pop(pid, None) is not None
+            if index is None or expected or self._shutdown or generation != self.generation:
+                continue
+            logger.warning(f"Worker {index} (pid {pid}) exited with status {status}; restarting it")
+            self.respawns += 1
+            time.sleep(1)
+            self._spawn(index)
+        
+        now = time.monotonic()
+        for pid, deadline in list(self._stopping.items()):
+            if now > deadline:
+                logger.warning(f"Worker pid {pid} did not stop within {self.graceful_timeout}s; killing it")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self._stopping[pid] = float("inf")
+    
+    def _reload(self):
+        """Start a new worker generation and retire the current one"""
+        self._reload_requested = False
+        logger.info("Reloading workers")
+        try:
+            gc.unfreeze()
+            if self.on_reload is not None:
+                self.on_reload()
+            self._preload()
+        except Exception as e:
+            gc.freeze()
+            logger.error(f"Reload failed, keeping the current workers: {e}")
+            return
+        old = [pid for pid, (_, generation) in self._children.items() if generation == self.generation]
+        self.generation += 1
+        self.reloads += 1
+        for index in range(self.workers):
+            self._spawn(index)
+        self._stop_children(old)
+    
+    def stats(self):
+        """Report memory per worker and in total
+        
+        Returns:
+            dict: Master and per-worker rss/pss/shared/private bytes plus
+                the summed worker PSS
+        """
+        workers = []
+        for pid, (index, generation) in sorted(self._children.items(), key=lambda item: item[1]):
+            workers.append(dict(process_memory(pid) or {}, pid=pid, index=index, generation=generation,
+                                stopping=pid in self._stopping))
+        pss = [worker.get("pss") for worker in workers]
+        return {
+            "master": dict(process_memory() or {}, pid=os.getpid()),
+            "workers": workers,
+            "worker_pss_total": sum(pss) if pss and None not in pss else None,
+            "generation": self.generation,
+            "reloads": self.reloads,
+            "respawns": self.respawns,
+        }
+    
+    def _report(self):
+        stats = self.stats()
+        for worker in stats["workers"]:
+            if "rss" in worker:
+                logger.info(f"Worker {worker['index']} (pid {worker['pid']}): rss {worker['rss'] / 2**20:.0f} MiB, "
+                            f"pss {worker['pss'] / 2**20:.0f} MiB, shared {worker['shared'] / 2**20:.0f} MiB")
+        if self.stats_path is not None:
+            tmp_path = f"{self.stats_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(dict(stats, updated_at=time.time()), f, indent=2)
+            os.replace(tmp_path, self.stats_path)
+    
+    def run(self):
+        """Bind, preload, fork the workers and supervise them until shutdown"""
+        if self.socket is None:
+            self.bind()
+        self._preload()
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self._handle_signal)
+        
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info(f"Master pid {os.getpid()} started {self.workers} workers on port {self.port}")
+        
+        while not self._shutdown:
+            if self._reload_requested:
+                self._reload()
+            self._reap()
+            if self.stats_interval and time.monotonic() - self._last_stats >= self.stats_interval:
+                self._last_stats = time.monotonic()
+                self._report()
+            time.sleep(0.2)
+        
+        logger.info("Shutting down workers")
+        self._stop_children(list(self._children))
+        while self._children:
+            self._reap()
+            time.sleep(0.05)
+        self.socket.close()
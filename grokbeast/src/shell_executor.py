@@ -0,0 +1,333 @@
+"""
+Asynchronous executor for allow-listed shell commands with streamed output
+"""
+
+import asyncio
+import codecs
+import logging
+import os
+import shlex
+import signal
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from metrics import REGISTRY
+
+logger = logging.getLogger("GrokBeast")
+
+# Bytes read from a pipe at a time
+READ_CHUNK_SIZE = 4096
+
+# Options that make common tools (git, ssh, find, ...) run another program
+# or load config that can; rejected anywhere on the command line
+FORBIDDEN_OPTIONS = {"-c", "--config", "--config-env", "--exec", "--exec-path", "--upload-pack",
+                     "--receive-pack", "-exec", "-execdir", "-ok", "-okdir"}
+
+SHELL_COMMANDS = REGISTRY.counter(
+    "grokbeast_shell_commands", "Shell commands by outcome (done, failed, timeout, error or rejected)")
+SHELL_SECONDS = REGISTRY.histogram("grokbeast_shell_seconds", "Shell command run time")
+
+class ShellRun:
+    """One shell command, its retained output and its outcome
+    
+    Output is kept as a ring buffer of chunks (of up to READ_CHUNK_SIZE
+    bytes each); once more than max_output_bytes characters are held,
+    the oldest chunks are dropped and counted in dropped_bytes. Followers
+    read chunks as they arrive.
+    """
+    
+    def __init__(self, argv, capture_output=True, max_output_bytes=256 * 1024):
+        """
+        Args:
+            argv (list): Program and arguments
+            capture_output (bool): Pipe stdout/stderr (False inherits the server's)
+            max_output_bytes (int): Output retained per run
+        """
+        self.id = f"run_{uuid.uuid4().hex[:16]}"
+        self.argv = argv
+        self.capture_output = capture_output
+        self.max_output_bytes = max(1, int(max_output_bytes))
+        self.status = "queued"
+        self.returncode = None
+        self.error = None
+        self.pid = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.dropped_bytes = 0
+        self._chunks = deque()
+        self._retained = 0
+        self._seq = 0
+        self._cond = threading.Condition()
+    
+    def _append(self, stream, text):
+        with self._cond:
+            self._seq += 1
+            self._chunks.append((self._seq, stream, text))
+            self._retained += len(text)
+            while self._retained > self.max_output_bytes and len(self._chunks) > 1:
+                _, _, dropped = self._chunks.popleft()
+                self._retained -= len(dropped)
+                self.dropped_bytes += len(dropped)
+            self._cond.notify_all()
+    
+    def _finish(self, status, returncode=None, error=None):
+        with self._cond:
+            self.status = status
+            self.returncode = returncode
+            self.error = error
+            self.finished_at = time.time()
+            self._cond.notify_all()
+    
+    def done(self):
+        """Check whether the command has finished"""
+        return self.finished_at is not None
+    
+    def wait(self, timeout=None):
+        """Block until the command has finished
+        
+        Returns:
+            bool: True if it finished within the timeout
+        """
+        with self._cond:
+            return self._cond.wait_for(self.done, timeout)
+    
+    def follow(self, heartbeat=None):
+        """Yield output as it is produced until the command finishes
+        
+        Chunks already dropped from the ring buffer are skipped.
+        
+        Args:
+            heartbeat (float): Yield ("heartbeat", "") after this many idle seconds
+        
+        Yields:
+            tuple: (stream, text) with stream "stdout", "stderr" or "heartbeat"
+        """
+        last = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._seq > last or self.done(), heartbeat)
+                pending = [(seq, stream, text) for seq, stream, text in self._chunks if seq > last]
+                finished = self.done()
+            if pending:
+                last = pending[-1][0]
+                for _, stream, text in pending:
+                    yield stream, text
+            elif finished:
+                return
+            else:
+                yield "heartbeat", ""
+    
+    def output(self, stream):
+        """Return the retained output of one stream"""
+        with self._cond:
+            return "".join(text for _, name, text in self._chunks if name == stream)
+    
+    def to_dict(self):
+        """Serialise the run for API responses (without its output)"""
+        return {
+            "run_id": self.id,
+            "argv": self.argv,
+            "status": self.status,
+            "pid": self.pid,
+            "returncode": self.returncode,
+            "error": self.error,
+            "dropped_bytes": self.dropped_bytes,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat() if self.started_at else None,
+            "finished_at": datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+        }
+
+class ShellExecutor:
+    """Runs allow-listed commands as subprocesses on a background event loop
+    
+    One asyncio loop in a daemon thread drives every command, so a
+    running command holds no thread of its own. At most max_concurrent
+    commands run at once; the rest wait their turn. A command running
+    longer than timeout is killed together with its process group.
+    Commands are split with shlex and executed directly, never through
+    a shell, and only commands matching allowed_commands may run.
+    
+    An allow-list entry is a program name ("ls") or a program followed by
+    a subcommand ("git status"); a command matches when its first words
+    are exactly the entry's. List subcommands for tools such as git that
+    can run arbitrary programs: with a bare "git" entry, options like
+    `-c alias.x=!cmd` would turn it into a shell. Options in
+    FORBIDDEN_OPTIONS are rejected whatever the entry.
+    """
+    
+    def __init__(self, allowed_commands=(), max_concurrent=2, timeout=60, max_output_bytes=256 * 1024,
+                 keep_runs=50):
+        """
+        Args:
+            allowed_commands (iterable): Programs or "program subcommand" entries that may be run
+            max_concurrent (int): Commands running at the same time
+            timeout (float): Seconds a command may run before it is killed
+            max_output_bytes (int): Output retained per run
+            keep_runs (int): Finished runs kept for lookup
+        """
+        self.allowed_commands = {tuple(shlex.split(entry)) for entry in allowed_commands if entry.strip()}
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+        self.keep_runs = max(1, int(keep_runs))
+        self._runs = OrderedDict()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._semaphore = None
+        self._pid = None
+        self.rejected = 0
+    
+    def check(self, command):
+        """Split a command line and enforce the allow-list
+        
+        Args:
+            command (str): Command line
+        
+        Returns:
+            list: argv
+        
+        Raises:
+            ValueError: If the command is empty or can't be split
+            PermissionError: If the command is not allow-listed or uses a forbidden option
+        """
+        argv = shlex.split(command or "")
+        if not argv:
+            raise ValueError("No command given")
+        # A path only matches an entry spelled the same way, so "./ls" is not "ls"
+        if not any(tuple(argv[:len(entry)]) == entry for entry in self.allowed_commands):
+            self._reject(f"Command not allowed: {' '.join(argv[:2])}")
+        for arg in argv[1:]:
+            if arg.split("=", 1)[0] in FORBIDDEN_OPTIONS:
+                self._reject(f"Option not allowed: {arg.split('=', 1)[0]}")
+        return argv
+    
+    def _reject(self, message):
+        self.rejected += 1
+        SHELL_COMMANDS.inc(outcome="rejected")
+        raise PermissionError(message)
+    
+    def _ensure_loop(self):
+        """Start the event loop thread (again after a fork)"""
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                
+                def run_loop():
+                    asyncio.set_event_loop(loop)
+                    self._semaphore = asyncio.Semaphore(self.max_concurrent)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+                
+                threading.Thread(target=run_loop, name="grok-shell", daemon=True).start()
+                ready.wait()
+                self._loop = loop
+                self._pid = os.getpid()
+        return self._loop
+    
+    def submit(self, command, capture_output=True):
+        """Start a command without waiting for it
+        
+        Args:
+            command (str): Command line
+            capture_output (bool): Capture and stream stdout/stderr
+        
+        Returns:
+            ShellRun: The run; follow() or wait() on it
+        
+        Raises:
+            ValueError: If the command is empty or can't be split
+            PermissionError: If the program is not allow-listed
+        """
+        argv = self.check(command)
+        run = ShellRun(argv, capture_output=capture_output, max_output_bytes=self.max_output_bytes)
+        loop = self._ensure_loop()
+        with self._lock:
+            self._runs[run.id] = run
+            while len(self._runs) > self.keep_runs:
+                oldest_id, oldest = next(iter(self._runs.items()))
+                if not oldest.done():
+                    break
+                del self._runs[oldest_id]
+        asyncio.run_coroutine_threadsafe(self._execute(run), loop)
+        return run
+    
+    def run(self, command, capture_output=True):
+        """Run a command and wait for it to finish
+        
+        Returns:
+            ShellRun: The finished run
+        """
+        run = self.submit(command, capture_output=capture_output)
+        run.wait()
+        return run
+    
+    def get(self, run_id):
+        """Look up a run by ID (None if unknown or expired)"""
+        with self._lock:
+            return self._runs.get(run_id)
+    
+    async def _pump(self, reader, run, stream):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            data = await reader.read(READ_CHUNK_SIZE)
+            text = decoder.decode(data, final=not data)
+            if text:
+                run._append(stream, text)
+            if not data:
+                return
+    
+    async def _execute(self, run):
+        async with self._semaphore:
+            run.started_at = time.time()
+            run.status = "running"
+            pipe = asyncio.subprocess.PIPE if run.capture_output else None
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *run.argv, stdin=asyncio.subprocess.DEVNULL, stdout=pipe, stderr=pipe,
+                    start_new_session=True)
+            except OSError as e:
+                run._finish("error", error=str(e))
+                SHELL_COMMANDS.inc(outcome="error")
+                return
+            run.pid = process.pid
+            
+            pumps = []
+            if run.capture_output:
+                pumps = [self._pump(process.stdout, run, "stdout"), self._pump(process.stderr, run, "stderr")]
+            try:
+                await asyncio.wait_for(asyncio.gather(*pumps, process.wait()), self.timeout)
+            except asyncio.TimeoutError:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                await process.wait()
+                logger.warning(f"Killed {run.argv[0]} (pid {process.pid}) after {self.timeout}s")
+                run._finish("timeout", returncode=process.returncode,
+                            error=f"Command timed out after {self.timeout} seconds")
+            else:
+                run._finish("done" if process.returncode == 0 else "failed", returncode=process.returncode)
+            SHELL_COMMANDS.inc(outcome=run.status)
+            SHELL_SECONDS.observe(run.finished_at - run.started_at)
+    
+    def stats(self):
+        """Return run counts and the allow-list"""
+        with self._lock:
+            runs = list(self._runs.values())
+        return {
+            "running": sum(1 for run in runs if run.status == "running"),
+            "queued": sum(1 for run in runs if run.status == "queued"),
+            "max_concurrent": self.max_concurrent,
+            "rejected": self.rejected,
+            "allowed_commands": sorted(" ".join(entry) for entry in self.allowed_commands),
+        }
@@ -0,0 +1,162 @@
+"""
+Single-flight coalescing of identical commands
+"""
+
+import json
+import os
+import threading
+import time
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from metrics import REGISTRY
+
+SINGLEFLIGHT_REQUESTS = REGISTRY.counter(
+    "grokbeast_singleflight_requests", "Submitted commands by single-flight outcome (leader, shared or cached)")
+
+def command_key(command):
+    """Return the key identifying a command regardless of its random ID
+    
+    Args:
+        command (dict): Command produced by parse_chat_instruction
+    
+    Returns:
+        str: Canonical JSON of the command without "id"
+    """
+    return json.dumps({k: v for k, v in command.items() if k != "id"}, sort_keys=True, default=str)
+
+class _Pending:
+    """Placeholder for a leader's job while it is being queued"""
+    
+    def __init__(self):
+        self.job = None
+        self.error = None
+        self._ready = threading.Event()
+    
+    def done(self):
+        return False
+    
+    def resolve(self, job=None, error=None):
+        self.job = job
+        self.error = error
+        self._ready.set()
+    
+    def wait(self):
+        """Return the leader's job, or raise what queueing it raised"""
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self.job
+
+class SingleFlight:
+    """Share one job between identical commands submitted while it runs
+    
+    The first submission of a command (the leader) is queued as usual;
+    identical submissions arriving before it finishes get the leader's
+    job back instead of a new one, so they share its execution and
+    result. For idempotent types listed in result_ttl a finished job is
+    also handed out for that many seconds afterwards. Failed jobs, and
+    jobs whose result has a status other than "success", are never
+    reused after they finish.
+    
+    Shared results carry the leader's command ID. The leader queues its
+    job outside the lock (queueing may write the job to the result
+    store); identical submissions arriving meanwhile wait for that job.
+    """
+    
+    def __init__(self, result_ttl=None, exclude_types=()):
+        """
+        Args:
+            result_ttl (dict): Command type -> seconds a finished result is reused
+            exclude_types (iterable): Command types that always run on their own
+        """
+        self.result_ttl = dict(result_ttl or {})
+        self.exclude_types = set(exclude_types)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.leaders = 0
+        self.shared = 0
+        self.cached = 0
+    
+    def _reusable(self, job, now):
+        if not job.done():
+            return True
+        ttl = self.result_ttl.get(job.command.get("type"), 0)
+        if ttl <= 0 or now - job.finished_at >= ttl or job.status != "done":
+            return False
+        # Handlers report failures in the result rather than by raising
+        return not isinstance(job.result, dict) or job.result.get("status", "success") == "success"
+    
+    def submit(self, command, start):
+        """Join an identical job in flight or start a new one
+        
+        Args:
+            command (dict): Command to run
+            start (callable): Queues a command and returns its Job
+        
+        Returns:
+            Job: The shared or newly started job
+        
+        Raises:
+            queue.Full: If a new job is needed and the queue is at capacity
+        """
+        if command.get("type") in self.exclude_types:
+            return start(command)
+        
+        key = command_key(command)
+        leader = None
+        with self._lock:
+            if self._pid != os.getpid():
+                # Jobs in flight in the parent never finish in a forked child
+                self._flights.clear()
+                self._pid = os.getpid()
+            now = time.time()
+            for stale in [k for k, job in self._flights.items() if not self._reusable(job, now)]:
+                del self._flights[stale]
+            
+            job = self._flights.get(key)
+            if job is None:
+                # Claim the key, then queue the job without holding the lock
+                leader = self._flights[key] = _Pending()
+            elif job.done():
+                self.cached += 1
+                SINGLEFLIGHT_REQUESTS.inc(outcome="cached")
+            else:
+                self.shared += 1
+                SINGLEFLIGHT_REQUESTS.inc(outcome="shared")
+        
+        if leader is not None:
+            return self._lead(key, leader, command, start)
+        if isinstance(job, _Pending):
+            return job.wait()
+        return job
+    
+    def _lead(self, key, pending, command, start):
+        """Queue the leader's job and hand it to the submissions waiting on `pending`"""
+        try:
+            job = start(command)
+        except BaseException as e:
+            with self._lock:
+                if self._flights.get(key) is pending:
+                    del self._flights[key]
+            pending.resolve(error=e)
+            raise
+        with self._lock:
+            if self._flights.get(key) is pending:
+                self._flights[key] = job
+            self.leaders += 1
+        SINGLEFLIGHT_REQUESTS.inc(outcome="leader")
+        pending.resolve(job)
+        return job
+    
+    def stats(self):
+        """Return how many submissions started, shared or reused a job"""
+        with self._lock:
+            return {
+                "in_flight": sum(1 for job in self._flights.values() if not job.done()),
+                "leaders": self.leaders,
+                "shared": self.shared,
+                "cached": self.cached,
+            }
@@ -0,0 +1,534 @@
+"""
+Embedded SQLite store for hunted problems, swarm runs, search results, job states and the problem ranking
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+try:
+    from .problems import ProblemSet
+except ImportError:
+    from problems import ProblemSet
+
+logger = logging.getLogger("GrokBeast")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    duration_seconds REAL,
+    model_used TEXT,
+    source_file TEXT UNIQUE
+);
+CREATE TABLE IF NOT EXISTS searches (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    timestamp TEXT,
+    payload TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS problems (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER REFERENCES runs(id) ON DELETE CASCADE,
+    search_key TEXT REFERENCES searches(key) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    problem TEXT NOT NULL,
+    source TEXT,
+    url TEXT,
+    pain REAL,
+    reach,
+    urgency REAL,
+    trend REAL,
+    score REAL,
+    date TEXT,
+    data TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ranking (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT UNIQUE,
+    score REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_problems_source ON problems(source);
+CREATE INDEX IF NOT EXISTS idx_problems_date ON problems(date);
+CREATE INDEX IF NOT EXISTS idx_problems_score ON problems(score);
+CREATE INDEX IF NOT EXISTS idx_problems_run ON problems(run_id);
+CREATE INDEX IF NOT EXISTS idx_problems_search ON problems(search_key);
+CREATE INDEX IF NOT EXISTS idx_searches_updated ON searches(updated_at);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs(updated_at);
+CREATE INDEX IF NOT EXISTS idx_ranking_score ON ranking(score DESC, seq);
+"""
+
+# Problem fields stored in their own columns; everything else goes into `data`
+PROBLEM_COLUMNS = ["problem", "source", "url", "pain", "reach", "urgency", "trend", "score", "date"]
+
+class ResultStore:
+    """SQLite (WAL mode) store replacing the per-run and per-search JSON files
+    
+    Each thread gets its own connection. A background job evicts the
+    oldest runs and searches when the stored data grows past max_bytes;
+    the pages of the empty schema don't count towards the budget. Command
+    job states are kept here too, so every server worker can report on a
+    job queued by another, and so is the top-K problem ranking, so every
+    worker serves (and adds to) the same one.
+    """
+    
+    def __init__(self, path, max_bytes=100 * 1024 * 1024):
+        """
+        Args:
+            path (Path): Database file
+            max_bytes (int): Size budget enforced by compact()
+        """
+        self.path = Path(path)
+        self.max_bytes = max(0, int(max_bytes))
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._compactor = None
+        self._compactor_pid = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        
+        conn = self._connect()
+        with self._write_lock:
+            conn.executescript(SCHEMA)
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0:
+                # Created before incremental auto-vacuum was enabled; a full VACUUM converts it once
+                logger.info(f"Converting {self.path} to incremental auto-vacuum")
+                conn.execute("VACUUM")
+        self.schema_bytes = self._schema_bytes(conn.execute("PRAGMA page_size").fetchone()[0])
+    
+    def _connect(self):
+        """Return this thread's connection (reopened after a fork)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            # Only takes effect on a new database, so it must precede WAL mode and table creation
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    @staticmethod
+    def _schema_bytes(page_size):
+        """Return the size of an empty database with this schema"""
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute(f"PRAGMA page_size={int(page_size)}")
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.executescript(SCHEMA)
+            return conn.execute("PRAGMA page_count").fetchone()[0] * page_size
+        finally:
+            conn.close()
+    
+    def _write(self, callback):
+        """Run callback(conn) inside a single write transaction"""
+        conn = self._connect()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = callback(conn)
+                conn.execute("COMMIT")
+                return result
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    
+    @staticmethod
+    def _problem_row(problem, kind, now, run_id=None, search_key=None):
+        extra = {k: v for k, v in problem.items() if k not in PROBLEM_COLUMNS}
+        return (
+            run_id, search_key, kind,
+            str(problem.get("problem", "")), problem.get("source"), problem.get("url"),
+            problem.get("pain"), problem.get("reach"), problem.get("urgency"),
+            problem.get("trend"), problem.get("score"), problem.get("date"),
+            json.dumps(extra) if extra else None, now,
+        )
+    
+    def _insert_problems(self, conn, rows):
+        conn.executemany(
+            "INSERT INTO problems (run_id, search_key, kind, problem, source, url, pain, reach, urgency, "
+            "trend, score, date, data, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    
+    def record_run(self, result, started_at=None, source_file=None):
+        """Store a swarm run and its problems
+        
+        Args:
+            result (dict): Swarm result with problems, duration_seconds and model_used
+            started_at (float): Run start time (epoch seconds)
+            source_file (str): Originating file, used to make imports idempotent
+            
+        Returns:
+            int: Run ID, or None if this file was already imported
+        """
+        started_at = started_at if started_at is not None else time.time()
+        
+        def write(conn):
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO runs (started_at, duration_seconds, model_used, source_file) VALUES (?, ?, ?, ?)",
+                (started_at, result.get("duration_seconds"), result.get("model_used"), source_file),
+            )
+            if cursor.rowcount == 0:
+                return None
+            run_id = cursor.lastrowid
+            now = time.time()
+            self._insert_problems(conn, [
+                self._problem_row(p, "swarm", now, run_id=run_id)
+                for p in result.get("problems", []) if isinstance(p, dict)
+            ])
+            return run_id
+        
+        return self._write(write)
+    
+    def put_search(self, key, entry, kind):
+        """Insert or replace one cached search result
+        
+        Args:
+            key (str): Search key, e.g. "reddit_<id>" or "web_<feed>_<date>"
+            entry (dict): Entry with "problem" or "problems" and a "timestamp"
+            kind (str): "reddit" or "web"
+        """
+        problems = entry.get("problems")
+        if problems is None:
+            problems = [entry["problem"]] if isinstance(entry.get("problem"), dict) else []
+        
+        def write(conn):
+            now = time.time()
+            conn.execute("DELETE FROM problems WHERE search_key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO searches (key, kind, timestamp, payload, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, entry.get("timestamp"), json.dumps(entry), now),
+            )
+            self._insert_problems(conn, [
+                self._problem_row(p, kind, now, search_key=key) for p in problems if isinstance(p, dict)
+            ])
+        
+        self._write(write)
+    
+    def get_search(self, key):
+        """Return a cached search entry, or None"""
+        row = self._connect().execute("SELECT payload FROM searches WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["payload"]) if row else None
+    
+    def put_job(self, job):
+        """Insert or replace the state of a command job
+        
+        Args:
+            job (dict): Job as returned by Job.to_dict()
+        """
+        data = json.dumps(job, default=str)
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+            (job["job_id"], job["status"], data, time.time()),
+        ))
+    
+    def get_job(self, job_id):
+        """Return a job's last stored state, or None"""
+        row = self._connect().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+    
+    def prune_jobs(self, before):
+        """Delete jobs last updated before this time (epoch seconds)
+        
+        Returns:
+            int: Number of jobs deleted
+        """
+        return self._write(lambda conn: conn.execute("DELETE FROM jobs WHERE updated_at < ?", (before,)).rowcount)
+    
+    def update_ranking(self, entries, k):
+        """Merge scored problems into the stored top-K ranking
+        
+        An entry replaces the ranked one with the same key. With an
+        unchanged score it keeps its place among ties; otherwise it is
+        ranked afresh as the newest arrival. Only the best k are kept,
+        older entries winning ties.
+        
+        Args:
+            entries (list): (key, score, problem dict) tuples in arrival order;
+                a None key is never replaced
+            k (int): Size of the ranking
+        
+        Returns:
+            list: For each entry, whether it is in the top k afterwards
+        """
+        def write(conn):
+            seqs = []
+            for key, score, problem in entries:
+                data = json.dumps(problem, default=str)
+                row = conn.execute("SELECT seq, score FROM ranking WHERE key = ?", (key,)).fetchone() if key is not None else None
+                if row is not None and row["score"] == score:
+                    conn.execute("UPDATE ranking SET data = ? WHERE seq = ?", (data, row["seq"]))
+                    seqs.append(row["seq"])
+                    continue
+                if row is not None:
+                    conn.execute("DELETE FROM ranking WHERE seq = ?", (row["seq"],))
+                seqs.append(conn.execute(
+                    "INSERT INTO ranking (key, score, data) VALUES (?, ?, ?)", (key, score, data)
+                ).lastrowid)
+            conn.execute(
+                "DELETE FROM ranking WHERE seq NOT IN (SELECT seq FROM ranking ORDER BY score DESC, seq LIMIT ?)",
+                (int(k),),
+            )
+            kept = {row["seq"] for row in conn.execute("SELECT seq FROM ranking")}
+            return [seq in kept for seq in seqs]
+        
+        return self._write(write)
+    
+    def ranking(self, limit):
+        """Return the stored ranking, best first
+        
+        Returns:
+            list: (score, problem dict) pairs
+        """
+        rows = self._connect().execute(
+            "SELECT score, data FROM ranking ORDER BY score DESC, seq LIMIT ?", (int(limit),)
+        )
+        return [(row["score"], json.loads(row["data"])) for row in rows]
+    
+    def ranking_stats(self):
+        """Return the size of the stored ranking and its lowest score"""
+        row = self._connect().execute("SELECT COUNT(*), MIN(score) FROM ranking").fetchone()
+        return {"size": row[0], "min_score": row[1]}
+    
+    def clear_ranking(self):
+        """Delete the stored ranking"""
+        self._write(lambda conn: conn.execute("DELETE FROM ranking"))
+    
+    def problem_texts(self, kinds):
+        """Return problem statements from stored searches of the given kinds
+        
+        Args:
+            kinds (list): Search kinds such as ["reddit", "web"]
+            
+        Returns:
+            list: Problem texts in insertion order
+        """
+        if not kinds:
+            return []
+        placeholders = ", ".join("?" for _ in kinds)
+        rows = self._connect().execute(
+            f"SELECT problem FROM problems WHERE search_key IS NOT NULL AND kind IN ({placeholders}) ORDER BY id",
+            list(kinds),
+        )
+        return [row["problem"] for row in rows]
+    
+    def search_documents(self):
+        """Return one (key, text) hunting document per stored search"""
+        documents = {}
+        rows = self._connect().execute(
+            "SELECT search_key, problem FROM problems WHERE search_key IS NOT NULL ORDER BY id"
+        )
+        for row in rows:
+            documents.setdefault(row["search_key"], []).append(row["problem"])
+        return [(key, "\n".join(lines)) for key, lines in documents.items()]
+    
+    def top_problems(self, limit=10, source=None, since_date=None):
+        """Return the highest scoring stored problems
+        
+        Args:
+            limit (int): Maximum number of problems
+            source (str): Only this source (e.g. "Reddit - r/startups")
+            since_date (str): Only problems dated on or after this YYYY-MM-DD date
+            
+        Returns:
+            list: Problem dicts, best first
+        """
+        where, params = self._problem_filter(source, since_date)
+        rows = self._connect().execute(
+            f"SELECT * FROM problems {where} ORDER BY score DESC LIMIT ?", params + [int(limit)]
+        )
+        return [self._row_to_problem(row) for row in rows]
+    
+    def problem_set(self, source=None, since_date=None, keep_extra=False):
+        """Load stored problems into a columnar ProblemSet
+        
+        Rows are streamed from the cursor, so no list of dicts is built
+        for the whole table.
+        
+        Args:
+            source (str): Only this source
+            since_date (str): Only problems dated on or after this YYYY-MM-DD date
+            keep_extra (bool): Keep fields stored in the `data` column (such as raw_data)
+        
+        Returns:
+            ProblemSet: The problems in insertion order
+        """
+        where, params = self._problem_filter(source, since_date)
+        columns = ", ".join(PROBLEM_COLUMNS + (["data"] if keep_extra else []))
+        rows = self._connect().execute(f"SELECT {columns} FROM problems {where} ORDER BY id", params)
+        problems = ProblemSet(keep_extra=keep_extra)
+        for row in rows:
+            problem = {column: row[column] for column in PROBLEM_COLUMNS}
+            if keep_extra and row["data"]:
+                problem.update(json.loads(row["data"]))
+            problems.append(problem)
+        return problems
+    
+    @staticmethod
+    def _problem_filter(source, since_date):
+        clauses = []
+        params = []
+        if source:
+            clauses.append("source = ?")
+            params.append(source)
+        if since_date:
+            clauses.append("date >= ?")
+            params.append(since_date)
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+    
+    @staticmethod
+    def _row_to_problem(row):
+        problem = {column: row[column] for column in PROBLEM_COLUMNS if row[column] is not None}
+        if row["data"]:
+            problem.update(json.loads(row["data"]))
+        return problem
+    
+    def import_cache(self, cache_dir):
+        """Import existing swarm_results_*.json and search JSON files
+        
+        Re-importing is safe: runs are keyed by file name and searches by key.
+        
+        Args:
+            cache_dir (Path): Directory holding the legacy files
+            
+        Returns:
+            dict: Number of runs and searches imported
+        """
+        cache_dir = Path(cache_dir)
+        counts = {"runs": 0, "searches": 0}
+        
+        for path in sorted(cache_dir.glob("swarm_results_*.json")):
+            try:
+                with open(path, 'r') as f:
+                    result = json.load(f)
+                started_at = float(path.stem.rsplit("_", 1)[-1])
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping {path}: {e}")
+                continue
+            if self.record_run(result, started_at=started_at, source_file=path.name) is not None:
+                counts["runs"] += 1
+        
+        for kind in ["reddit", "web"]:
+            path = cache_dir / f"{kind}_searches.json"
+            try:
+                with open(path, 'r') as f:
+                    searches = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for key, entry in searches.items():
+                if isinstance(entry, dict):
+                    self.put_search(key, entry, kind)
+                    counts["searches"] += 1
+        
+        logger.info(f"Imported {counts['runs']} runs and {counts['searches']} searches into {self.path}")
+        return counts
+    
+    def is_empty(self):
+        """Check whether nothing has been stored yet"""
+        conn = self._connect()
+        runs = conn.execute("SELECT EXISTS (SELECT 1 FROM runs)").fetchone()[0]
+        searches = conn.execute("SELECT EXISTS (SELECT 1 FROM searches)").fetchone()[0]
+        return not runs and not searches
+    
+    def size_bytes(self):
+        """Bytes in use by live pages (excluding free pages and the WAL)"""
+        conn = self._connect()
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+    
+    def data_bytes(self):
+        """Bytes in use beyond the empty schema (what max_bytes limits)"""
+        return max(0, self.size_bytes() - self.schema_bytes)
+    
+    def compact(self, batch_size=100):
+        """Evict the oldest runs and searches until under max_bytes, then reclaim space
+        
+        The budget applies to data_bytes(), so schema and index pages of
+        an empty database never force evictions.
+        
+        Args:
+            batch_size (int): Rows deleted per eviction step
+            
+        Returns:
+            dict: Rows evicted and resulting size
+        """
+        evicted = {"runs": 0, "searches": 0}
+        while self.max_bytes and self.data_bytes() > self.max_bytes:
+            def evict(conn):
+                oldest_run = conn.execute("SELECT MIN(started_at) FROM runs").fetchone()[0]
+                oldest_search = conn.execute("SELECT MIN(updated_at) FROM searches").fetchone()[0]
+                if oldest_run is None and oldest_search is None:
+                    return False
+                if oldest_search is None or (oldest_run is not None and oldest_run <= oldest_search):
+                    cursor = conn.execute(
+                        "DELETE FROM runs WHERE id IN (SELECT id FROM runs ORDER BY started_at LIMIT ?)", (batch_size,)
+                    )
+                    evicted["runs"] += cursor.rowcount
+                else:
+                    cursor = conn.execute(
+                        "DELETE FROM searches WHERE key IN (SELECT key FROM searches ORDER BY updated_at LIMIT ?)",
+                        (batch_size,),
+                    )
+                    evicted["searches"] += cursor.rowcount
+                return True
+            if not self._write(evict):
+                break
+        
+        conn = self._connect()
+        with self._write_lock:
+            # execute() would stop after the first freed page; executescript runs it to completion
+            conn.executescript("PRAGMA incremental_vacuum;")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        evicted["size_bytes"] = self.size_bytes()
+        if evicted["runs"] or evicted["searches"]:
+            logger.info(f"Compacted result store: evicted {evicted['runs']} runs and {evicted['searches']} searches")
+        return evicted
+    
+    def start_compaction(self, interval_seconds):
+        """Run compact() periodically on a background thread"""
+        if self._compactor is not None and self._compactor_pid == os.getpid():
+            return
+        
+        def loop():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    self.compact()
+                except Exception as e:
+                    logger.error(f"Error compacting result store: {e}")
+        
+        self._compactor_pid = os.getpid()
+        self._compactor = threading.Thread(target=loop, name="grok-store-compactor", daemon=True)
+        self._compactor.start()
+    
+    def stats(self):
+        """Return row counts and database size"""
+        conn = self._connect()
+        return {
+            "runs": conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0],
+            "searches": conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0],
+            "problems": conn.execute("SELECT COUNT(*) FROM problems").fetchone()[0],
+            "jobs": conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0],
+            "size_bytes": self.size_bytes(),
+            "data_bytes": self.data_bytes(),
+            "max_bytes": self.max_bytes,
+        }
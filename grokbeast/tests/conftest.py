@@ -0,0 +1,9 @@
+"""
+Shared pytest setup: make the `src` package importable from the tests
+"""
+
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
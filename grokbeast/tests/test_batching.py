@@ -0,0 +1,190 @@
+"""
+Tests for micro-batching and its interplay with the prefix cache
+"""
+
+import queue
+import sys
+import threading
+import time
+
+from src.agent_model import GrokAgent
+from src.batching import MicroBatcher
+
+class ModelProbe:
+    """Stands in for the model and records overlapping calls"""
+    
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.calls = {"batch": 0, "prefix": 0}
+        self._lock = threading.Lock()
+    
+    def use(self, kind):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.calls[kind] += 1
+        time.sleep(0.01)
+        with self._lock:
+            self.active -= 1
+    
+    def run_batch(self, prompts, kwargs):
+        self.use("batch")
+        return [prompt.upper() for prompt in prompts]
+    
+    def generate(self, prefix, prompt, **kwargs):
+        self.use("prefix")
+        return prompt.upper()
+
+def test_batches_group_requests_and_return_each_result():
+    probe = ModelProbe()
+    batcher = MicroBatcher(probe.run_batch, max_batch_size=4, max_wait_ms=50)
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.update({i: batcher.submit(f"p{i}")})) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert results == {i: f"P{i}" for i in range(4)}
+    assert batcher.stats()["batches"] < 4
+
+def test_batched_calls_hold_the_model_lock():
+    probe = ModelProbe()
+    lock = threading.Lock()
+    batcher = MicroBatcher(probe.run_batch, max_wait_ms=0, model_lock=lock)
+    result = {}
+    with lock:
+        thread = threading.Thread(target=lambda: result.update(out=batcher.submit("x")))
+        thread.start()
+        time.sleep(0.1)
+        assert probe.calls["batch"] == 0
+    thread.join(10)
+    assert result["out"] == "X"
+
+def test_prefix_cache_calls_never_overlap_batches():
+    probe = ModelProbe()
+    agent = GrokAgent(load_model=False)
+    agent.prefix_cache = probe
+    agent.batcher = MicroBatcher(probe.run_batch, max_wait_ms=1, model_lock=agent._model_lock)
+    
+    outputs = []
+    def call(i):
+        for j in range(5):
+            outputs.append(agent._run_prefixed("System:", f"p{i}-{j}"))
+    
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert len(outputs) == 40
+    assert probe.max_active == 1
+    assert probe.calls["prefix"] > 0
+
+class FakeStreamer:
+    """Minimal stand-in for transformers.TextIteratorStreamer"""
+    
+    def __init__(self, tokenizer, **kwargs):
+        self.queue = queue.Queue()
+    
+    def __iter__(self):
+        while True:
+            chunk = self.queue.get(timeout=10)
+            if chunk is None:
+                return
+            yield chunk
+
+class StreamProbe:
+    """Records whether the model lock is held during the prefill and generation"""
+    
+    def __init__(self, lock, release):
+        self.lock = lock
+        self.release = release
+        self.held = {}
+    
+    def prepare(self, prefix, prompt):
+        self.held["prepare"] = self.lock.locked()
+        return {"input_ids": prompt}
+    
+    def prefill_timer(self, cached):
+        return None
+    
+    def generate(self, streamer, stopping_criteria, **kwargs):
+        self.held["generate"] = self.lock.locked()
+        streamer.queue.put("Here ")
+        # Keep generating until released or stopped
+        while not self.release.is_set() and not stopping_criteria[0].is_set():
+            time.sleep(0.01)
+        streamer.queue.put("it is")
+        streamer.queue.put(None)
+
+def streaming_agent(monkeypatch, release):
+    fake = type(sys)("transformers")
+    fake.StoppingCriteriaList = list
+    fake.TextIteratorStreamer = FakeStreamer
+    monkeypatch.setitem(sys.modules, "transformers", fake)
+    monkeypatch.setattr("src.agent_model._event_stopping_criteria", lambda event: event)
+    agent = GrokAgent(load_model=False)
+    agent.use_fallback = False
+    agent.pipeline = object()
+    agent.tokenizer = None
+    agent.prefix_cache = agent.model = StreamProbe(agent._model_lock, release)
+    return agent
+
+def test_streaming_holds_the_model_lock_until_generation_ends(monkeypatch):
+    release = threading.Event()
+    agent = streaming_agent(monkeypatch, release)
+    stream = agent.stream_chat_response("tell me about invoices")
+    
+    assert next(stream) == ("token", "Here ")
+    assert agent.model.held == {"prepare": True, "generate": True}
+    # A batched call can't start while the stream is generating
+    assert not agent._model_lock.acquire(blocking=False)
+    
+    release.set()
+    events = list(stream)
+    assert events[0] == ("token", "it is") and events[-1][0] == "done"
+    assert agent._model_lock.acquire(timeout=5)
+    agent._model_lock.release()
+
+def test_closing_a_stream_stops_generation_and_frees_the_model(monkeypatch):
+    agent = streaming_agent(monkeypatch, threading.Event())
+    stream = agent.stream_chat_response("tell me about invoices")
+    assert next(stream) == ("token", "Here ")
+    
+    # The client went away
+    stream.close()
+    assert agent._model_lock.acquire(timeout=5)
+    agent._model_lock.release()
+
+class WordTokenizer:
+    def __call__(self, text):
+        return {"input_ids": text.split()}
+
+def test_batched_generation_limits_new_tokens_per_prompt():
+    calls = []
+    
+    def pipeline(prompts, batch_size=None, **kwargs):
+        calls.append((list(prompts), kwargs))
+        return [[{"generated_text": prompt + " out"}] for prompt in prompts]
+    
+    agent = GrokAgent(load_model=False)
+    agent.pipeline = pipeline
+    agent.tokenizer = WordTokenizer()
+    agent.response_cache = None
+    agent.batcher = MicroBatcher(agent._pipeline_batch, max_wait_ms=50, model_lock=agent._model_lock)
+    
+    prompts = ["one two", "one two three four five six", "six five"]
+    results = {}
+    threads = [threading.Thread(target=lambda p=p: results.update({p: agent.generate(p, max_length=10)}))
+               for p in prompts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    
+    assert results == {prompt: "out" for prompt in prompts}
+    # Each prompt gets max_length minus its own length, however it was batched
+    budgets = {prompt: kwargs["max_new_tokens"] for batch, kwargs in calls for prompt in batch}
+    assert budgets == {"one two": 8, "one two three four five six": 4, "six five": 8}
+    assert all("max_length" not in kwargs for _, kwargs in calls)
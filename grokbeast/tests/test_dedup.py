@@ -0,0 +1,54 @@
+"""
+Tests for near-duplicate filtering of hunted problems
+"""
+
+from src.agent_model import GrokAgent
+from src.dedup import DedupIndex
+
+PROBLEMS = [
+    {"problem": "Invoices never sync between our accounting tools", "pain": 8, "url": "https://example.com/1"},
+    {"problem": "Our invoices never sync between our accounting tools", "pain": 7, "url": "https://example.com/2"},
+    {"problem": "Nightly backups fail silently on the staging server", "pain": 6, "url": "https://example.com/3"},
+]
+
+def texts(problems):
+    return [problem["problem"] for problem in problems]
+
+def test_ranking_does_not_record_problems():
+    agent = GrokAgent(load_model=False)
+    dedup = DedupIndex()
+    first = agent.rank_problems(PROBLEMS, dedup=dedup)
+    # The near-duplicate second problem is dropped within the list
+    assert texts(first) == [PROBLEMS[0]["problem"], PROBLEMS[2]["problem"]]
+    assert texts(agent.rank_problems(PROBLEMS, dedup=dedup)) == texts(first)
+    assert len(dedup) == 0
+
+def test_recorded_problems_are_dropped():
+    agent = GrokAgent(load_model=False)
+    dedup = DedupIndex()
+    dedup.add(PROBLEMS[0]["problem"], key=PROBLEMS[0]["url"])
+    assert texts(agent.rank_problems(PROBLEMS, dedup=dedup)) == [PROBLEMS[2]["problem"]]
+
+def test_hunt_then_rank_counts_each_lookup_once():
+    agent = GrokAgent(load_model=False)
+    lines = ["We need invoices to sync with accounting", "I struggle with flaky nightly backups",
+             "Our team can't find a good standup tool"]
+    dedup = DedupIndex()
+    dedup.add(lines[1])
+    problems = agent.hunt_problems("\n".join(lines), count=3, dedup=dedup)
+    assert len(agent.rank_problems(problems, dedup=dedup)) == 2
+    assert dedup.stats()["duplicates"] == 1
+    assert dedup.stats()["new"] == 2
+
+def test_indexes_sharing_a_file_see_each_others_problems(tmp_path):
+    path = tmp_path / "dedup_index.tsv"
+    first = DedupIndex(path)
+    second = DedupIndex(path)
+    assert not first.check_and_add(PROBLEMS[0]["problem"], key=PROBLEMS[0]["url"])
+    # Recorded through the other index after this one loaded the file
+    assert second.seen(PROBLEMS[1]["problem"])
+    assert second.check_and_add("Something else entirely", key=PROBLEMS[0]["url"])
+    second.add(PROBLEMS[2]["problem"])
+    assert first.contains(PROBLEMS[2]["problem"])
+    assert len(first) == len(second) == 2
+    assert len(DedupIndex(path)) == 2
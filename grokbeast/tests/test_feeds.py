@@ -0,0 +1,32 @@
+"""
+Tests for the seen-item filter used by feed ingestion
+"""
+
+from src.feeds import SeenItems, read_new_items
+
+FEED = b"""<rss><channel>
+<item><guid>a</guid><title>Invoices never sync</title><link>https://example.com/a</link></item>
+<item><guid>a</guid><title>Invoices never sync</title><link>https://example.com/a</link></item>
+<item><guid>b</guid><title>Backups fail silently</title><link>https://example.com/b</link></item>
+</channel></rss>"""
+
+def test_read_new_items_skips_duplicates_within_a_feed():
+    result = read_new_items([FEED], SeenItems())
+    assert result["total"] == 3
+    assert [item["guid"] for item in result["items"]] == ["a", "b"]
+
+def test_checking_does_not_mark_items_seen():
+    seen = SeenItems()
+    read_new_items([FEED], seen)
+    assert len(seen) == 0
+    assert len(read_new_items([FEED], seen)["items"]) == 2
+
+def test_marked_items_are_skipped_after_reload(tmp_path):
+    path = tmp_path / "seen.bin"
+    seen = SeenItems(path)
+    seen.mark_seen(read_new_items([FEED], seen)["items"])
+    seen.flush()
+    reloaded = SeenItems(path)
+    assert len(reloaded) == 2
+    assert read_new_items([FEED], reloaded)["items"] == []
+    assert reloaded.stats()["skipped"] == 3
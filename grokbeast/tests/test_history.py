@@ -0,0 +1,98 @@
+"""
+Tests for the segmented command history log and its index
+"""
+
+import json
+
+from src.history import CommandHistory
+
+def record(history, count, start=0):
+    for i in range(start, start + count):
+        command_type = "status" if i % 3 == 0 else "hunt_problems"
+        history.append({"id": f"cmd_{i}", "type": command_type, "params": {}}, f"2025-01-01T00:{i // 60:02d}:{i % 60:02d}")
+
+def ids(page):
+    return [entry["command"]["id"] for entry in page["items"]]
+
+def test_pages_newest_first_and_oldest_first(tmp_path):
+    history = CommandHistory(tmp_path)
+    record(history, 10)
+    page = history.query(offset=2, limit=3)
+    assert ids(page) == ["cmd_7", "cmd_6", "cmd_5"]
+    assert page["total"] == 10
+    assert ids(history.query(offset=8, limit=5, newest_first=False)) == ["cmd_8", "cmd_9"]
+    assert ids(history.query(offset=20)) == []
+
+def test_filters_by_type_and_time_window(tmp_path):
+    history = CommandHistory(tmp_path)
+    record(history, 12)
+    page = history.query(command_type="status", limit=10, newest_first=False)
+    assert ids(page) == ["cmd_0", "cmd_3", "cmd_6", "cmd_9"]
+    page = history.query(since="2025-01-01T00:00:03", until="2025-01-01T00:00:06", newest_first=False)
+    assert ids(page) == ["cmd_3", "cmd_4", "cmd_5", "cmd_6"]
+    page = history.query(command_type="status", since="2025-01-01T00:00:04", limit=1)
+    assert ids(page) == ["cmd_9"] and page["total"] == 2
+    assert history.type_counts() == {"status": 4, "hunt_problems": 8}
+
+def test_index_is_rebuilt_across_segments(tmp_path):
+    history = CommandHistory(tmp_path, max_segment_bytes=1024)
+    record(history, 40)
+    history.close()
+    assert len(list(tmp_path.glob("command_history.*.jsonl"))) > 1
+    
+    reopened = CommandHistory(tmp_path, max_segment_bytes=1024)
+    assert len(reopened) == 40
+    assert ids(reopened.query(limit=40, newest_first=False)) == [f"cmd_{i}" for i in range(40)]
+    record(reopened, 1, start=40)
+    assert ids(reopened.query(limit=1)) == ["cmd_40"]
+
+def test_rotation_drops_the_oldest_segments(tmp_path):
+    history = CommandHistory(tmp_path, max_segment_bytes=1024, max_segments=2)
+    record(history, 60)
+    page = history.query(limit=100, newest_first=False)
+    assert len(list(tmp_path.glob("command_history.*.jsonl"))) <= 2
+    assert page["total"] == len(history) < 60
+    assert ids(page)[-1] == "cmd_59"
+
+def test_torn_line_is_skipped(tmp_path):
+    history = CommandHistory(tmp_path)
+    record(history, 2)
+    history.close()
+    with open(next(tmp_path.glob("command_history.*.jsonl")), 'ab') as f:
+        f.write(b'{"command": {"type": "sta')
+    assert ids(CommandHistory(tmp_path).query()) == ["cmd_1", "cmd_0"]
+
+def test_legacy_history_is_imported(tmp_path):
+    legacy = tmp_path / "command_history.json"
+    legacy.write_text(json.dumps([{"command": {"id": "old", "type": "status"}, "timestamp": "2024-12-31T00:00:00"}]))
+    history = CommandHistory(tmp_path / "history", legacy_file=legacy)
+    assert ids(history.query()) == ["old"]
+
+def test_processes_sharing_a_directory_see_each_others_entries(tmp_path):
+    # Two instances stand in for two server workers
+    first = CommandHistory(tmp_path, max_segment_bytes=1024)
+    second = CommandHistory(tmp_path, max_segment_bytes=1024)
+    for i in range(30):
+        record(first if i % 2 else second, 1, start=i)
+    
+    expected = [f"cmd_{i}" for i in range(30)]
+    assert len(list(tmp_path.glob("command_history.*.jsonl"))) > 1
+    assert ids(first.query(limit=30, newest_first=False)) == expected
+    assert ids(second.query(limit=30, newest_first=False)) == expected
+    assert first.type_counts() == second.type_counts()
+    assert ids(CommandHistory(tmp_path).query(limit=30, newest_first=False)) == expected
+
+def test_rotation_by_another_process_drops_deleted_segments(tmp_path):
+    reader = CommandHistory(tmp_path, max_segment_bytes=1024, max_segments=2)
+    writer = CommandHistory(tmp_path, max_segment_bytes=1024, max_segments=2)
+    record(reader, 5)
+    record(writer, 55, start=5)
+    page = reader.query(limit=100, newest_first=False)
+    assert page["total"] == len(writer) < 60
+    assert ids(page) == ids(writer.query(limit=100, newest_first=False))
+
+def test_legacy_history_is_imported_once(tmp_path):
+    legacy = tmp_path / "command_history.json"
+    legacy.write_text(json.dumps([{"command": {"id": "old", "type": "status"}, "timestamp": "2024-12-31T00:00:00"}]))
+    CommandHistory(tmp_path / "history", legacy_file=legacy)
+    assert len(CommandHistory(tmp_path / "history", legacy_file=legacy)) == 1
@@ -0,0 +1,24 @@
+"""
+Tests for bulk problem hunting across worker processes
+"""
+
+import random
+
+from src.hunting import hunt_problems_batch
+
+DOCUMENT = "\n".join(f"We need a fix for problem number {i} in our billing flow" for i in range(6))
+
+def signature(problems):
+    return tuple((problem["pain"], problem["reach"]) for problem in problems)
+
+def test_unseeded_workers_draw_different_values():
+    random.seed(0)
+    batch = hunt_problems_batch([DOCUMENT] * 40, count=6, workers=2, chunksize=1)
+    signatures = [signature(problems) for problems in batch["results"]]
+    # Workers sharing the parent's random state would repeat each other's draws
+    assert len(set(signatures)) == len(signatures)
+
+def test_seeded_runs_are_reproducible_across_worker_counts():
+    serial = hunt_problems_batch([DOCUMENT] * 8, count=6, workers=1, seed=42)
+    parallel = hunt_problems_batch([DOCUMENT] * 8, count=6, workers=2, chunksize=1, seed=42)
+    assert serial["results"] == parallel["results"]
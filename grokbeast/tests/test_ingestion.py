@@ -0,0 +1,124 @@
+"""
+Tests for IngestionClient against a local HTTP stand-in server
+"""
+
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from src.ingestion import IngestionClient, retry_after_seconds
+
+FEED = b"<rss><channel><item><guid>a</guid><title>A</title></item></channel></rss>"
+LAST_MODIFIED = "Mon, 06 Oct 2025 08:00:00 GMT"
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves /etag, /dated, /limited (429) and /broken (503) and records every request"""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers), time.monotonic()))
+        path = self.path.split("?", 1)[0]
+        if path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                return self._reply(304)
+            return self._reply(200, FEED, {"ETag": '"v1"'})
+        if path == "/dated":
+            if self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                return self._reply(304)
+            return self._reply(200, FEED, {"Last-Modified": LAST_MODIFIED})
+        if path == "/limited":
+            return self._reply(429, b"slow down", {"Retry-After": self.server.retry_after})
+        if path == "/broken":
+            return self._reply(503, b"", {})
+        return self._reply(404)
+    
+    def _reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    httpd.requests = []
+    httpd.retry_after = "1"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_port}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def client(**kwargs):
+    kwargs.setdefault("min_host_interval", 0)
+    return IngestionClient(timeout=5, **kwargs)
+
+def test_etag_turns_the_second_fetch_into_304(server, tmp_path):
+    fetcher = client(validators_path=tmp_path / "validators.json")
+    first = fetcher.fetch_all([f"{server.url}/etag"])[0]
+    assert first["status"] == 200 and first["body"] == FEED
+    # Validators survive a restart
+    second = client(validators_path=tmp_path / "validators.json").fetch(f"{server.url}/etag")
+    assert second["status"] == 304 and second["not_modified"] and second["body"] is None
+    assert server.requests[1][1].get("If-None-Match") == '"v1"'
+
+def test_last_modified_is_sent_as_if_modified_since(server):
+    fetcher = client()
+    assert fetcher.fetch(f"{server.url}/dated")["status"] == 200
+    result = fetcher.fetch(f"{server.url}/dated")
+    assert result["not_modified"]
+    assert server.requests[1][1].get("If-Modified-Since") == LAST_MODIFIED
+    assert fetcher.stats()["not_modified"] == 1
+
+def test_429_backs_the_host_off_for_retry_after(server):
+    fetcher = client()
+    result = fetcher.fetch(f"{server.url}/limited")
+    assert result["status"] == 429 and result["retry_after"] == 1.0
+    assert result["error"] and fetcher.stats()["throttled"] == 1
+    
+    start = time.monotonic()
+    assert fetcher.fetch(f"{server.url}/etag")["status"] == 200
+    assert time.monotonic() - start >= 0.9
+    assert server.requests[1][2] - server.requests[0][2] >= 0.9
+
+def test_retry_after_is_capped_and_defaulted(server):
+    server.retry_after = "3600"
+    fetcher = client(max_retry_after=0.2)
+    assert fetcher.fetch(f"{server.url}/limited")["retry_after"] == 0.2
+    # 503 without Retry-After gets the default back-off, capped as well
+    assert fetcher.fetch(f"{server.url}/broken")["retry_after"] == 0.2
+    assert fetcher.rate_limiter.backoffs == 2
+
+def test_requests_to_one_host_are_spaced(server):
+    fetcher = client(min_host_interval=0.2, max_workers=3)
+    results = fetcher.fetch_all([f"{server.url}/etag?{i}" for i in range(3)])
+    assert [result["status"] for result in results] == [200, 200, 200]
+    times = sorted(when for _, _, when in server.requests)
+    assert all(later - earlier >= 0.18 for earlier, later in zip(times, times[1:]))
+    assert fetcher.stats()["rate_limit_waits"] == 2
+
+def test_consumer_failure_only_fails_its_source(server):
+    def consume(chunks):
+        raise KeyError("title")
+    
+    results = client().fetch_all([f"{server.url}/etag", f"{server.url}/dated"], consume=consume)
+    assert all(result["error"] == "KeyError: 'title'" and result["parsed"] is None for result in results)
+
+def test_retry_after_seconds_parses_delays_and_dates():
+    assert retry_after_seconds("120") == 120.0
+    assert retry_after_seconds(formatdate(1000.0 + 30, usegmt=True), now=1000.0) == 30.0
+    assert retry_after_seconds(formatdate(1000.0, usegmt=True), now=2000.0) == 0.0
+    assert retry_after_seconds("soon") is None
+    assert retry_after_seconds(None) is None
@@ -0,0 +1,20 @@
+"""
+Tests for the compiled intent rules
+"""
+
+from src.intents import check_examples, get_intent_engine
+
+def test_command_examples_parse_as_expected():
+    checked, failures = check_examples(get_intent_engine())
+    assert checked > 0
+    assert failures == []
+
+def test_free_text_keeps_its_case():
+    engine = get_intent_engine()
+    assert engine.parse("Run ls -la /Volumes/Data")["params"]["command"] == "ls -la /Volumes/Data"
+    assert engine.parse("TWEET Invoices Never Sync")["params"]["problem"] == "Invoices Never Sync"
+
+def test_triggers_match_regardless_of_case():
+    engine = get_intent_engine()
+    assert engine.parse("SYSTEM STATUS")["type"] == "status"
+    assert engine.parse("Search Reddit for 4 bugs")["params"] == {"sources": ["reddit"], "count": 4}
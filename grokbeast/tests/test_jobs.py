@@ -0,0 +1,104 @@
+"""
+Tests for sharing job states between server workers through the result store
+"""
+
+import threading
+import time
+from queue import Full
+
+import pytest
+
+from src.jobs import JobQueue
+from src.store import ResultStore
+
+def command(command_id):
+    return {"id": command_id, "type": "status", "params": {}}
+
+def test_job_is_visible_to_another_worker(tmp_path):
+    # Two queues with their own store connections stand in for two workers
+    release = threading.Event()
+    
+    def handler(cmd):
+        release.wait(10)
+        return {"id": cmd["id"], "status": "success"}
+    
+    owner = JobQueue(handler, workers=1, job_store=ResultStore(tmp_path / "results.db"))
+    other = JobQueue(handler, workers=1, job_store=ResultStore(tmp_path / "results.db"), poll_interval=0.01)
+    job = owner.submit(command("a"))
+    
+    assert other.get(job.id) is None
+    assert other.lookup(job.id)["status"] in ("queued", "running")
+    
+    release.set()
+    state = other.lookup(job.id, wait=5)
+    assert state["status"] == "done"
+    assert state["result"] == {"id": "a", "status": "success"}
+    assert state == owner.lookup(job.id)
+
+def test_failed_job_reports_its_error(tmp_path):
+    def handler(cmd):
+        raise RuntimeError("boom")
+    
+    owner = JobQueue(handler, workers=1, job_store=ResultStore(tmp_path / "results.db"))
+    other = JobQueue(handler, workers=1, job_store=ResultStore(tmp_path / "results.db"), poll_interval=0.01)
+    job = owner.submit(command("a"))
+    
+    state = other.lookup(job.id, wait=5)
+    assert state["status"] == "error"
+    assert state["error"] == "boom"
+
+def test_unknown_job_returns_immediately(tmp_path):
+    queue = JobQueue(lambda cmd: {}, job_store=ResultStore(tmp_path / "results.db"))
+    assert queue.lookup("job_missing", wait=5) is None
+    assert JobQueue(lambda cmd: {}).lookup("job_missing") is None
+
+def test_expired_jobs_are_pruned_from_the_store(tmp_path):
+    store = ResultStore(tmp_path / "results.db")
+    queue = JobQueue(lambda cmd: {"id": cmd["id"]}, workers=1, retain_seconds=0, job_store=store)
+    job = queue.submit(command("a"))
+    assert job.wait(5)
+    
+    queue.submit(command("b")).wait(5)
+    assert store.get_job(job.id) is None
+
+def test_close_lets_accepted_jobs_finish(tmp_path):
+    release = threading.Event()
+    
+    def handler(cmd):
+        release.wait(10)
+        return {"id": cmd["id"]}
+    
+    store = ResultStore(tmp_path / "results.db")
+    queue = JobQueue(handler, workers=1, job_store=store)
+    jobs = [queue.submit(command("a")), queue.submit(command("b"))]
+    threading.Timer(0.1, release.set).start()
+    assert queue.close(timeout=5) == 0
+    assert [store.get_job(job.id)["status"] for job in jobs] == ["done", "done"]
+    with pytest.raises(Full):
+        queue.submit(command("c"))
+
+def test_close_reports_abandoned_jobs_as_failed(tmp_path):
+    release = threading.Event()
+    
+    def handler(cmd):
+        release.wait(10)
+        return {"id": cmd["id"]}
+    
+    store = ResultStore(tmp_path / "results.db")
+    queue = JobQueue(handler, workers=1, job_store=store)
+    running = queue.submit(command("a"))
+    queued = queue.submit(command("b"))
+    other = JobQueue(handler, job_store=ResultStore(tmp_path / "results.db"))
+    assert queue.close(timeout=0.1) == 2
+    for job in (running, queued):
+        assert job.done()
+        state = other.lookup(job.id)
+        assert state["status"] == "error"
+        assert state["error"] == "worker restarted"
+    
+    # The running job finishing afterwards doesn't overwrite that, and the queued one never starts
+    release.set()
+    time.sleep(0.2)
+    assert store.get_job(running.id)["status"] == "error"
+    assert store.get_job(queued.id)["started_at"] is None
+    assert queue.stats()["completed"] == 0
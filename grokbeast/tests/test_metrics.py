@@ -0,0 +1,69 @@
+"""
+Tests for merging the metrics of several worker processes
+"""
+
+import json
+import multiprocessing
+
+import pytest
+
+from src.metrics import MetricsRegistry, SharedMetrics
+
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+
+def build_registry():
+    registry = MetricsRegistry()
+    return (registry, registry.counter("requests", "Requests"), registry.histogram("latency", "Latency", buckets=(1.0,)),
+            registry.gauge("depth", "Queue depth"))
+
+def _worker(directory, written, release):
+    registry, requests, latency, depth = build_registry()
+    requests.inc(2, route="/")
+    latency.observe(0.5)
+    depth.set(7)
+    SharedMetrics(directory, registry=registry).write()
+    written.set()
+    release.wait(30)
+
+def test_snapshots_of_live_workers_are_merged(tmp_path):
+    registry, requests, latency, depth = build_registry()
+    requests.inc(3, route="/")
+    latency.observe(2.0)
+    depth.set(1)
+    
+    context = multiprocessing.get_context("fork")
+    written, release = context.Event(), context.Event()
+    child = context.Process(target=_worker, args=(tmp_path, written, release))
+    child.start()
+    try:
+        assert written.wait(30)
+        text = SharedMetrics(tmp_path, registry=registry).render()
+    finally:
+        release.set()
+        child.join(30)
+    
+    assert 'requests_total{route="/"} 5' in text
+    assert 'latency_bucket{le="1"} 1' in text
+    assert 'latency_bucket{le="+Inf"} 2' in text
+    assert "latency_count 2" in text
+    assert f'depth{{pid="{child.pid}"}} 7' in text
+    assert text.count("# TYPE requests counter") == 1
+
+def test_snapshots_of_exited_workers_are_dropped(tmp_path):
+    context = multiprocessing.get_context("fork")
+    written, release = context.Event(), context.Event()
+    release.set()
+    child = context.Process(target=_worker, args=(tmp_path, written, release))
+    child.start()
+    child.join(30)
+    assert (tmp_path / f"{child.pid}.json").exists()
+    
+    registry = build_registry()[0]
+    text = SharedMetrics(tmp_path, registry=registry).render()
+    assert "requests_total" not in text
+    assert not (tmp_path / f"{child.pid}.json").exists()
+
+def test_clear_removes_old_snapshots(tmp_path):
+    (tmp_path / "12345.json").write_text(json.dumps([]))
+    SharedMetrics(tmp_path).clear()
+    assert list(tmp_path.glob("*.json")) == []
@@ -0,0 +1,61 @@
+"""
+Tests for slotted Problem records and the columnar ProblemSet
+"""
+
+from src.agent_model import GrokAgent
+from src.problems import Problem, ProblemSet, pain_level
+from src.ranking import DEFAULT_WEIGHTS, TopKRanker
+
+PROBLEMS = [
+    {"problem": "Invoices never sync", "source": "Reddit - r/SaaS", "url": "https://example.com/1", "pain": 8,
+     "urgency": 6.5, "reach": "SMB", "raw_data": {"id": "1"}},
+    {"problem": "Backups fail silently ✓", "source": "Web", "url": "https://example.com/2", "pain": 9,
+     "trend": 3, "tweet": "Drafted"},
+    {"problem": "Slow CI", "pain": "high"},
+]
+
+def test_problem_round_trips_as_a_mapping():
+    for data in PROBLEMS:
+        problem = Problem.from_dict(data)
+        assert dict(problem) == data
+        assert problem.get("missing") is None
+    assert "raw_data" not in Problem.from_dict(PROBLEMS[0], keep_extra=False)
+
+def test_problem_set_round_trips_values_and_types():
+    problems = ProblemSet(PROBLEMS)
+    assert len(problems) == 3
+    assert problems.to_dicts() == PROBLEMS
+    assert problems.column("pain") == [8, 9, None]
+    assert isinstance(problems[0]["pain"], int) and isinstance(problems[0]["urgency"], float)
+
+def test_problem_set_ranks_like_the_top_k_ranker():
+    ranker = TopKRanker(3, DEFAULT_WEIGHTS)
+    ranker.extend(PROBLEMS)
+    expected = [(score, dict(problem)) for score, problem in ranker.top()]
+    assert [(score, dict(problem)) for score, problem in ProblemSet(PROBLEMS).top(3, DEFAULT_WEIGHTS)] == expected
+
+def test_ranker_keeps_problem_records():
+    ranker = TopKRanker(2, DEFAULT_WEIGHTS)
+    ranker.extend(PROBLEMS)
+    assert all(isinstance(problem, Problem) for _, problem in ranker.top())
+    assert ranker.top()[1][1]["tweet"] == "Drafted"
+
+def test_non_numeric_pain_counts_as_zero_everywhere(monkeypatch):
+    problems = [
+        {"problem": "Pain is missing", "url": "https://example.com/a"},
+        {"problem": "Pain is None", "url": "https://example.com/b", "pain": None},
+        {"problem": "Pain is a string", "url": "https://example.com/c", "pain": "7", "reach": "SMB"},
+        {"problem": "Pain is a number", "url": "https://example.com/d", "pain": 7},
+    ]
+    assert [pain_level(problem) for problem in problems] == [0, 0, 0, 7]
+    
+    ranker = TopKRanker(5, DEFAULT_WEIGHTS, min_pain=5)
+    ranker.extend(problems)
+    assert [problem["url"] for _, problem in ranker.top()] == ["https://example.com/d"]
+    assert [problem["url"] for _, problem in ProblemSet(problems).top(5, DEFAULT_WEIGHTS, min_pain=5)] == \
+        ["https://example.com/d"]
+    
+    settings = {"hunting.min_pain_level": 5}
+    monkeypatch.setattr("src.agent_model.get_setting", lambda key, default=None: settings.get(key, default))
+    ranked = GrokAgent(load_model=False).rank_problems(problems)
+    assert [problem["url"] for problem in ranked] == ["https://example.com/d"]
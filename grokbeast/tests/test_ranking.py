@@ -0,0 +1,100 @@
+"""
+Tests for the streaming top-K problem ranking
+"""
+
+import random
+
+from src.ranking import DEFAULT_WEIGHTS, TopKRanker, weighted_score
+from src.store import ResultStore
+
+def problem(i, pain, urgency=0):
+    return {"problem": f"Problem {i}", "url": f"https://example.com/{i}", "pain": pain, "urgency": urgency}
+
+def ranked_urls(ranker):
+    return [p["url"] for _, p in ranker.top()]
+
+def test_matches_a_stable_sort_of_everything_seen():
+    rng = random.Random(7)
+    problems = [problem(i, rng.randint(1, 10), rng.randint(0, 3)) for i in range(500)]
+    ranker = TopKRanker(10, DEFAULT_WEIGHTS)
+    ranker.extend(problems)
+    expected = sorted(problems, key=lambda p: weighted_score(p, DEFAULT_WEIGHTS), reverse=True)[:10]
+    assert ranked_urls(ranker) == [p["url"] for p in expected]
+
+def test_ties_keep_the_earlier_problem():
+    ranker = TopKRanker(2)
+    ranker.extend([problem(1, 5), problem(2, 5), problem(3, 5)])
+    assert ranked_urls(ranker) == ["https://example.com/1", "https://example.com/2"]
+
+def test_min_pain_filters_problems():
+    ranker = TopKRanker(5, min_pain=6)
+    ranker.extend([problem(1, 5), problem(2, 7)])
+    assert ranked_urls(ranker) == ["https://example.com/2"]
+    assert ranker.stats()["filtered"] == 1
+
+def test_repeated_problem_is_ranked_once():
+    ranker = TopKRanker(5)
+    ranker.extend([problem(1, 5), problem(1, 5), problem(2, 4)])
+    assert ranked_urls(ranker) == ["https://example.com/1", "https://example.com/2"]
+
+def test_rescored_duplicate_replaces_its_entry():
+    ranker = TopKRanker(3)
+    ranker.extend([problem(1, 5), problem(2, 4), problem(3, 3)])
+    assert ranker.add(problem(3, 9))
+    assert ranked_urls(ranker) == ["https://example.com/3", "https://example.com/1", "https://example.com/2"]
+    assert ranker.top()[0][1]["pain"] == 9
+    
+    # A lower score moves it down instead of being ignored
+    ranker.add(problem(3, 1))
+    assert ranked_urls(ranker)[-1] == "https://example.com/3"
+    assert len(ranker) == 3
+
+def test_rescored_duplicate_can_leave_room_for_new_problems():
+    ranker = TopKRanker(2)
+    ranker.extend([problem(1, 8), problem(2, 7)])
+    ranker.add(problem(2, 1))
+    assert ranker.add(problem(3, 5))
+    assert ranked_urls(ranker) == ["https://example.com/1", "https://example.com/3"]
+
+def test_unchanged_score_keeps_its_place_among_ties():
+    ranker = TopKRanker(3)
+    ranker.extend([problem(1, 5), problem(2, 5)])
+    ranker.add(dict(problem(1, 5), tweet="Drafted"))
+    assert ranked_urls(ranker) == ["https://example.com/1", "https://example.com/2"]
+    assert ranker.top()[0][1]["tweet"] == "Drafted"
+
+def test_rescoring_keeps_the_heap_bounded():
+    rng = random.Random(3)
+    ranker = TopKRanker(20)
+    latest = {}
+    for _ in range(2000):
+        i = rng.randrange(20)
+        latest[i] = rng.randint(1, 10)
+        ranker.add(problem(i, latest[i]))
+    assert len(ranker) == 20
+    assert len(ranker._heap) <= 2 * ranker.k
+    scores = [score for score, _ in ranker.top()]
+    assert scores == sorted((DEFAULT_WEIGHTS["pain"] * pain for pain in latest.values()), reverse=True)
+    assert sorted(p["url"] for _, p in ranker.top()) == sorted(f"https://example.com/{i}" for i in latest)
+    assert ranker.stats()["min_score"] == scores[-1]
+
+def test_stored_ranking_follows_the_same_rules(tmp_path):
+    rng = random.Random(5)
+    memory = TopKRanker(10)
+    stored = TopKRanker(10, store=ResultStore(tmp_path / "results.db"))
+    for _ in range(300):
+        offered = problem(rng.randrange(40), rng.randint(1, 10), rng.randint(0, 3))
+        assert stored.add(offered) == memory.add(offered)
+    assert ranked_urls(stored) == ranked_urls(memory)
+    assert [score for score, _ in stored.top()] == [score for score, _ in memory.top()]
+    assert stored.stats()["min_score"] == memory.stats()["min_score"]
+
+def test_rankers_sharing_a_store_share_the_ranking(tmp_path):
+    first = TopKRanker(2, store=ResultStore(tmp_path / "results.db"))
+    second = TopKRanker(2, store=ResultStore(tmp_path / "results.db"))
+    assert first.extend([problem(1, 5), problem(2, 4)]) == 2
+    assert second.extend([problem(3, 6), problem(1, 5)]) == 2
+    assert ranked_urls(first) == ranked_urls(second) == ["https://example.com/3", "https://example.com/1"]
+    assert len(first) == 2
+    second.clear()
+    assert first.top() == []
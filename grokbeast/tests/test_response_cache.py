@@ -0,0 +1,24 @@
+"""
+Tests for the response cache size budgets
+"""
+
+from src import config
+from src.response_cache import ResponseCache, make_key
+
+def test_memory_and_disk_tiers_have_separate_budgets(tmp_path):
+    cache = ResponseCache(max_bytes=2000, ttl_seconds=60, disk_dir=tmp_path, disk_max_bytes=5000)
+    for i in range(20):
+        cache.put(make_key("prompt", i), "x" * 500)
+    assert cache.stats()["bytes"] <= 2000
+    cache.cleanup()
+    disk_bytes = sum(path.stat().st_size for path in tmp_path.glob("*/*.json"))
+    assert 0 < disk_bytes <= 5000
+    # Entries evicted from memory are still served from disk
+    assert cache.get(make_key("prompt", 19)) == "x" * 500
+
+def test_cache_budgets_split_max_size_mb(monkeypatch):
+    monkeypatch.setattr(config, "_config", {"cache": {"max_size_mb": 100}})
+    budgets = {tier: config.cache_budget_bytes(tier) for tier in config.CACHE_BUDGET_SHARES}
+    assert sum(budgets.values()) == 100 * 1024 * 1024
+    monkeypatch.setattr(config, "_config", {"cache": {"max_size_mb": 100, "response_disk_mb": 5}})
+    assert config.cache_budget_bytes("response_disk") == 5 * 1024 * 1024
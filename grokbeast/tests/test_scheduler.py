@@ -0,0 +1,88 @@
+"""
+Tests for the daily tweet budget token bucket
+"""
+
+import multiprocessing
+import time
+
+import pytest
+
+from src import scheduler
+from src.scheduler import TokenBucket
+
+class FakeClock:
+    """Replaces the scheduler module's time so refills can be stepped"""
+    
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+    
+    def time(self):
+        return self.now
+    
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(scheduler, "time", fake)
+    return fake
+
+def drain(bucket):
+    taken = 0
+    while bucket.try_acquire():
+        taken += 1
+    return taken
+
+def test_starts_full_and_denies_when_empty(clock):
+    bucket = TokenBucket.per_day(3)
+    assert drain(bucket) == 3
+    assert not bucket.try_acquire()
+    assert bucket.stats()["granted"] == 3 and bucket.stats()["denied"] == 2
+
+def test_refills_continuously(clock):
+    bucket = TokenBucket.per_day(24)
+    drain(bucket)
+    clock.now += 3600
+    assert bucket.available() == 1
+    clock.now += 6 * 3600
+    assert drain(bucket) == 7
+
+def test_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket.per_day(5)
+    drain(bucket)
+    clock.now += 10 * 86400
+    assert bucket.available() == 5
+
+def test_clock_going_backwards_adds_nothing(clock):
+    bucket = TokenBucket.per_day(2)
+    drain(bucket)
+    clock.now -= 3600
+    assert bucket.available() == 0
+
+def test_state_survives_a_restart(clock, tmp_path):
+    path = tmp_path / "tweet_budget.json"
+    drain(TokenBucket.per_day(4, state_path=path))
+    assert TokenBucket.per_day(4, state_path=path).available() == 0
+    clock.now += 86400 / 4
+    assert TokenBucket.per_day(4, state_path=path).available() == 1
+
+def test_unreadable_state_starts_full(clock, tmp_path):
+    path = tmp_path / "tweet_budget.json"
+    path.write_text("not json")
+    assert TokenBucket.per_day(4, state_path=path).available() == 4
+
+def _take_all(path, results):
+    results.put(drain(TokenBucket.per_day(10, state_path=path)))
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_processes_share_one_budget(tmp_path):
+    path = tmp_path / "tweet_budget.json"
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [context.Process(target=_take_all, args=(path, results)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert sum(results.get(timeout=5) for _ in processes) == 10
@@ -0,0 +1,70 @@
+"""
+Tests for the allow-listed shell executor
+"""
+
+import sys
+
+import pytest
+
+from src.shell_executor import ShellExecutor
+
+ALLOWED = ["echo", "git status", "git log", "git diff"]
+
+@pytest.mark.parametrize("command", [
+    "git -c alias.x='!sh -c id' x",
+    "git -c core.sshCommand='sh -c id' fetch origin",
+    "git fetch --upload-pack='sh -c id' origin",
+    "git log --exec=id",
+    "git diff --config=core.pager=id",
+    "git --exec-path=/tmp status",
+    "git status -c core.fsmonitor=id",
+    "git push",
+    "git",
+    "sh -c id",
+    "/bin/echo hi",
+    "./echo hi",
+])
+def test_check_rejects_bypass_attempts(command):
+    with pytest.raises(PermissionError):
+        ShellExecutor(ALLOWED).check(command)
+
+def test_forbidden_options_apply_to_bare_program_entries():
+    executor = ShellExecutor(["git"])
+    for command in ("git -c alias.x='!id' x", "git --upload-pack=id fetch", "git --config-env=a=b status"):
+        with pytest.raises(PermissionError):
+            executor.check(command)
+    assert executor.check("git status") == ["git", "status"]
+    assert executor.rejected == 3
+
+def test_check_accepts_allowed_commands():
+    executor = ShellExecutor(ALLOWED)
+    assert executor.check("echo 'Hello World'") == ["echo", "Hello World"]
+    assert executor.check("git log --oneline -5") == ["git", "log", "--oneline", "-5"]
+
+def test_check_rejects_empty_command():
+    with pytest.raises(ValueError):
+        ShellExecutor(ALLOWED).check("   ")
+
+def test_run_captures_output():
+    run = ShellExecutor(ALLOWED, timeout=10).run("echo hello world")
+    assert run.status == "done"
+    assert run.returncode == 0
+    assert run.output("stdout") == "hello world\n"
+
+def test_timeout_kills_command(tmp_path):
+    script = tmp_path / "sleep.py"
+    script.write_text("import time\ntime.sleep(30)\n")
+    executor = ShellExecutor([sys.executable], timeout=0.5)
+    run = executor.run(f"{sys.executable} {script}")
+    assert run.status == "timeout"
+    assert run.returncode is not None and run.returncode < 0
+    assert run.finished_at - run.started_at < 10
+
+def test_output_ring_buffer_is_bounded(tmp_path):
+    script = tmp_path / "loud.py"
+    script.write_text("print('x' * 100000)\n")
+    executor = ShellExecutor([sys.executable], timeout=10, max_output_bytes=1000)
+    run = executor.run(f"{sys.executable} {script}")
+    assert run.status == "done"
+    assert len(run.output("stdout")) <= 1000 + 4096
+    assert run.dropped_bytes + len(run.output("stdout")) == 100001
@@ -0,0 +1,145 @@
+"""
+Tests for single-flight coalescing in the job queue
+"""
+
+import queue
+import threading
+import time
+
+import pytest
+
+from src.jobs import JobQueue
+from src.singleflight import SingleFlight, command_key
+
+def status_command(command_id):
+    return {"id": command_id, "type": "status", "params": {}}
+
+def blocking_handler(results, release):
+    """Handler that waits for `release` and returns the next queued result"""
+    calls = []
+    
+    def handler(command):
+        calls.append(command["id"])
+        release.wait(10)
+        return dict(results.pop(0), id=command["id"])
+    
+    return handler, calls
+
+def test_command_key_ignores_id():
+    assert command_key(status_command("a")) == command_key(status_command("b"))
+    assert command_key({"id": "a", "type": "hunt_problems", "params": {"count": 3}}) != \
+        command_key({"id": "a", "type": "hunt_problems", "params": {"count": 4}})
+
+def test_identical_commands_in_flight_share_one_job():
+    release = threading.Event()
+    handler, calls = blocking_handler([{"status": "success"}], release)
+    queue = JobQueue(handler, workers=2, singleflight=SingleFlight())
+    jobs = [queue.submit(status_command(f"cmd_{i}")) for i in range(5)]
+    release.set()
+    assert jobs[0].wait(10)
+    assert len({job.id for job in jobs}) == 1
+    assert calls == ["cmd_0"]
+    assert queue.stats()["singleflight"]["shared"] == 4
+
+def test_different_commands_run_separately():
+    release = threading.Event()
+    release.set()
+    handler, calls = blocking_handler([{"status": "success"}] * 2, release)
+    queue = JobQueue(handler, workers=2, singleflight=SingleFlight())
+    first = queue.submit({"id": "a", "type": "hunt_problems", "params": {"count": 3}})
+    second = queue.submit({"id": "b", "type": "hunt_problems", "params": {"count": 4}})
+    assert first is not second
+    assert first.wait(10) and second.wait(10)
+    assert sorted(calls) == ["a", "b"]
+
+def test_successful_result_is_reused_within_ttl():
+    release = threading.Event()
+    release.set()
+    handler, calls = blocking_handler([{"status": "success"}, {"status": "success"}], release)
+    queue = JobQueue(handler, singleflight=SingleFlight(result_ttl={"status": 60}))
+    first = queue.submit(status_command("a"))
+    assert first.wait(10)
+    assert queue.submit(status_command("b")) is first
+    assert calls == ["a"]
+
+def test_failed_result_is_not_reused():
+    release = threading.Event()
+    release.set()
+    handler, calls = blocking_handler([{"status": "error", "error": "boom"}, {"status": "success"}], release)
+    queue = JobQueue(handler, singleflight=SingleFlight(result_ttl={"status": 60}))
+    first = queue.submit(status_command("a"))
+    assert first.wait(10)
+    second = queue.submit(status_command("b"))
+    assert second is not first
+    assert second.wait(10)
+    assert second.result["status"] == "success"
+    assert calls == ["a", "b"]
+
+def test_raising_handler_is_not_reused():
+    def handler(command):
+        raise RuntimeError("boom")
+    
+    queue = JobQueue(handler, singleflight=SingleFlight(result_ttl={"status": 60}))
+    first = queue.submit(status_command("a"))
+    assert first.wait(10)
+    assert first.status == "error"
+    assert queue.submit(status_command("b")) is not first
+
+def test_excluded_types_never_coalesce():
+    release = threading.Event()
+    handler, calls = blocking_handler([{"status": "success"}] * 2, release)
+    queue = JobQueue(handler, workers=2, singleflight=SingleFlight(exclude_types=["shell"]))
+    command = {"type": "shell", "params": {"command": "ls"}}
+    first = queue.submit(dict(command, id="a"))
+    second = queue.submit(dict(command, id="b"))
+    release.set()
+    assert first is not second
+    assert first.wait(10) and second.wait(10)
+
+class StubJob:
+    def __init__(self, command):
+        self.id = command["id"]
+        self.command = command
+    
+    def done(self):
+        return False
+
+def test_slow_queueing_does_not_block_other_commands():
+    # start() stands in for JobQueue._enqueue stalled on its result-store write
+    flight = SingleFlight()
+    entered, release = threading.Event(), threading.Event()
+    
+    def slow_start(command):
+        entered.set()
+        release.wait(10)
+        return StubJob(command)
+    
+    results = {}
+    leader = threading.Thread(target=lambda: results.update(a=flight.submit(status_command("a"), slow_start)))
+    follower = threading.Thread(target=lambda: results.update(b=flight.submit(status_command("b"), slow_start)))
+    leader.start()
+    assert entered.wait(10)
+    follower.start()
+    
+    other = flight.submit({"id": "c", "type": "hunt_problems", "params": {}}, StubJob)
+    assert other.id == "c"
+    assert leader.is_alive()
+    
+    deadline = time.monotonic() + 10
+    while flight.stats()["shared"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    leader.join(10)
+    follower.join(10)
+    assert results["a"] is results["b"] and results["a"].id == "a"
+    assert flight.stats()["leaders"] == 2 and flight.stats()["shared"] == 1
+
+def test_followers_see_the_leaders_queueing_error():
+    flight = SingleFlight()
+    
+    def full(command):
+        raise queue.Full()
+    
+    with pytest.raises(queue.Full):
+        flight.submit(status_command("a"), full)
+    assert flight.submit(status_command("b"), StubJob).id == "b"
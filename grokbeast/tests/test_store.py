@@ -0,0 +1,51 @@
+"""
+Tests for ResultStore space management
+"""
+
+import sqlite3
+
+from src.store import ResultStore
+
+def fill(store, count, size=2000):
+    for i in range(count):
+        store.put_search(f"web_feed_{i}", {"problems": [{"problem": f"{i} " + "x" * size, "source": "Web"}],
+                                           "timestamp": "2025-01-01T00:00:00"}, "web")
+
+def test_new_database_uses_incremental_auto_vacuum(tmp_path):
+    store = ResultStore(tmp_path / "results.db")
+    assert store._connect().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+def test_existing_database_is_converted(tmp_path):
+    path = tmp_path / "results.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+    conn.close()
+    store = ResultStore(path)
+    assert store._connect().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+def test_file_shrinks_after_compact(tmp_path):
+    path = tmp_path / "results.db"
+    store = ResultStore(path, max_bytes=0)
+    fill(store, 500)
+    store.compact()
+    before = path.stat().st_size
+    
+    store.max_bytes = 100 * 1024
+    evicted = store.compact(batch_size=10)
+    assert evicted["searches"] > 0
+    assert path.stat().st_size < before / 2
+    assert store.data_bytes() <= store.max_bytes
+
+def test_schema_overhead_does_not_count_towards_the_budget(tmp_path):
+    store = ResultStore(tmp_path / "results.db", max_bytes=16 * 1024)
+    assert store.size_bytes() > store.max_bytes
+    fill(store, 1, size=100)
+    assert store.compact()["searches"] == 0
+    assert store.stats()["searches"] == 1
+    
+    fill(store, 20)
+    store.compact(batch_size=1)
+    remaining = store.stats()["searches"]
+    assert 0 < remaining < 20
+    assert store.data_bytes() <= store.max_bytes